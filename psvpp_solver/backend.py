@@ -0,0 +1,480 @@
+"""Compiled (numba) and pure NumPy implementations of the schedule generators
+and constraint checks.
+
+Random numbers are always drawn with a `numpy.random.Generator` outside the
+kernels and passed in, so both backends produce identical schedules for the
+same seed. The numba backend is used when numba is installed, and the NumPy
+backend otherwise.
+"""
+import numpy as np
+
+from psvpp_solver import patterns
+from psvpp_solver.constraints import N_CONSTRAINTS
+from psvpp_solver.constraints import calculate_constraint_violations
+from psvpp_solver.constraints import calculate_spread_limits
+
+try:
+    import numba
+except ImportError:  # numba is an optional dependency
+    numba = None
+
+HAS_NUMBA = numba is not None
+BACKENDS = ("numpy", "numba")
+
+
+def get_backend(backend: str = None) -> str:
+    """Resolve which backend to use.
+
+    Args:
+        backend (str): "numba", "numpy" or None to pick numba when it is
+            installed.
+
+    Returns:
+        str: Name of the backend.
+    """
+    if backend is None:
+        return "numba" if HAS_NUMBA else "numpy"
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend {!r}, expected one of {}.".format(
+            backend, BACKENDS))
+    if backend == "numba" and not HAS_NUMBA:
+        raise ImportError("The numba backend requires numba to be installed.")
+    return backend
+
+
+def _jit(function):
+    """Compile function with numba, or return None if numba is missing."""
+    if numba is None:
+        return None
+    return numba.njit(cache=True)(function)
+
+
+# Visits
+
+def sample_visits(n_installations: int,
+                  n_days_in_period: int,
+                  required_services: np.ndarray,
+                  rng: np.random.Generator = None,
+                  backend: str = None) -> np.ndarray:
+    """Generate visit days for each installation, like
+    `utils.generate_visits`, from a seeded random generator.
+
+    Visits are drawn from the cached pattern tables in `patterns`, which is
+    a gather for both backends, so there is no compiled kernel for it.
+
+    Args:
+        n_installations (int): Number of installations.
+        n_days_in_period (int): Number of days in period.
+        required_services (np.array): Required service frequency for each
+            installation.
+        rng (np.random.Generator): Random generator, or seed for one.
+        backend (str): "numba", "numpy" or None for the fastest available.
+
+    Returns:
+        np.ndarray: Boolean array of shape (n_installations, n_days).
+    """
+    get_backend(backend)
+    return patterns.sample_visits(
+        n_days_in_period,
+        np.asarray(required_services)[:n_installations],
+        rng=rng)
+
+
+# Departures
+
+def _sample_departures_numpy(visits, day_keys, vessel_keys, vessel_draws,
+                             departures):
+    departure_days = np.nonzero(visits.any(axis=0))[0]
+    n_initial = min(len(vessel_keys), len(departure_days))
+
+    # Each vessel gets one randomly picked departure day
+    days = departure_days[np.argsort(day_keys[departure_days],
+                                     kind="mergesort")]
+    vessels = np.argsort(vessel_keys, kind="mergesort")[:n_initial]
+    departures[vessels, days[:n_initial]] = True
+
+    # Remaining departure days get a randomly drawn vessel
+    remaining_days = days[n_initial:]
+    departures[vessel_draws[remaining_days], remaining_days] = True
+
+
+def _sample_departures_loops(visits, day_keys, vessel_keys, vessel_draws,
+                             departures):
+    n_installations, n_days = visits.shape
+    departure_days = np.empty(n_days, dtype=np.int64)
+    n_departure_days = 0
+    for day in range(n_days):
+        for inst in range(n_installations):
+            if visits[inst, day]:
+                departure_days[n_departure_days] = day
+                n_departure_days += 1
+                break
+    departure_days = departure_days[:n_departure_days]
+    n_initial = min(len(vessel_keys), n_departure_days)
+
+    days = departure_days[np.argsort(day_keys[departure_days],
+                                     kind="mergesort")]
+    vessels = np.argsort(vessel_keys, kind="mergesort")
+    for i in range(n_departure_days):
+        if i < n_initial:
+            departures[vessels[i], days[i]] = True
+        else:
+            departures[vessel_draws[days[i]], days[i]] = True
+
+
+_sample_departures_numba = _jit(_sample_departures_loops)
+
+
+def sample_departures(visits: np.ndarray,
+                      n_vessels: int,
+                      rng: np.random.Generator = None,
+                      backend: str = None) -> np.ndarray:
+    """Generate departures for each vessel, like
+    `utils.generate_departures_from_visits`, from a seeded random generator.
+
+    Args:
+        visits (np.ndarray): Boolean array of shape (n_installations, n_days).
+        n_vessels (int): Number of vessels.
+        rng (np.random.Generator): Random generator, or seed for one.
+        backend (str): "numba", "numpy" or None for the fastest available.
+
+    Returns:
+        np.ndarray: Boolean array of shape (n_vessels, n_days).
+    """
+    rng = np.random.default_rng(rng)
+    kernel = (_sample_departures_numba if get_backend(backend) == "numba"
+              else _sample_departures_numpy)
+
+    n_days = visits.shape[1]
+    departures = np.zeros((n_vessels, n_days), dtype=bool)
+    kernel(np.ascontiguousarray(visits, dtype=bool),
+           rng.random(n_days),
+           rng.random(n_vessels),
+           rng.integers(n_vessels, size=n_days),
+           departures)
+    return departures
+
+
+# Routes
+
+def _build_routes_numpy(visits, departures, routes):
+    # Order of each installation among the installations visited that day
+    order = np.cumsum(visits, axis=0) - 1
+
+    # Every vessel departing on a day visits the installations of that day
+    which_vessel, departure_days = np.nonzero(departures)
+    departure, installation = np.nonzero(visits[:, departure_days].T)
+    day = departure_days[departure]
+    routes[which_vessel[departure],
+           day,
+           order[installation, day]] = installation + 1
+
+
+def _build_routes_loops(visits, departures, routes):
+    n_installations, n_days = visits.shape
+    for vessel in range(departures.shape[0]):
+        for day in range(n_days):
+            if not departures[vessel, day]:
+                continue
+            order = 0
+            for inst in range(n_installations):
+                if visits[inst, day]:
+                    routes[vessel, day, order] = inst + 1
+                    order += 1
+
+
+_build_routes_numba = _jit(_build_routes_loops)
+
+
+def build_routes(visits: np.ndarray,
+                 departures: np.ndarray,
+                 backend: str = None) -> np.ndarray:
+    """Generate routes from visits and departures, like
+    `utils.generate_routes_from_visits_and_departures`.
+
+    Args:
+        visits (np.ndarray): Boolean array of shape (n_installations, n_days).
+        departures (np.ndarray): Boolean array of shape (n_vessels, n_days).
+        backend (str): "numba", "numpy" or None for the fastest available.
+
+    Returns:
+        np.ndarray: Routes of shape (n_vessels, n_days, n_installations).
+    """
+    kernel = (_build_routes_numba if get_backend(backend) == "numba"
+              else _build_routes_numpy)
+    routes = np.zeros((len(departures), visits.shape[1], len(visits)),
+                      dtype=np.int8)
+    kernel(np.ascontiguousarray(visits, dtype=bool),
+           np.ascontiguousarray(departures, dtype=bool),
+           routes)
+    return routes
+
+
+# Populations
+
+def sample_population_departures(visits: np.ndarray,
+                                 n_vessels: int,
+                                 rng: np.random.Generator = None,
+                                 out: np.ndarray = None) -> np.ndarray:
+    """Generate departures for a population at once, like
+    `sample_departures` for each individual.
+
+    The random keys of every individual are drawn in one call each, and the
+    departures are set with a single scatter, so there is no loop over
+    individuals. The individuals are drawn differently than by calling
+    `sample_departures` on each, but from the same distribution.
+
+    Args:
+        visits (np.ndarray): Boolean array of shape
+            (pop_size, n_installations, n_days).
+        n_vessels (int): Number of vessels.
+        rng (np.random.Generator): Random generator, or seed for one.
+        out (np.ndarray): Boolean array of shape (pop_size, n_vessels, n_days)
+            to write the departures to.
+
+    Returns:
+        np.ndarray: Boolean array of shape (pop_size, n_vessels, n_days).
+    """
+    rng = np.random.default_rng(rng)
+    pop_size, _, n_days = visits.shape
+    if out is None:
+        out = np.zeros((pop_size, n_vessels, n_days), dtype=bool)
+    else:
+        out[...] = False
+
+    # Days with visits sorted in random order, followed by the other days
+    departure_days = visits.any(axis=1)
+    day_keys = rng.random((pop_size, n_days))
+    day_keys[~departure_days] = 2
+    days = np.argsort(day_keys, axis=1, kind="stable")
+    vessel_order = np.argsort(rng.random((pop_size, n_vessels)), axis=1)
+    vessel_draws = rng.integers(n_vessels, size=(pop_size, n_days))
+
+    # The first days get one vessel each, and the others a drawn vessel
+    rank = np.arange(n_days)
+    vessels = np.where(
+        rank < n_vessels,
+        vessel_order[:, np.minimum(rank, n_vessels - 1)],
+        np.take_along_axis(vessel_draws, days, axis=1))
+
+    individual, rank = np.nonzero(rank < departure_days.sum(axis=1,
+                                                            keepdims=True))
+    out[individual, vessels[individual, rank], days[individual, rank]] = True
+    return out
+
+
+def build_population_routes(visits: np.ndarray,
+                            departures: np.ndarray,
+                            out: np.ndarray = None) -> np.ndarray:
+    """Generate routes for a population at once, like `build_routes` for
+    each individual.
+
+    The voyage of each day, visiting the installations of that day in
+    increasing order, is built once and copied to every vessel departing
+    that day.
+
+    Args:
+        visits (np.ndarray): Boolean array of shape
+            (pop_size, n_installations, n_days).
+        departures (np.ndarray): Boolean array of shape
+            (pop_size, n_vessels, n_days).
+        out (np.ndarray): Array of shape
+            (pop_size, n_vessels, n_days, n_installations) to write the
+            routes to.
+
+    Returns:
+        np.ndarray: Routes of shape
+            (pop_size, n_vessels, n_days, n_installations).
+    """
+    pop_size, n_installations, n_days = visits.shape
+    if out is None:
+        out = np.zeros((pop_size, departures.shape[1], n_days,
+                        n_installations), dtype=np.int8)
+
+    day_visits = visits.transpose(0, 2, 1)
+    order = np.cumsum(day_visits, axis=2, dtype=np.int16) - 1
+    individual, day, installation = np.nonzero(day_visits)
+    voyages = np.zeros((pop_size, n_days, n_installations), dtype=out.dtype)
+    voyages[individual, day, order[individual, day, installation]] = \
+        installation + 1
+
+    np.multiply(voyages[:, None], departures[..., None], out=out,
+                casting="unsafe")
+    return out
+
+
+# Constraints
+
+def _cyclic_gap_violation(mask, lower, upper):
+    """Sum of days the gaps between True entries of mask fall outside the
+    lower and upper limits, wrapping around the period."""
+    n_days = len(mask)
+    first = -1
+    previous = -1
+    violation = 0
+    for day in range(n_days):
+        if mask[day]:
+            if first < 0:
+                first = day
+            else:
+                gap = day - previous - 1
+                violation += max(lower - gap, 0) + max(gap - upper, 0)
+            previous = day
+    if first >= 0:
+        gap = first + n_days - previous - 1
+        violation += max(lower - gap, 0) + max(gap - upper, 0)
+    return violation
+
+
+_cyclic_gap_violation_numba = _jit(_cyclic_gap_violation)
+
+
+def _overlap_violation(mask, durations):
+    """Days a vessel departs before returning from its previous voyage,
+    wrapping around the period."""
+    n_days = len(mask)
+    first = -1
+    previous = -1
+    violation = 0
+    for day in range(n_days):
+        if mask[day]:
+            if first < 0:
+                first = day
+            else:
+                gap = day - previous - 1
+                violation += max(durations[previous] - 1 - gap, 0)
+            previous = day
+    if first >= 0:
+        gap = first + n_days - previous - 1
+        violation += max(durations[previous] - 1 - gap, 0)
+    return violation
+
+
+_overlap_violation_numba = _jit(_overlap_violation)
+
+
+def _calculate_violations_loops(visits, departures, required_services,
+                                max_v_prepared, n_days_available,
+                                Pf_min, Pf_max, durations, loads,
+                                deck_capacities, violations):
+    pop_size, n_installations, n_days = visits.shape
+    n_vessels = departures.shape[1]
+    # Loads are empty when deck capacity is not checked
+    check_deck = loads.shape[0] > 0
+
+    for p in range(pop_size):
+        for inst in range(n_installations):
+            violations[p, 0] += abs(visits[p, inst].sum()
+                                    - required_services[inst])
+            violations[p, 4] += _cyclic_gap_violation_numba(
+                visits[p, inst], Pf_min[inst], Pf_max[inst])
+
+        for vessel in range(n_vessels):
+            violations[p, 1] += max(durations[p, vessel].sum()
+                                    - n_days_available[vessel], 0)
+            violations[p, 3] += _overlap_violation_numba(
+                departures[p, vessel], durations[p, vessel])
+            if check_deck:
+                for day in range(n_days):
+                    violations[p, 5] += max(loads[p, vessel, day]
+                                            - deck_capacities[vessel], 0.0)
+
+        for day in range(n_days):
+            violations[p, 2] += max(departures[p, :, day].sum()
+                                    - max_v_prepared[day], 0)
+
+
+_calculate_violations_numba = _jit(_calculate_violations_loops)
+
+
+def calculate_violations(visits: np.ndarray,
+                         departures: np.ndarray,
+                         required_services: np.ndarray,
+                         max_v_prepared: np.ndarray,
+                         n_days_available: np.ndarray,
+                         backend: str = None,
+                         voyage_durations: np.ndarray = None,
+                         voyage_loads: np.ndarray = None,
+                         deck_capacities: np.ndarray = None) -> np.ndarray:
+    """Calculate constraint violations of a population, like
+    `constraints.calculate_constraint_violations`.
+
+    Args:
+        visits (np.ndarray): Boolean array of shape
+            (pop_size, n_installations, n_days).
+        departures (np.ndarray): Boolean array of shape
+            (pop_size, n_vessels, n_days).
+        required_services (np.array): Required service frequency for each
+            installation.
+        max_v_prepared (np.array): Vessels the depot can prepare each day.
+        n_days_available (np.array): Days available for each vessel.
+        backend (str): "numba", "numpy" or None for the fastest available.
+        voyage_durations (np.ndarray): Days each voyage takes, of the same
+            shape as departures. Voyages take one day by default.
+        voyage_loads (np.ndarray): Load of each voyage, of the same shape as
+            departures. Deck capacity is only checked when both loads and
+            capacities are given.
+        deck_capacities (np.array): Deck capacity of each vessel.
+
+    Returns:
+        np.ndarray: Array of shape (pop_size, N_CONSTRAINTS).
+    """
+    if get_backend(backend) == "numpy":
+        return calculate_constraint_violations(visits,
+                                               departures,
+                                               required_services,
+                                               max_v_prepared,
+                                               n_days_available,
+                                               voyage_durations,
+                                               voyage_loads,
+                                               deck_capacities)
+
+    required_services = np.asarray(required_services, dtype=np.int64)
+    Pf_min, Pf_max = calculate_spread_limits(visits.shape[-1],
+                                             required_services)
+    departures = np.ascontiguousarray(departures, dtype=bool)
+    if voyage_durations is None:
+        voyage_durations = departures
+    if voyage_loads is None or deck_capacities is None:
+        voyage_loads = np.zeros((0, 0, 0))
+        deck_capacities = np.zeros(0)
+    violations = np.zeros((len(visits), N_CONSTRAINTS))
+    _calculate_violations_numba(
+        np.ascontiguousarray(visits, dtype=bool),
+        departures,
+        required_services,
+        np.asarray(max_v_prepared, dtype=np.int64),
+        np.asarray(n_days_available, dtype=np.int64),
+        Pf_min,
+        Pf_max,
+        np.ascontiguousarray(voyage_durations, dtype=np.int64),
+        np.ascontiguousarray(voyage_loads, dtype=np.float64),
+        np.ascontiguousarray(deck_capacities, dtype=np.float64),
+        violations)
+    return violations
+
+
+def generate_schedule(n_vessels: int,
+                      n_days_in_period: int,
+                      required_services: np.ndarray,
+                      rng: np.random.Generator = None,
+                      backend: str = None) -> tuple:
+    """Generate visits, departures and routes of a random schedule.
+
+    Args:
+        n_vessels (int): Number of vessels.
+        n_days_in_period (int): Number of days in period.
+        required_services (np.array): Required service frequency for each
+            installation.
+        rng (np.random.Generator): Random generator, or seed for one.
+        backend (str): "numba", "numpy" or None for the fastest available.
+
+    Returns:
+        tuple: (visits, departures, routes)
+    """
+    rng = np.random.default_rng(rng)
+    visits = sample_visits(len(required_services), n_days_in_period,
+                           required_services, rng, backend)
+    departures = sample_departures(visits, n_vessels, rng, backend)
+    routes = build_routes(visits, departures, backend)
+    return visits, departures, routes
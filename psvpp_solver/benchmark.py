@@ -0,0 +1,273 @@
+"""Benchmarks of the schedule generators, cost and constraint checks.
+
+Sweeps the number of installations, vessels and days in period, times each
+function on a random instance of each size and writes the results as JSON or
+CSV, so runs of different versions and backends can be compared.
+
+Usage:
+
+    python -m psvpp_solver.benchmark --installations 10 30 100 \
+        --vessels 4 8 --days 7 14 --backends numpy numba \
+        --format csv --output benchmark.csv
+
+Dense routes are int8, so sizes are limited to 127 installations. Larger
+instances need `sparse_routes.SparseRoutes`, whose generators and evaluators
+are not benchmarked here.
+
+Each result records the function, backend, instance size, and the best and
+median time in seconds of one call over the repeats. Functions that do not
+depend on the backend are only timed once per size, with backend None.
+"""
+import argparse
+import csv
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from psvpp_solver import backend as backends
+from psvpp_solver.constraints import check_constraints_satisfied
+from psvpp_solver.cost import FitnessEvaluator
+from psvpp_solver.utils import calculate_cost_of_route
+from psvpp_solver.utils import generate_departures_from_visits
+from psvpp_solver.utils import generate_routes_from_visits_and_departures
+from psvpp_solver.utils import generate_visits
+from psvpp_solver.utils import initial_population
+
+# Largest number of installations dense int8 routes can hold
+MAX_INSTALLATIONS = np.iinfo(np.int8).max
+
+FIELDS = ("function", "backend", "n_installations", "n_vessels", "n_days",
+          "population_size", "repeat", "number", "best", "median")
+
+
+def _check_installations(n_installations: int):
+    if n_installations > MAX_INSTALLATIONS:
+        raise ValueError(f"Dense int8 routes hold at most {MAX_INSTALLATIONS} "
+                         f"installations, got {n_installations}.")
+
+
+def make_instance(n_installations: int,
+                  n_vessels: int,
+                  n_days_in_period: int,
+                  seed: int = 0) -> dict:
+    """Random instance with installations in the unit square scaled to
+    100 km, and loose depot and vessel availability constraints."""
+    _check_installations(n_installations)
+    rng = np.random.default_rng(seed)
+    positions = rng.random((n_installations + 1, 2))
+    distances = np.sqrt(np.sum((positions[:, None] - positions[None]) ** 2,
+                               axis=-1)) * 100
+    return dict(
+        n_installations=n_installations,
+        n_vessels=n_vessels,
+        n_days_in_period=n_days_in_period,
+        required_services=rng.integers(1, max(n_days_in_period // 2, 1) + 1,
+                                       size=n_installations),
+        weekly_charter_costs=rng.uniform(80000, 120000, size=n_vessels),
+        sailing_costs=rng.uniform(8, 12, size=n_vessels),
+        distances=distances,
+        max_v_prepared=np.full(n_days_in_period, n_vessels),
+        n_days_available=np.full(n_vessels, n_days_in_period))
+
+
+def time_function(function, repeat: int = 5, number: int = 1) -> tuple:
+    """Time function like `timeit.repeat`.
+
+    Returns:
+        tuple: Best and median time in seconds of one call.
+    """
+    times = np.zeros(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times[i] = (time.perf_counter() - start) / number
+    return float(times.min()), float(np.median(times))
+
+
+def _schedule_cases(instance: dict, seed: int) -> dict:
+    """Functions of `utils` and `constraints` on a single schedule."""
+    n_installations = instance["n_installations"]
+    n_vessels = instance["n_vessels"]
+    n_days = instance["n_days_in_period"]
+    required_services = instance["required_services"]
+
+    rng = np.random.default_rng(seed)
+    visits = generate_visits(n_installations, n_days, required_services,
+                             rng=rng)
+    departures = generate_departures_from_visits(visits, n_vessels,
+                                                 n_installations, n_days, rng)
+    routes = generate_routes_from_visits_and_departures(visits, departures,
+                                                        n_days)
+    return {
+        "generate_visits": lambda: generate_visits(
+            n_installations, n_days, required_services, rng=rng),
+        "generate_departures_from_visits":
+            lambda: generate_departures_from_visits(
+                visits, n_vessels, n_installations, n_days, rng),
+        "generate_routes_from_visits_and_departures":
+            lambda: generate_routes_from_visits_and_departures(
+                visits, departures, n_days),
+        "calculate_cost_of_route": lambda: calculate_cost_of_route(
+            routes, instance["weekly_charter_costs"],
+            instance["sailing_costs"], instance["distances"]),
+        "check_constraints_satisfied": lambda: check_constraints_satisfied(
+            routes, visits, departures, required_services,
+            instance["max_v_prepared"], instance["n_days_available"],
+            n_days),
+    }
+
+
+def _population_cases(instance: dict,
+                      population_size: int,
+                      backend: str,
+                      seed: int) -> dict:
+    """Backend dependent functions, and evaluation of a population."""
+    n_vessels = instance["n_vessels"]
+    n_days = instance["n_days_in_period"]
+    required_services = instance["required_services"]
+
+    visits, departures, routes = initial_population(
+        population_size, n_vessels, n_days, required_services, rng=seed,
+        backend=backend)
+    evaluator = FitnessEvaluator(instance["weekly_charter_costs"],
+                                 instance["sailing_costs"],
+                                 instance["distances"],
+                                 required_services,
+                                 instance["max_v_prepared"],
+                                 instance["n_days_available"])
+    rng = np.random.default_rng(seed)
+    return {
+        "generate_schedule": lambda: backends.generate_schedule(
+            n_vessels, n_days, required_services, rng, backend),
+        "initial_population": lambda: initial_population(
+            population_size, n_vessels, n_days, required_services, rng,
+            backend),
+        "calculate_violations": lambda: backends.calculate_violations(
+            visits, departures, required_services,
+            instance["max_v_prepared"], instance["n_days_available"],
+            backend),
+        "fitness_evaluator": lambda: evaluator(routes),
+    }
+
+
+def run_benchmarks(installations=(10, 30, 100),
+                   vessels=(4, 8),
+                   days=(7, 14),
+                   backend_names=None,
+                   population_size: int = 100,
+                   repeat: int = 5,
+                   number: int = 1,
+                   seed: int = 0) -> list:
+    """Time every function for each combination of sizes.
+
+    Args:
+        installations (list): Numbers of installations.
+        vessels (list): Numbers of vessels.
+        days (list): Numbers of days in period.
+        backend_names (list): Backends of the backend dependent functions,
+            the fastest available by default.
+        population_size (int): Individuals in population benchmarks.
+        repeat (int): Number of timings of each function.
+        number (int): Calls per timing.
+        seed (int): Seed of the instances and schedules.
+
+    Returns:
+        list: One dict with the keys in `FIELDS` for each timing.
+
+    Raises:
+        ValueError: If a number of installations exceeds
+            `MAX_INSTALLATIONS`, before any timing is run.
+    """
+    for n_installations in installations:
+        _check_installations(n_installations)
+    if backend_names is None:
+        backend_names = [backends.get_backend()]
+
+    results = []
+    for n_installations in installations:
+        for n_vessels in vessels:
+            for n_days in days:
+                instance = make_instance(n_installations, n_vessels, n_days,
+                                         seed)
+                size = dict(n_installations=n_installations,
+                            n_vessels=n_vessels,
+                            n_days=n_days)
+
+                cases = [(None, 1, _schedule_cases(instance, seed))]
+                for backend in backend_names:
+                    cases.append((backends.get_backend(backend),
+                                  population_size,
+                                  _population_cases(instance,
+                                                    population_size,
+                                                    backend,
+                                                    seed)))
+
+                for backend, n_individuals, functions in cases:
+                    for name, function in functions.items():
+                        function()  # Warm up caches and compilation
+                        best, median = time_function(function, repeat,
+                                                     number)
+                        results.append(dict(function=name,
+                                            backend=backend,
+                                            population_size=n_individuals,
+                                            repeat=repeat,
+                                            number=number,
+                                            best=best,
+                                            median=median,
+                                            **size))
+    return results
+
+
+def environment() -> dict:
+    """Versions of the software the benchmarks ran with."""
+    return dict(python=platform.python_version(),
+                numpy=np.__version__,
+                numba=(backends.numba.__version__ if backends.HAS_NUMBA
+                       else None),
+                platform=platform.platform())
+
+
+def write_json(results: list, file):
+    json.dump(dict(environment=environment(), results=results), file,
+              indent=2)
+
+
+def write_csv(results: list, file):
+    writer = csv.DictWriter(file, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(results)
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--installations", type=int, nargs="+",
+                        default=[10, 30, 100])
+    parser.add_argument("--vessels", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 14])
+    parser.add_argument("--backends", nargs="+", choices=backends.BACKENDS)
+    parser.add_argument("--population-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--output", help="File to write, stdout by default.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.installations, args.vessels, args.days,
+                             args.backends, args.population_size,
+                             args.repeat, args.number, args.seed)
+
+    write = write_json if args.format == "json" else write_csv
+    if args.output is None:
+        write(results, sys.stdout)
+    else:
+        with open(args.output, "w", newline="") as file:
+            write(results, file)
+
+
+if __name__ == "__main__":
+    main()
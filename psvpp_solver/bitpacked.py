@@ -0,0 +1,219 @@
+"""Bit-packed visits and departures with constraint checks on bit operations.
+
+For periods of up to 64 days, the days of each row of a boolean visits
+(..., n_installations, n_days) or departures (..., n_vessels, n_days) array
+fit in one uint64 word, with bit d set when the row is True on day d:
+
+    [True, False, True, True, False, False, False] -> 0b0001101 == 13
+
+That is an eighth of the memory of the boolean arrays. The checks below count
+with popcounts and compare days with cyclic rotations of the words, so they
+run on whole populations in a few vectorized operations, and give the same
+violations as the functions of the same name in `constraints`.
+"""
+import numpy as np
+
+from psvpp_solver.constraints import calculate_spread_limits
+
+MAX_DAYS = 64
+
+_ONE = np.uint64(1)
+
+
+def pack(mask: np.ndarray) -> np.ndarray:
+    """Pack the last axis of a boolean array into uint64 words.
+
+    Args:
+        mask (np.ndarray): Boolean array of shape (..., n_days).
+
+    Returns:
+        np.ndarray: uint64 array of shape mask.shape[:-1].
+    """
+    n_days = mask.shape[-1]
+    if n_days > MAX_DAYS:
+        raise ValueError(f"Can not pack more than {MAX_DAYS} days.")
+    packed = np.zeros(mask.shape[:-1] + (8,), dtype=np.uint8)
+    packed[..., :(n_days + 7) // 8] = np.packbits(mask, axis=-1,
+                                                  bitorder="little")
+    return packed.view("<u8")[..., 0].astype(np.uint64)
+
+
+def unpack(words: np.ndarray, n_days: int) -> np.ndarray:
+    """Unpack uint64 words into a boolean array of shape
+    (..., n_days)."""
+    words = np.asarray(words, dtype="<u8")
+    return np.unpackbits(words[..., None].view(np.uint8),
+                         axis=-1,
+                         count=n_days,
+                         bitorder="little").astype(bool)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Number of set bits in each word."""
+    words = np.asarray(words, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):  # Added in NumPy 2.0
+        return np.bitwise_count(words).astype(np.int64)
+
+    # Count bits in pairs, nibbles and bytes, then sum the bytes
+    words = words - ((words >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    words = ((words & np.uint64(0x3333333333333333))
+             + ((words >> np.uint64(2)) & np.uint64(0x3333333333333333)))
+    words = (words + (words >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((words * np.uint64(0x0101010101010101))
+            >> np.uint64(56)).astype(np.int64)
+
+
+def rotate(words: np.ndarray, shift: int, n_days: int) -> np.ndarray:
+    """Rotate the n_days lowest bits of each word, so that bit d of the
+    result is bit (d + shift) % n_days of words."""
+    shift %= n_days
+    if shift == 0:
+        return words.copy()
+    full = (_ONE << np.uint64(n_days)) - _ONE if n_days < 64 else ~np.uint64(0)
+    return ((words >> np.uint64(shift))
+            | (words << np.uint64(n_days - shift))) & full
+
+
+def service_frequency_violation(visits: np.ndarray,
+                                required_services: np.ndarray) -> np.ndarray:
+    """Number of missing or surplus visits.
+
+    Args:
+        visits (np.ndarray): Packed visits of shape (..., n_installations).
+        required_services (np.array): Required service frequency for each
+            installation.
+
+    Returns:
+        np.ndarray: Violation for each individual.
+    """
+    return np.abs(popcount(visits) - required_services).sum(axis=-1)
+
+
+def max_sailing_days_violation(departures: np.ndarray,
+                               n_days_available: np.ndarray) -> np.ndarray:
+    """Number of days vessels sail beyond the days they are available.
+
+    Args:
+        departures (np.ndarray): Packed departures of shape
+            (..., n_vessels).
+        n_days_available (np.array): Days available for each vessel.
+
+    Returns:
+        np.ndarray: Violation for each individual.
+    """
+    return np.maximum(popcount(departures) - n_days_available,
+                      0).sum(axis=-1)
+
+
+def max_pvs_prepared_violation(departures: np.ndarray,
+                               max_v_prepared: np.ndarray) -> np.ndarray:
+    """Number of departures beyond what the supply depot can prepare.
+
+    The departures of each day are counted without unpacking, in binary with
+    one word per bit: bit d of word k is bit k of the count of day d. Each
+    vessel is added with a ripple carry, the limits are subtracted with a
+    ripple borrow, and the positive differences are summed with popcounts.
+
+    Args:
+        departures (np.ndarray): Packed departures of shape
+            (..., n_vessels).
+        max_v_prepared (np.array): Vessels the depot can prepare each day,
+            one entry for each day in period.
+
+    Returns:
+        np.ndarray: Violation for each individual.
+    """
+    max_v_prepared = np.asarray(max_v_prepared, dtype=np.int64)
+    n_bits = int(max(departures.shape[-1], max_v_prepared.max())).bit_length()
+
+    counts = [np.zeros(departures.shape[:-1], dtype=np.uint64)
+              for _ in range(n_bits)]
+    for vessel in range(departures.shape[-1]):
+        carry = departures[..., vessel]
+        for k in range(n_bits):
+            counts[k], carry = counts[k] ^ carry, counts[k] & carry
+
+    limits = pack((max_v_prepared >> np.arange(n_bits)[:, None]) & 1 > 0)
+    borrow = np.zeros(departures.shape[:-1], dtype=np.uint64)
+    differences = []
+    for count, limit in zip(counts, limits):
+        differences.append(count ^ limit ^ borrow)
+        borrow = (~count & limit) | (~(count ^ limit) & borrow)
+
+    violation = np.zeros(departures.shape[:-1], dtype=np.int64)
+    for k, difference in enumerate(differences):
+        # Days with a borrow out have fewer departures than the limit
+        violation += popcount(difference & ~borrow) << k
+    return violation
+
+
+def voyage_overlap_violation(departures: np.ndarray,
+                             n_days: int,
+                             voyage_duration: int = 1) -> np.ndarray:
+    """Number of days vessels depart before returning from their previous
+    voyage.
+
+    A departure followed by the next one after gap days overlaps by
+    max(voyage_duration - 1 - gap, 0) days, which is the number of
+    k = 1, ..., voyage_duration - 1 with another departure within k days.
+
+    Args:
+        departures (np.ndarray): Packed departures of shape
+            (..., n_vessels).
+        n_days (int): Number of days in period.
+        voyage_duration (int): Days each voyage takes.
+
+    Returns:
+        np.ndarray: Violation for each individual.
+    """
+    overlap = np.zeros(departures.shape[:-1], dtype=np.int64)
+    within = np.zeros_like(departures)
+    for k in range(1, voyage_duration):
+        within |= rotate(departures, k, n_days)
+        overlap += popcount(departures & within).sum(axis=-1)
+    return overlap
+
+
+def installation_spread_violation(visits: np.ndarray,
+                                  n_days: int,
+                                  required_services: np.ndarray
+                                  ) -> np.ndarray:
+    """Number of days the gaps between consecutive services of each
+    installation fall outside the limits from
+    `constraints.calculate_spread_limits`.
+
+    A service followed by the next one after gap days violates the limits by
+    max(Pf_min - gap, 0) + max(gap - Pf_max, 0) days. With another service
+    within j days, the first term counts the j <= Pf_min, and the second the
+    j = Pf_max + 1, ..., n_days - 1 without one.
+
+    Args:
+        visits (np.ndarray): Packed visits of shape (..., n_installations).
+        n_days (int): Number of days in period.
+        required_services (np.array): Required service frequency for each
+            installation.
+
+    Returns:
+        np.ndarray: Violation for each installation, shape visits.shape.
+    """
+    Pf_min, Pf_max = calculate_spread_limits(n_days, required_services)
+    spread = np.zeros(visits.shape, dtype=np.int64)
+    within = np.zeros_like(visits)
+    for j in range(1, n_days):
+        within |= rotate(visits, j, n_days)
+        spread += np.where(j <= Pf_min, popcount(visits & within), 0)
+        spread += np.where(j > Pf_max, popcount(visits & ~within), 0)
+    return spread
+
+
+def departure_spread_violation(visits: np.ndarray,
+                               n_days: int,
+                               required_services: np.ndarray) -> np.ndarray:
+    """Number of days the gaps between consecutive services fall outside the
+    spread limits, see `installation_spread_violation`.
+
+    Returns:
+        np.ndarray: Violation for each individual.
+    """
+    return installation_spread_violation(visits, n_days,
+                                         required_services).sum(axis=-1)
@@ -1,8 +1,289 @@
 import numpy as np
 
+from psvpp_solver.loads import demand_table
+from psvpp_solver.loads import voyage_loads as calculate_voyage_loads
+
+
+# Order of the constraints in violation vectors returned by
+# calculate_constraint_violations
+CONSTRAINT_NAMES = ("service_frequency",
+                    "max_sailing_days",
+                    "max_pvs_prepared",
+                    "voyage_overlap",
+                    "departure_spread",
+                    "deck_capacity")
+N_CONSTRAINTS = len(CONSTRAINT_NAMES)
+
+
+def calculate_spread_limits(days_in_period: int,
+                            required_services: np.ndarray) -> tuple:
+    """Calculate the minimum and maximum number of days between consecutive
+    services of each installation.
+
+    Args:
+        days_in_period (int): Number of days in period.
+        required_services (np.array): Required service frequency for each
+            installation.
+
+    Returns:
+        tuple: Arrays (Pf_min, Pf_max), one entry for each installation.
+    """
+    required_services = np.asarray(required_services)
+    Pf_max = days_in_period // required_services
+    # If division is even, space between services is equal
+    even = Pf_max * required_services == days_in_period
+    Pf_max = np.where(even, Pf_max - 1, Pf_max)
+    Pf_min = np.where(even, Pf_max, Pf_max - 1)
+    return Pf_min, Pf_max
+
+
+def _cyclic_gaps(mask: np.ndarray, return_previous: bool = False) -> tuple:
+    """Find the number of days between consecutive True entries of each row
+    of a boolean (..., n_rows, n_days) array, wrapping around the period.
+
+    Returns:
+        tuple: (rows, gaps), where rows is the index of the row in the
+            flattened (-1, n_days) array each gap belongs to, and gaps the
+            number of days between a True entry and the previous one. With
+            return_previous, also the day of the previous entry.
+    """
+    n_days = mask.shape[-1]
+    rows, days = np.nonzero(mask.reshape(-1, n_days))
+
+    # np.nonzero returns entries sorted by row, then day
+    new_row = np.empty(len(rows), dtype=bool)
+    new_row[:1] = True
+    np.not_equal(rows[1:], rows[:-1], out=new_row[1:])
+    last_in_row = np.roll(new_row, -1)
+
+    previous = np.roll(days, 1)
+    # First entry in each row follows the last entry from the previous period
+    previous[new_row] = days[last_in_row] - n_days
+
+    if return_previous:
+        return rows, days - previous - 1, previous % n_days
+    return rows, days - previous - 1
+
+
+def _sum_per_group(values: np.ndarray,
+                   rows: np.ndarray,
+                   group_size: int,
+                   shape: tuple) -> np.ndarray:
+    """Sum values belonging to rows into groups of group_size consecutive
+    rows, e.g. one group of n_vessels rows per individual."""
+    n_groups = int(np.prod(shape, dtype=int))
+    return np.bincount(rows // group_size,
+                       weights=values,
+                       minlength=n_groups).reshape(shape)
+
+
+def service_frequency_violation(visits: np.ndarray,
+                                required_services: np.ndarray) -> np.ndarray:
+    """Number of missing or surplus visits.
+
+    Args:
+        visits (np.ndarray): Boolean array of shape
+            (..., n_installations, n_days).
+        required_services (np.array): Required service frequency for each
+            installation.
+
+    Returns:
+        np.ndarray: Violation for each individual, shape visits.shape[:-2].
+    """
+    return np.abs(visits.sum(axis=-1) - required_services).sum(axis=-1)
+
+
+def max_sailing_days_violation(departures: np.ndarray,
+                               n_days_available: np.ndarray,
+                               voyage_durations: np.ndarray = None
+                               ) -> np.ndarray:
+    """Number of days vessels sail beyond the days they are available.
+
+    Args:
+        departures (np.ndarray): Boolean array of shape
+            (..., n_vessels, n_days).
+        n_days_available (np.array): Days available for each vessel.
+        voyage_durations (np.ndarray): Days each voyage takes, of the same
+            shape as departures and zero where no voyage departs, see
+            `durations.voyage_durations`. Voyages take one day by default.
+
+    Returns:
+        np.ndarray: Violation for each individual.
+    """
+    if voyage_durations is None:
+        days_chartered = departures.sum(axis=-1)
+    else:
+        days_chartered = voyage_durations.sum(axis=-1)
+    return np.maximum(days_chartered - n_days_available, 0).sum(axis=-1)
+
+
+def max_pvs_prepared_violation(departures: np.ndarray,
+                               max_v_prepared: np.ndarray) -> np.ndarray:
+    """Number of departures beyond what the supply depot can prepare.
+
+    Args:
+        departures (np.ndarray): Boolean array of shape
+            (..., n_vessels, n_days).
+        max_v_prepared (np.array): Vessels the depot can prepare each day.
+
+    Returns:
+        np.ndarray: Violation for each individual.
+    """
+    n_prepared = departures.sum(axis=-2)
+    return np.maximum(n_prepared - max_v_prepared, 0).sum(axis=-1)
+
+
+def voyage_overlap_violation(departures: np.ndarray,
+                             voyage_duration: int = 1) -> np.ndarray:
+    """Number of days vessels depart before returning from their previous
+    voyage. A vessel can depart the day after returning.
+
+    Args:
+        departures (np.ndarray): Boolean array of shape
+            (..., n_vessels, n_days).
+        voyage_duration: Days each voyage takes, or an array of the same
+            shape as departures with the days of each voyage, see
+            `durations.voyage_durations`.
+
+    Returns:
+        np.ndarray: Violation for each individual.
+    """
+    rows, gaps, previous = _cyclic_gaps(departures, return_previous=True)
+    if np.ndim(voyage_duration) > 0:
+        # Duration of the voyage departing before each gap
+        voyage_duration = np.reshape(voyage_duration,
+                                     (-1, departures.shape[-1]))[rows,
+                                                                 previous]
+    overlap = np.maximum(voyage_duration - 1 - gaps, 0)
+    return _sum_per_group(overlap,
+                          rows,
+                          departures.shape[-2],
+                          departures.shape[:-2])
+
+
+def deck_capacity_violation(voyage_loads: np.ndarray,
+                            deck_capacities: np.ndarray) -> np.ndarray:
+    """Load carried beyond the deck capacity of the vessels.
+
+    Args:
+        voyage_loads (np.ndarray): Load of each voyage, of shape
+            (..., n_vessels, n_days), see `loads.voyage_loads`.
+        deck_capacities (np.array): Deck capacity of each vessel.
+
+    Returns:
+        np.ndarray: Violation for each individual.
+    """
+    excess = np.maximum(voyage_loads - np.asarray(deck_capacities)[:, None],
+                        0)
+    return excess.sum(axis=(-2, -1))
+
+
+def installation_spread_violation(visits: np.ndarray,
+                                  required_services: np.ndarray
+                                  ) -> np.ndarray:
+    """Number of days the gaps between consecutive services of each
+    installation fall outside the spread limits from
+    `calculate_spread_limits`.
+
+    Args:
+        visits (np.ndarray): Boolean array of shape
+            (..., n_installations, n_days).
+        required_services (np.array): Required service frequency for each
+            installation.
+
+    Returns:
+        np.ndarray: Violation for each installation, shape visits.shape[:-1].
+    """
+    n_installations = visits.shape[-2]
+    Pf_min, Pf_max = calculate_spread_limits(visits.shape[-1],
+                                             required_services)
+
+    rows, gaps = _cyclic_gaps(visits)
+    installation = rows % n_installations
+    spread = (np.maximum(Pf_min[installation] - gaps, 0)
+              + np.maximum(gaps - Pf_max[installation], 0))
+    return _sum_per_group(spread, rows, 1, visits.shape[:-1])
+
+
+def departure_spread_violation(visits: np.ndarray,
+                               required_services: np.ndarray) -> np.ndarray:
+    """Number of days the gaps between consecutive services fall outside the
+    spread limits from `calculate_spread_limits`.
+
+    Args:
+        visits (np.ndarray): Boolean array of shape
+            (..., n_installations, n_days).
+        required_services (np.array): Required service frequency for each
+            installation.
+
+    Returns:
+        np.ndarray: Violation for each individual.
+    """
+    return installation_spread_violation(visits,
+                                         required_services).sum(axis=-1)
+
+
+def calculate_constraint_violations(visits: np.ndarray,
+                                    departures: np.ndarray,
+                                    required_services: np.ndarray,
+                                    max_v_prepared: np.ndarray,
+                                    n_days_available: np.ndarray,
+                                    voyage_durations: np.ndarray = None,
+                                    voyage_loads: np.ndarray = None,
+                                    deck_capacities: np.ndarray = None,
+                                    ) -> np.ndarray:
+    """Calculate how much a schedule, or a population of schedules, violates
+    each constraint.
+
+    Entries are ordered as in `CONSTRAINT_NAMES`, and are zero when the
+    constraint is satisfied. The amounts are used directly as penalty terms
+    in the penalized cost (p. 131). Nothing is printed, so this is safe to
+    use in the hot path of the search.
+
+    Args:
+        visits (np.ndarray): Boolean array of shape
+            (..., n_installations, n_days).
+        departures (np.ndarray): Boolean array of shape
+            (..., n_vessels, n_days).
+        required_services (np.array): Required service frequency for each
+            installation.
+        max_v_prepared (np.array): Vessels the depot can prepare each day.
+        n_days_available (np.array): Days available for each vessel.
+        voyage_durations (np.ndarray): Days each voyage takes, of the same
+            shape as departures, see `durations.voyage_durations`. Voyages
+            take one day by default.
+        voyage_loads (np.ndarray): Load of each voyage, of the same shape as
+            departures, see `loads.voyage_loads`. Deck capacity is only
+            checked when both loads and capacities are given.
+        deck_capacities (np.array): Deck capacity of each vessel.
+
+    Returns:
+        np.ndarray: Array of shape (..., N_CONSTRAINTS).
+    """
+    if voyage_loads is None or deck_capacities is None:
+        deck_capacity = np.zeros(departures.shape[:-2])
+    else:
+        deck_capacity = deck_capacity_violation(voyage_loads,
+                                                deck_capacities)
+    return np.stack(
+        (service_frequency_violation(visits, required_services),
+         max_sailing_days_violation(departures, n_days_available,
+                                    voyage_durations),
+         max_pvs_prepared_violation(departures, max_v_prepared),
+         voyage_overlap_violation(departures, 1 if voyage_durations is None
+                                  else voyage_durations),
+         departure_spread_violation(visits, required_services),
+         deck_capacity),
+        axis=-1).astype(float)
+
+
+def is_feasible(violations: np.ndarray) -> np.ndarray:
+    """Whether each schedule satisfies all constraints, given violations
+    from `calculate_constraint_violations`."""
+    return ~np.any(violations > 0, axis=-1)
+
 
 # TODO: docstring and type hints
-# TODO: numba function?
 def check_departures_sufficiently_spread(visits,
                                          days_in_period: int,
                                          required_services,
@@ -11,37 +292,21 @@ def check_departures_sufficiently_spread(visits,
                                          print_output=False
                                          ):
     # (6) Make sure departures to each installation are properly spread
-    for inst, services in enumerate(visits):
-
-        # Translate to day visited
-        services = np.where(services)[0]
-
-        # Min and max distance between visits
-        Pf_max = days_in_period // required_services[inst]
-        # If division is even, space between services is equal
-        if Pf_max == days_in_period / required_services[inst]:
-            Pf_min = Pf_max = Pf_max - 1
-        else:
-            Pf_min = Pf_max - 1
-
-        prev = services[-1] - days_in_period
-        for day in services:
-            # Check diff within constraints
-            days_between = day - prev - 1  # Number of days between services
-            if days_between < Pf_min or days_between > Pf_max:
-                if print_output:
-                    print('day', day, 'prev', prev)
-                    print('Services not sufficiently spread for  installation',
-                          inst + 1)
-                    if routes != "":
-                        print("routes", routes, sep="\n")
-                    print("visits", visits*1, sep="\n")
-                    if departures != "":
-                        print("departures", departures*1, sep="\n")
-                return False
-
-            prev = day
-        # TODO: Check spread between last and first service day
+    Pf_min, Pf_max = calculate_spread_limits(days_in_period,
+                                             required_services)
+    rows, gaps = _cyclic_gaps(visits)
+    not_spread = (gaps < Pf_min[rows]) | (gaps > Pf_max[rows])
+
+    if np.any(not_spread):
+        if print_output:
+            print('Services not sufficiently spread for installation(s)',
+                  np.unique(rows[not_spread]) + 1)
+            if routes != "":
+                print("routes", routes, sep="\n")
+            print("visits", visits*1, sep="\n")
+            if departures != "":
+                print("departures", departures*1, sep="\n")
+        return False
     return True
 
 
@@ -71,12 +336,15 @@ def check_correct_service_frequencies(visits,
 def check_max_sailing_days_constraint(n_days_available,
                                       routes,
                                       visits,
-                                      departures):
+                                      departures,
+                                      voyage_durations=None):
     # TODO: docstring and type hints
 
     # (3) Ensure PSVs do not sail more days than allowed
-    # Assumes any voyage takes one day
-    days_chartered = np.array(routes[:, :, 0] > 0, dtype=bool).sum(axis=1)
+    # Voyages take one day unless their durations are given
+    if voyage_durations is None:
+        voyage_durations = np.array(routes[:, :, 0] > 0, dtype=bool)
+    days_chartered = voyage_durations.sum(axis=1)
 
     if (np.any(days_chartered > n_days_available)):
 
@@ -115,33 +383,46 @@ def check_max_pvs_prepared_constraint(departures,
 def check_voyages_dont_overlap(departures,
                                days_in_period,
                                routes,
-                               visits):
+                               visits,
+                               voyage_durations=None):
     # (5) PSV cannot begin a voyage before returning from its previous one
-    prev_depart = None
-    for vessel, departures_v in enumerate(departures):
-        # Translate to day of departure
-        departures_v = np.where(departures_v)[0]
-        prev_depart = departures_v[-1] - days_in_period
-        for departure_day in departures_v:
-            # Assumes all journeys are 1 day long and can sail the day after
-            #  returning.
-
-            # Check that there is one day between departures
-            if departure_day - prev_depart < 1:
-                print("Not enough time between journeys departing on day "
-                      "{prev_depart} and {departure_day}, for psv {vessel}"
-                      ".".format(prev_depart=prev_depart + 1,
-                                 departure_day=departure_day + 1,
-                                 vessel=vessel + 1,)
-                      )
-                print("routes", routes,
-                      "visits", visits*1,
-                      "departures", departures*1,
-                      sep="\n"
-                      )
-                return False
-
-            prev_depart = departure_day
+    # Journeys are 1 day long unless their durations are given, and can sail
+    #  the day after returning.
+    rows, gaps, previous = _cyclic_gaps(departures, return_previous=True)
+    duration = 1 if voyage_durations is None else voyage_durations[rows,
+                                                                   previous]
+    overlapping = gaps < duration - 1
+
+    if np.any(overlapping):
+        print("Not enough time between journeys for psv(s)",
+              np.unique(rows[overlapping]) + 1)
+        print("routes", routes,
+              "visits", visits*1,
+              "departures", departures*1,
+              sep="\n"
+              )
+        return False
+    return True
+
+
+def check_deck_capacity_constraint(voyage_loads,
+                                   deck_capacities,
+                                   routes,
+                                   visits,
+                                   departures):
+    # (7) Voyages must fit on the deck of their vessel
+    overloaded = voyage_loads > np.asarray(deck_capacities)[:, None]
+
+    if np.any(overloaded):
+        vessels, days = np.nonzero(overloaded)
+        print("Deck capacity exceeded for psv(s)", vessels + 1,
+              "on day(s)", days + 1)
+        print("routes", routes,
+              "visits", visits*1,
+              "departures", departures*1,
+              sep="\n"
+              )
+        return False
     return True
 
 
@@ -153,6 +434,10 @@ def check_constraints_satisfied(
         max_v_prepared=np.array([2, 2, 2, 1]),
         n_days_available=np.array([2, 2]),
         days_in_period=4,
+        verbose=False,
+        voyage_durations=None,
+        demands=None,
+        deck_capacities=None,
 ) -> bool:
     """Check that the given schedule passes the given constraints.
 
@@ -189,7 +474,30 @@ def check_constraints_satisfied(
             distance of voyages.
         max_v_prepared (list[int]): How many vessels the installations can
             prepare for departure in day i, list of len days_in_period.
+        verbose (bool): Print which constraint fails, and the schedule.
+        voyage_durations (np.ndarray): Days each voyage takes, see
+            `durations.voyage_durations`. Voyages take one day by default.
+        demands (np.array): Demand delivered on each visit to each
+            installation, to check deck capacity.
+        deck_capacities (np.array): Deck capacity of each vessel.
     """
+    voyage_loads = None
+    if demands is not None:
+        voyage_loads = calculate_voyage_loads(routes, demand_table(demands))
+    violations = calculate_constraint_violations(visits,
+                                                 departures,
+                                                 required_services,
+                                                 max_v_prepared,
+                                                 n_days_available,
+                                                 voyage_durations,
+                                                 voyage_loads,
+                                                 deck_capacities)
+    if is_feasible(violations):
+        return True
+    if not verbose:
+        return False
+
+    # Rerun the checks one by one to print the first failing constraint
     if not check_correct_service_frequencies(visits,
                                              required_services,
                                              departures,
@@ -199,28 +507,37 @@ def check_constraints_satisfied(
     if not check_max_sailing_days_constraint(n_days_available,
                                              routes,
                                              visits,
-                                             departures):
+                                             departures,
+                                             voyage_durations):
         return False
 
     if not check_max_pvs_prepared_constraint(departures,
                                              max_v_prepared,
                                              routes,
-                                             visits
+                                             visits,
+                                             verbose=True
                                              ):
         return False
 
     if not check_voyages_dont_overlap(departures,
                                       days_in_period,
                                       routes,
-                                      visits):
+                                      visits,
+                                      voyage_durations):
         return False
 
-    if not (check_departures_sufficiently_spread(visits,
-                                                 days_in_period,
-                                                 required_services,
-                                                 routes,
-                                                 departures)):
+    if (voyage_loads is not None and deck_capacities is not None
+            and not check_deck_capacity_constraint(voyage_loads,
+                                                   deck_capacities,
+                                                   routes,
+                                                   visits,
+                                                   departures)):
         return False
 
-    # All checks pass
-    return True
+    check_departures_sufficiently_spread(visits,
+                                         days_in_period,
+                                         required_services,
+                                         routes,
+                                         departures,
+                                         print_output=True)
+    return False
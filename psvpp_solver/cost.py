@@ -0,0 +1,655 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from psvpp_solver.constraints import N_CONSTRAINTS
+from psvpp_solver.constraints import calculate_constraint_violations
+from psvpp_solver.durations import voyage_durations
+from psvpp_solver.loads import demand_table
+from psvpp_solver.loads import voyage_loads
+from psvpp_solver.instance import Instance
+from psvpp_solver.instance import vessel_arc_costs
+
+
+class PopulationCostEvaluator:
+    """Calculate the planning period cost of a whole population of schedules
+    in one vectorized pass.
+
+    Gives the same cost as calling `utils.calculate_cost_of_route` on each
+    individual, but the padded routes, leg indexes and leg costs are kept in
+    buffers that are reused between calls, so scoring a generation does not
+    allocate new arrays for every individual. Each leg is looked up in the
+    vessel scaled arc cost table of `instance.vessel_arc_costs`, so no
+    product with the sailing costs is needed.
+
+    Example:
+
+        evaluator = PopulationCostEvaluator(weekly_charter_costs,
+                                            sailing_costs,
+                                            distances)
+        costs = evaluator(population)  # population.shape == (P, V, D, I)
+
+    Args:
+        weekly_charter_costs (np.array): One entry for each vessel.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): (n_installations + 1) x (n_installations + 1)
+            array with distances between the depot (index 0) and
+            installations.
+        arc_costs (np.ndarray): Precomputed arc cost table, e.g. from an
+            `instance.Instance`. Computed from the costs and distances by
+            default.
+    """
+
+    def __init__(self,
+                 weekly_charter_costs: np.ndarray,
+                 sailing_costs: np.ndarray,
+                 distances: np.ndarray,
+                 arc_costs: np.ndarray = None):
+        self.weekly_charter_costs = np.asarray(weekly_charter_costs)
+        self.sailing_costs = np.asarray(sailing_costs)
+        self.distances = np.ascontiguousarray(distances)
+        if arc_costs is None:
+            arc_costs = vessel_arc_costs(self.sailing_costs, self.distances)
+        self.arc_costs = np.ascontiguousarray(arc_costs)
+
+        self._n_nodes = len(self.distances)
+        self._flat_distances = self.distances.ravel()
+        self._flat_arc_costs = self.arc_costs.ravel()
+        self._total_charter_cost = np.sum(self.weekly_charter_costs)
+        # Start of the table of each vessel in the flattened arc costs
+        self._vessel_offsets = (np.arange(len(self.sailing_costs))
+                                * self._n_nodes ** 2)[:, None, None]
+
+        # Buffers are allocated on first use and grown when a larger
+        # population is evaluated
+        self._padded = None
+        self._index = None
+        self._legs = None
+
+    @classmethod
+    def from_instance(cls, instance: Instance, **kwargs):
+        """Create an evaluator using the tables of an instance."""
+        return cls(instance.weekly_charter_costs,
+                   instance.sailing_costs,
+                   instance.distances,
+                   arc_costs=instance.arc_costs,
+                   **kwargs)
+
+    def _get_buffers(self, shape: tuple) -> tuple:
+        """Return buffer views fitting a population of the given shape."""
+        pop_size, n_vessels, n_days, n_installations = shape
+
+        if (self._padded is None
+                or self._padded.shape[0] < pop_size
+                or self._padded.shape[1:] != (n_vessels,
+                                              n_days,
+                                              n_installations + 2)):
+            # Routes padded with a depot visit (zero) at both ends. The
+            # padding is never written to, so it stays zero between calls.
+            self._padded = np.zeros((pop_size, n_vessels, n_days,
+                                     n_installations + 2),
+                                    dtype=np.intp)
+            self._index = np.empty((pop_size, n_vessels, n_days,
+                                    n_installations + 1),
+                                   dtype=np.intp)
+            self._legs = np.empty(self._index.shape,
+                                  dtype=self.arc_costs.dtype)
+
+        return (self._padded[:pop_size],
+                self._index[:pop_size],
+                self._legs[:pop_size])
+
+    def _leg_index(self, population: np.ndarray) -> np.ndarray:
+        """Copy the population into the padded buffer and return the index
+        of each leg into the flattened distances matrix, pairing each
+        installation (or the depot) with the one visited before it."""
+        padded, index, _ = self._get_buffers(population.shape)
+        padded[..., 1:-1] = population
+        np.multiply(padded[..., 1:], self._n_nodes, out=index)
+        np.add(index, padded[..., :-1], out=index)
+        return index
+
+    def sailing_distances(self, population: np.ndarray) -> np.ndarray:
+        """Calculate the sailing distance of each vessel in each individual.
+
+        Args:
+            population (np.ndarray): Routes of shape
+                (pop_size, n_vessels, n_days, n_installations).
+
+        Returns:
+            np.ndarray: Array of shape (pop_size, n_vessels).
+        """
+        index = self._leg_index(population)
+        return np.sum(np.take(self._flat_distances, index), axis=(3, 2))
+
+    def sailing_cost(self, population: np.ndarray) -> np.ndarray:
+        """Calculate the sailing cost of each individual.
+
+        Args:
+            population (np.ndarray): Routes of shape
+                (pop_size, n_vessels, n_days, n_installations).
+
+        Returns:
+            np.ndarray: Array of shape (pop_size,).
+        """
+        index = self._leg_index(population)
+        legs = self._legs[:len(population)]
+        # Index into the table of the vessel sailing each leg
+        np.add(index, self._vessel_offsets, out=index)
+        np.take(self._flat_arc_costs, index, out=legs)
+        # Explicit leg count, as -1 can not be inferred for no individuals
+        n_legs = int(np.prod(legs.shape[1:]))
+        return np.sum(legs.reshape(len(population), n_legs), axis=1,
+                      dtype=np.float64)
+
+    def __call__(self, population: np.ndarray) -> np.ndarray:
+        """Calculate the cost of each individual in the population.
+
+        Args:
+            population (np.ndarray): Routes of shape
+                (pop_size, n_vessels, n_days, n_installations).
+
+        Returns:
+            np.ndarray: Array of shape (pop_size,) with the cost of each
+                individual.
+        """
+        return self._total_charter_cost + self.sailing_cost(population)
+
+
+class Fitness(NamedTuple):
+    """Cost terms of each individual in a population, as returned by
+    `FitnessEvaluator`."""
+    charter_cost: np.ndarray
+    sailing_cost: np.ndarray
+    violations: np.ndarray
+    penalties: np.ndarray
+    penalized_cost: np.ndarray
+
+    @property
+    def cost(self) -> np.ndarray:
+        """Unpenalized cost of each individual."""
+        return self.charter_cost + self.sailing_cost
+
+    @property
+    def feasible(self) -> np.ndarray:
+        """Whether each individual satisfies all constraints."""
+        return ~np.any(self.violations > 0, axis=-1)
+
+
+class AdaptivePenalty:
+    """Penalty weights for the penalized cost (p. 131), one for each
+    constraint in `constraints.CONSTRAINT_NAMES`.
+
+    The weights are adjusted to steer the share of individuals satisfying
+    each constraint towards a target: a weight is increased when too few
+    recent individuals satisfy its constraint, and decreased when too many
+    do.
+
+    Args:
+        initial_weights (np.array): Penalty per unit of violation of each
+            constraint.
+        target_feasible (float): Targeted share of individuals satisfying
+            each constraint.
+        tolerance (float): No adjustment is made while the share is within
+            this distance of the target.
+        increase (float): Factor to multiply weights by when increasing.
+        decrease (float): Factor to multiply weights by when decreasing.
+        min_weight (float): Lower bound of the weights.
+        max_weight (float): Upper bound of the weights.
+    """
+
+    def __init__(self,
+                 initial_weights: np.ndarray,
+                 target_feasible: float = 0.2,
+                 tolerance: float = 0.05,
+                 increase: float = 1.2,
+                 decrease: float = 0.85,
+                 min_weight: float = 1e-3,
+                 max_weight: float = 1e12):
+        self.weights = np.array(np.broadcast_to(initial_weights,
+                                                (N_CONSTRAINTS,)),
+                                dtype=float)
+        self.target_feasible = target_feasible
+        self.tolerance = tolerance
+        self.increase = increase
+        self.decrease = decrease
+        self.min_weight = min_weight
+        self.max_weight = max_weight
+
+    def update(self, violations: np.ndarray):
+        """Adjust the weights from the violations of recently evaluated
+        individuals.
+
+        Args:
+            violations (np.ndarray): Array of shape (n, N_CONSTRAINTS).
+        """
+        if len(violations) == 0:
+            return
+        satisfied = np.mean(violations == 0, axis=0)
+
+        self.weights[satisfied < self.target_feasible - self.tolerance] \
+            *= self.increase
+        self.weights[satisfied > self.target_feasible + self.tolerance] \
+            *= self.decrease
+        np.clip(self.weights, self.min_weight, self.max_weight,
+                out=self.weights)
+
+
+class FitnessEvaluator(PopulationCostEvaluator):
+    """Calculate cost, constraint violations and penalized cost of a
+    population in one pass over the routes.
+
+    The routes are copied once into the padded buffer of
+    `PopulationCostEvaluator`. Sailing legs, departures and visits are all
+    derived from that copy, so the feasibility checks do not need visits and
+    departures to be generated from the routes in separate passes.
+
+    Args:
+        weekly_charter_costs (np.array): One entry for each vessel.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+        required_services (np.array): Required service frequency for each
+            installation.
+        max_v_prepared (np.array): Vessels the depot can prepare each day.
+        n_days_available (np.array): Days available for each vessel.
+        penalty (AdaptivePenalty): Penalty weights. Defaults to weights equal
+            to the average weekly charter cost of a vessel, so a unit of
+            violation costs as much as chartering a vessel.
+        arc_costs (np.ndarray): Precomputed arc cost table, see
+            `PopulationCostEvaluator`.
+        vessel_speeds (np.array): Speed of each vessel, in distance per
+            hour, to check days chartered and overlap with the duration of
+            each voyage, see `durations`. Voyages take one day by default.
+        service_times (np.array): Hours spent at each installation.
+        hours_per_day (float): Working hours in a day.
+        demands (np.array): Demand delivered on each visit to each
+            installation, to check deck capacity, see `loads`.
+        deck_capacities (np.array): Deck capacity of each vessel.
+    """
+
+    def __init__(self,
+                 weekly_charter_costs: np.ndarray,
+                 sailing_costs: np.ndarray,
+                 distances: np.ndarray,
+                 required_services: np.ndarray,
+                 max_v_prepared: np.ndarray,
+                 n_days_available: np.ndarray,
+                 penalty: AdaptivePenalty = None,
+                 arc_costs: np.ndarray = None,
+                 vessel_speeds: np.ndarray = None,
+                 service_times: np.ndarray = None,
+                 hours_per_day: float = 24.0,
+                 demands: np.ndarray = None,
+                 deck_capacities: np.ndarray = None):
+        super().__init__(weekly_charter_costs, sailing_costs, distances,
+                         arc_costs)
+        self.required_services = np.asarray(required_services)
+        self.max_v_prepared = np.asarray(max_v_prepared)
+        self.n_days_available = np.asarray(n_days_available)
+        self.vessel_speeds = vessel_speeds
+        self.service_times = service_times
+        self.hours_per_day = hours_per_day
+        self.demands = demands
+        self.deck_capacities = (None if deck_capacities is None
+                                else np.asarray(deck_capacities,
+                                                dtype=float))
+        # Demand of each node, indexed by installation number
+        self._demand_table = (None if demands is None
+                              else demand_table(demands))
+        if penalty is None:
+            penalty = AdaptivePenalty(np.mean(self.weekly_charter_costs))
+        self.penalty = penalty
+
+        self._visits = None
+
+    @classmethod
+    def from_instance(cls, instance: Instance, **kwargs):
+        """Create an evaluator using the data and tables of an instance."""
+        return cls(instance.weekly_charter_costs,
+                   instance.sailing_costs,
+                   instance.distances,
+                   instance.required_services,
+                   instance.max_v_prepared,
+                   instance.n_days_available,
+                   arc_costs=instance.arc_costs,
+                   vessel_speeds=instance.vessel_speeds,
+                   service_times=instance.service_times,
+                   hours_per_day=instance.hours_per_day,
+                   demands=(None if instance.demands is None
+                            else instance.demands[1:]),
+                   deck_capacities=instance.deck_capacities,
+                   **kwargs)
+
+    def voyage_durations(self, routes: np.ndarray) -> np.ndarray:
+        """Days each voyage of routes takes, see
+        `durations.voyage_durations`, or None if voyages take one day."""
+        if self.vessel_speeds is None:
+            return None
+        return voyage_durations(routes, self.distances, self.vessel_speeds,
+                                self.service_times, self.hours_per_day)
+
+    def voyage_loads(self, routes: np.ndarray) -> np.ndarray:
+        """Load of each voyage of routes, see `loads.voyage_loads`, or None
+        without demands or deck capacities."""
+        if self._demand_table is None or self.deck_capacities is None:
+            return None
+        return voyage_loads(routes, self._demand_table)
+
+    def _get_visits_buffer(self, shape: tuple) -> np.ndarray:
+        """Return a zeroed visits buffer fitting a population of the given
+        shape."""
+        pop_size, _, n_days, n_installations = shape
+        if (self._visits is None
+                or self._visits.shape[0] < pop_size
+                or self._visits.shape[1:] != (n_installations, n_days)):
+            self._visits = np.zeros((pop_size, n_installations, n_days),
+                                    dtype=bool)
+        visits = self._visits[:pop_size]
+        visits[:] = False
+        return visits
+
+    def __call__(self, population: np.ndarray) -> Fitness:
+        """Evaluate each individual in the population.
+
+        Args:
+            population (np.ndarray): Routes of shape
+                (pop_size, n_vessels, n_days, n_installations).
+
+        Returns:
+            Fitness: Cost terms, each with pop_size as first dimension.
+        """
+        sailing_cost = self.sailing_cost(population)
+        routes = self._padded[:len(population), ..., 1:-1]
+
+        # A vessel departs on days where its first visit is not the depot
+        departures = routes[..., 0] > 0
+
+        # Scatter the visited installations into visits
+        visits = self._get_visits_buffer(population.shape)
+        individual, vessel, day, order = np.nonzero(routes)
+        installation = routes[individual, vessel, day, order] - 1
+        visits[individual, installation, day] = True
+
+        violations = calculate_constraint_violations(
+            visits,
+            departures,
+            self.required_services,
+            self.max_v_prepared,
+            self.n_days_available,
+            self.voyage_durations(routes),
+            self.voyage_loads(routes),
+            self.deck_capacities)
+        penalties = violations * self.penalty.weights
+        charter_cost = np.full(len(population), self._total_charter_cost)
+
+        return Fitness(charter_cost=charter_cost,
+                       sailing_cost=sailing_cost,
+                       violations=violations,
+                       penalties=penalties,
+                       penalized_cost=(charter_cost
+                                       + sailing_cost
+                                       + penalties.sum(axis=1)))
+
+
+def calculate_cost_of_population(population: np.ndarray,
+                                 weekly_charter_costs: np.ndarray,
+                                 sailing_costs: np.ndarray,
+                                 distances: np.ndarray) -> np.ndarray:
+    """Calculate the cost of each schedule in a population.
+
+    Convenience wrapper around `PopulationCostEvaluator` for one-off use.
+    Keep an evaluator around instead when scoring several generations.
+
+    Args:
+        population (np.ndarray): Routes of shape
+            (pop_size, n_vessels, n_days, n_installations).
+        weekly_charter_costs (np.array): One entry for each vessel.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): (n_installations + 1) x (n_installations + 1)
+            array with distances between the depot and installations.
+
+    Returns:
+        np.ndarray: Array of shape (pop_size,) with the cost of each
+            individual.
+    """
+    return PopulationCostEvaluator(weekly_charter_costs,
+                                   sailing_costs,
+                                   distances)(population)
+
+
+def calculate_voyage_distances(routes: np.ndarray,
+                               distances: np.ndarray) -> np.ndarray:
+    """Calculate the sailing distance of each voyage in a schedule.
+
+    The result is the per vessel, per day breakdown of the sailing distance
+    used by `calculate_cost_of_route`, and serves as the cache that the delta
+    cost functions below read and update.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (n_vessels, n_days, n_installations).
+        distances (np.array): (n_installations + 1) x (n_installations + 1)
+            array with distances between the depot and installations.
+
+    Returns:
+        np.ndarray: Array of shape (n_vessels, n_days) with the distance
+            sailed by each vessel on each day.
+    """
+    zero_padding = np.zeros_like(routes[:, :, 0:1])
+    return np.sum(distances[np.concatenate((routes, zero_padding), axis=2),
+                            np.concatenate((zero_padding, routes), axis=2)],
+                  axis=2)
+
+
+def get_voyage(routes: np.ndarray, vessel: int, day: int) -> np.ndarray:
+    """Return the installations visited on a voyage, without zero padding.
+    The result is a view into routes."""
+    voyage = routes[vessel, day]
+    return voyage[:np.count_nonzero(voyage)]
+
+
+def calculate_voyage_distance(voyage: np.ndarray, distances: np.ndarray):
+    """Distance of sailing from the depot through the given installations and
+    back, using the same leg orientation as `calculate_cost_of_route`.
+
+    Args:
+        voyage (np.ndarray): Installations visited, without zero padding.
+        distances (np.array): Distances between depot and installations.
+    """
+    if len(voyage) == 0:
+        return distances.dtype.type(0)
+    return (distances[voyage[0], 0]
+            + np.sum(distances[voyage[1:], voyage[:-1]])
+            + distances[0, voyage[-1]])
+
+
+def calculate_insertion_distances(voyage: np.ndarray,
+                                  installation: int,
+                                  distances: np.ndarray) -> np.ndarray:
+    """Calculate the added sailing distance of inserting an installation at
+    each position of a voyage.
+
+    Args:
+        voyage (np.ndarray): Installations visited, without zero padding.
+        installation (int): Installation to insert.
+        distances (np.array): Distances between depot and installations.
+
+    Returns:
+        np.ndarray: Array of length len(voyage) + 1, where entry i is the
+            added distance of inserting the installation before position i.
+    """
+    padded = np.zeros(len(voyage) + 2, dtype=np.intp)
+    padded[1:-1] = voyage
+    previous, following = padded[:-1], padded[1:]
+    return (distances[installation, previous]
+            + distances[following, installation]
+            - distances[following, previous])
+
+
+def calculate_swap_delta(routes: np.ndarray,
+                         voyage_distances: np.ndarray,
+                         vessel: int,
+                         day: int,
+                         i: int,
+                         j: int,
+                         sailing_costs: np.ndarray,
+                         distances: np.ndarray) -> float:
+    """Calculate the change in cost of swapping the installations at position
+    i and j of a voyage.
+
+    Only the affected voyage is read, so the cost of the move is linear in
+    the length of the voyage.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (n_vessels, n_days, n_installations).
+        voyage_distances (np.ndarray): Cached distances from
+            `calculate_voyage_distances`.
+        vessel (int): Index of the vessel sailing the voyage.
+        day (int): Index of the day of the voyage.
+        i (int): Position in voyage of the first installation.
+        j (int): Position in voyage of the second installation.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+
+    Returns:
+        float: Change in cost. Negative if the swap is an improvement.
+    """
+    voyage = get_voyage(routes, vessel, day).copy()
+    voyage[[i, j]] = voyage[[j, i]]
+
+    return ((calculate_voyage_distance(voyage, distances)
+             - voyage_distances[vessel, day])
+            * sailing_costs[vessel])
+
+
+def _relocated_voyages(routes: np.ndarray,
+                       from_vessel: int,
+                       from_day: int,
+                       position: int,
+                       to_vessel: int,
+                       to_day: int,
+                       insert_position: int) -> tuple:
+    """Return the origin and destination voyages after moving one visit."""
+    origin = get_voyage(routes, from_vessel, from_day)
+    installation = origin[position]
+    new_origin = np.delete(origin, position)
+
+    if (from_vessel, from_day) == (to_vessel, to_day):
+        new_destination = np.insert(new_origin, insert_position, installation)
+        return new_destination, new_destination
+
+    destination = get_voyage(routes, to_vessel, to_day)
+    if len(destination) == routes.shape[2]:
+        raise ValueError("Voyage of vessel {} on day {} has no room for "
+                         "another visit.".format(to_vessel, to_day))
+
+    new_destination = np.insert(destination, insert_position, installation)
+    return new_origin, new_destination
+
+
+def calculate_relocate_delta(routes: np.ndarray,
+                             voyage_distances: np.ndarray,
+                             from_vessel: int,
+                             from_day: int,
+                             position: int,
+                             to_vessel: int,
+                             to_day: int,
+                             insert_position: int,
+                             sailing_costs: np.ndarray,
+                             distances: np.ndarray) -> float:
+    """Calculate the change in cost of moving one visit from a voyage to
+    another voyage (another vessel and/or day), or to another position in the
+    same voyage.
+
+    Only the two affected voyages are read, so the cost of the move is linear
+    in the length of the voyages.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (n_vessels, n_days, n_installations).
+        voyage_distances (np.ndarray): Cached distances from
+            `calculate_voyage_distances`.
+        from_vessel (int): Vessel currently doing the visit.
+        from_day (int): Day the visit is currently done.
+        position (int): Position of the visit in its current voyage.
+        to_vessel (int): Vessel to do the visit.
+        to_day (int): Day to do the visit.
+        insert_position (int): Position of the visit in the new voyage,
+            counted after the visit has been removed from its current voyage.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+
+    Returns:
+        float: Change in cost. Negative if the move is an improvement.
+    """
+    new_origin, new_destination = _relocated_voyages(routes,
+                                                     from_vessel,
+                                                     from_day,
+                                                     position,
+                                                     to_vessel,
+                                                     to_day,
+                                                     insert_position)
+
+    if (from_vessel, from_day) == (to_vessel, to_day):
+        return ((calculate_voyage_distance(new_destination, distances)
+                 - voyage_distances[from_vessel, from_day])
+                * sailing_costs[from_vessel])
+
+    return ((calculate_voyage_distance(new_origin, distances)
+             - voyage_distances[from_vessel, from_day])
+            * sailing_costs[from_vessel]
+            + (calculate_voyage_distance(new_destination, distances)
+               - voyage_distances[to_vessel, to_day])
+            * sailing_costs[to_vessel])
+
+
+def _set_voyage(routes: np.ndarray,
+                voyage_distances: np.ndarray,
+                vessel: int,
+                day: int,
+                voyage: np.ndarray,
+                distances: np.ndarray):
+    """Write a voyage into routes and update its cached distance."""
+    routes[vessel, day] = 0
+    routes[vessel, day, :len(voyage)] = voyage
+    voyage_distances[vessel, day] = calculate_voyage_distance(voyage,
+                                                              distances)
+
+
+def apply_swap(routes: np.ndarray,
+               voyage_distances: np.ndarray,
+               vessel: int,
+               day: int,
+               i: int,
+               j: int,
+               distances: np.ndarray):
+    """Swap the installations at position i and j of a voyage in place and
+    update the cached voyage distance. See `calculate_swap_delta`."""
+    voyage = get_voyage(routes, vessel, day).copy()
+    voyage[[i, j]] = voyage[[j, i]]
+    _set_voyage(routes, voyage_distances, vessel, day, voyage, distances)
+
+
+def apply_relocate(routes: np.ndarray,
+                   voyage_distances: np.ndarray,
+                   from_vessel: int,
+                   from_day: int,
+                   position: int,
+                   to_vessel: int,
+                   to_day: int,
+                   insert_position: int,
+                   distances: np.ndarray):
+    """Move one visit to another voyage (or position) in place and update the
+    cached voyage distances. See `calculate_relocate_delta`."""
+    new_origin, new_destination = _relocated_voyages(routes,
+                                                     from_vessel,
+                                                     from_day,
+                                                     position,
+                                                     to_vessel,
+                                                     to_day,
+                                                     insert_position)
+    _set_voyage(routes, voyage_distances, from_vessel, from_day, new_origin,
+                distances)
+    _set_voyage(routes, voyage_distances, to_vessel, to_day, new_destination,
+                distances)
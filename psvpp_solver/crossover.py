@@ -0,0 +1,198 @@
+"""Crossover operator of the genetic search, following Borthen et al.
+
+The operator works on routes. The (vessel, day) pairs of the schedule are
+shuffled and split in three sets at two random cutoffs:
+
+    - Voyages in the first set are copied from parent 1.
+    - Voyages in the second set are copied from parent 2.
+    - Voyages in the third set get a random part of the parent 1 voyage, with
+      the parent 2 voyage appended.
+
+Installations already visited that day are skipped, so no installation is
+visited twice a day. Installations whose visits in the child do not meet the
+service frequency and spread requirements then get the visit days of one of
+the parents, see `repair_visit_patterns`.
+"""
+import numpy as np
+
+from psvpp_solver.constraints import installation_spread_violation
+from psvpp_solver.cost import calculate_insertion_distances
+from psvpp_solver.cost import get_voyage
+
+
+def _append_unvisited(child: np.ndarray,
+                      visited: np.ndarray,
+                      vessel: int,
+                      day: int,
+                      voyage: np.ndarray):
+    """Append the installations of voyage not yet visited on day to the
+    voyage of vessel in child."""
+    voyage = voyage[~visited[voyage - 1, day]]
+    length = np.count_nonzero(child[vessel, day])
+    child[vessel, day, length:length + len(voyage)] = voyage
+    visited[voyage - 1, day] = True
+
+
+def _remove_visit(routes: np.ndarray, vessel: int, day: int,
+                  installation: int):
+    """Remove an installation from a voyage, keeping zeros at the end."""
+    voyage = get_voyage(routes, vessel, day)
+    kept = voyage[voyage != installation]
+    routes[vessel, day] = 0
+    routes[vessel, day, :len(kept)] = kept
+
+
+def insert_visit(routes: np.ndarray,
+                 installation: int,
+                 day: int,
+                 vessels: np.ndarray,
+                 sailing_costs: np.ndarray,
+                 distances: np.ndarray):
+    """Insert a visit at the cheapest position among the voyages of the
+    given vessels on day.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (n_vessels, n_days, n_installations), updated in place.
+        installation (int): Installation number (index + 1) to visit.
+        day (int): Day of the visit.
+        vessels (np.ndarray): Candidate vessels.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+    """
+    best_cost, best_vessel, best_position = np.inf, None, None
+    for vessel in vessels:
+        added = (calculate_insertion_distances(get_voyage(routes, vessel, day),
+                                               installation,
+                                               distances)
+                 * sailing_costs[vessel])
+        position = np.argmin(added)
+        if added[position] < best_cost:
+            best_cost = added[position]
+            best_vessel, best_position = vessel, position
+
+    voyage = get_voyage(routes, best_vessel, day)
+    routes[best_vessel, day, :len(voyage) + 1] = np.insert(voyage,
+                                                           best_position,
+                                                           installation)
+
+
+def repair_visit_patterns(child: np.ndarray,
+                          child_visits: np.ndarray,
+                          parents: tuple,
+                          parent_visits: tuple,
+                          required_services: np.ndarray,
+                          sailing_costs: np.ndarray,
+                          distances: np.ndarray,
+                          rng: np.random.Generator):
+    """Give installations with wrong service frequency or spread in the
+    child the visit days of a randomly chosen parent.
+
+    Visits on days outside the new pattern are removed. Missing visits are
+    inserted at the cheapest position among the vessels departing that day,
+    or, if no vessel departs, in a new voyage of the vessel doing the visit
+    in the parent.
+
+    Args:
+        child (np.ndarray): Routes of the child, updated in place.
+        child_visits (np.ndarray): Visits of the child, updated in place.
+        parents (tuple): Routes of the two parents.
+        parent_visits (tuple): Visits of the two parents.
+        required_services (np.array): Required service frequency for each
+            installation.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+        rng (np.random.Generator): Random generator.
+    """
+    invalid = ((child_visits.sum(axis=1) != required_services)
+               | (installation_spread_violation(child_visits,
+                                                required_services) > 0))
+
+    for inst in np.nonzero(invalid)[0]:
+        parent = rng.integers(2)
+        pattern = parent_visits[parent][inst]
+        installation = inst + 1
+
+        for day in np.nonzero(child_visits[inst] & ~pattern)[0]:
+            for vessel in np.nonzero((child[:, day] == installation)
+                                     .any(axis=1))[0]:
+                _remove_visit(child, vessel, day, installation)
+
+        for day in np.nonzero(pattern & ~child_visits[inst])[0]:
+            vessels = np.nonzero(child[:, day, 0])[0]
+            if len(vessels) == 0:
+                vessels = np.nonzero((parents[parent][:, day] == installation)
+                                     .any(axis=1))[0][:1]
+            if len(vessels) == 0:
+                vessels = rng.integers(len(child), size=1)
+            insert_visit(child, installation, day, vessels, sailing_costs,
+                         distances)
+
+        child_visits[inst] = pattern
+
+
+def crossover(parent_1: np.ndarray,
+              parent_2: np.ndarray,
+              visits_1: np.ndarray,
+              visits_2: np.ndarray,
+              required_services: np.ndarray,
+              sailing_costs: np.ndarray,
+              distances: np.ndarray,
+              rng: np.random.Generator = None) -> np.ndarray:
+    """Create a child schedule from two parents.
+
+    Args:
+        parent_1 (np.ndarray): Routes of shape
+            (n_vessels, n_days, n_installations).
+        parent_2 (np.ndarray): Routes of the second parent.
+        visits_1 (np.ndarray): Visits of the first parent, with properly
+            spread service days.
+        visits_2 (np.ndarray): Visits of the second parent.
+        required_services (np.array): Required service frequency for each
+            installation.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+        rng (np.random.Generator): Random generator, or seed for one.
+
+    Returns:
+        np.ndarray: Routes of the child.
+    """
+    rng = np.random.default_rng(rng)
+    n_vessels, n_days, n_installations = parent_1.shape
+
+    # Step 0: Inheritance rule. Split the shuffled (vessel, day) pairs in
+    #  three sets at two random cutoffs.
+    pairs = rng.permutation(n_vessels * n_days)
+    n1, n2 = np.sort(rng.integers(0, len(pairs) + 1, size=2))
+    vessels, days = np.divmod(pairs, n_days)
+
+    child = np.zeros_like(parent_1)
+    visited = np.zeros((n_installations, n_days), dtype=bool)
+
+    # Step 1: Inherit voyages, or a random part of them, from parent 1
+    for k in range(n1):
+        _append_unvisited(child, visited, vessels[k], days[k],
+                          get_voyage(parent_1, vessels[k], days[k]))
+    for k in range(n2, len(pairs)):
+        voyage = get_voyage(parent_1, vessels[k], days[k])
+        start, stop = np.sort(rng.integers(0, len(voyage) + 1, size=2))
+        _append_unvisited(child, visited, vessels[k], days[k],
+                          voyage[start:stop])
+
+    # Step 2: Inherit voyages from parent 2, and fill up the partly
+    #  inherited voyages
+    for k in range(n1, len(pairs)):
+        _append_unvisited(child, visited, vessels[k], days[k],
+                          get_voyage(parent_2, vessels[k], days[k]))
+
+    # Step 3: Restore the service frequency and spread of each installation
+    repair_visit_patterns(child,
+                          visited,
+                          (parent_1, parent_2),
+                          (np.asarray(visits_1, dtype=bool),
+                           np.asarray(visits_2, dtype=bool)),
+                          required_services,
+                          sailing_costs,
+                          distances,
+                          rng)
+    return child
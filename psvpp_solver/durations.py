@@ -0,0 +1,83 @@
+"""Durations of multi-day voyages.
+
+A voyage sails its distance at the speed of its vessel and spends the service
+time of each installation it visits. It takes the number of days needed for
+those hours, at least one:
+
+    days = max(ceil((distance / speed + sum(service_times)) / hours_per_day),
+               1)
+
+Durations are stored in an integer array of the same (..., n_vessels, n_days)
+shape as the departures, zero where a vessel does not depart, and are used by
+`constraints.voyage_overlap_violation` and
+`constraints.max_sailing_days_violation` instead of assuming that every
+voyage takes one day.
+"""
+import numpy as np
+
+# Hours are rounded to whole days with this tolerance, so that a voyage of
+#  exactly a day does not take two because of floating point errors
+EPSILON = 1e-9
+
+
+def voyage_days(voyage_distances: np.ndarray,
+                service_hours: np.ndarray,
+                vessel_speeds: np.ndarray,
+                hours_per_day: float = 24.0) -> np.ndarray:
+    """Days taken by voyages of the given distances and service hours.
+    All arguments are broadcast against each other.
+
+    Args:
+        voyage_distances (np.ndarray): Distance sailed on each voyage.
+        service_hours (np.ndarray): Hours spent at installations on each
+            voyage.
+        vessel_speeds (np.ndarray): Speed of the vessel sailing each voyage,
+            in distance per hour.
+        hours_per_day (float): Working hours in a day.
+
+    Returns:
+        np.ndarray: Integer array with the days of each voyage.
+    """
+    hours = voyage_distances / vessel_speeds + service_hours
+    return np.maximum(np.ceil(hours / hours_per_day - EPSILON),
+                      1).astype(np.int64)
+
+
+def voyage_durations(routes: np.ndarray,
+                     distances: np.ndarray,
+                     vessel_speeds: np.ndarray,
+                     service_times: np.ndarray = None,
+                     hours_per_day: float = 24.0) -> np.ndarray:
+    """Calculate the duration of every voyage of a schedule or population.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (..., n_vessels, n_days, n_installations).
+        distances (np.array): Distances between depot and installations.
+        vessel_speeds (np.array): Speed of each vessel, in distance per hour.
+        service_times (np.array): Hours spent at each installation. No time
+            by default.
+        hours_per_day (float): Working hours in a day.
+
+    Returns:
+        np.ndarray: Integer array of shape (..., n_vessels, n_days) with the
+            days each voyage takes, zero where no voyage departs.
+    """
+    routes = np.asarray(routes, dtype=np.intp)
+    zero_padding = np.zeros_like(routes[..., 0:1])
+    legs = distances[np.concatenate((routes, zero_padding), axis=-1),
+                     np.concatenate((zero_padding, routes), axis=-1)]
+    voyage_distances = legs.sum(axis=-1)
+
+    if service_times is None:
+        service_hours = 0.0
+    else:
+        # Depot (index 0) takes no service time
+        service_hours = np.concatenate(
+            ([0.0], np.asarray(service_times, dtype=float)))[routes].sum(
+                axis=-1)
+
+    days = voyage_days(voyage_distances, service_hours,
+                       np.asarray(vessel_speeds, dtype=float)[:, None],
+                       hours_per_day)
+    return np.where(routes[..., 0] > 0, days, 0)
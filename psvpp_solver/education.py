@@ -0,0 +1,305 @@
+"""Local search based education of individuals (Borthen et al. section 4.6).
+
+Education improves a schedule in place with two kinds of moves, applied
+with first improvement in random order until no move improves the schedule:
+
+    - Relocate: Move a visit to the cheapest position among the voyages
+      sailing the same day, including its own voyage. Visit days are kept,
+      so service frequency and spread are unchanged.
+    - Reassign: Give a whole voyage to a vessel not sailing that day.
+
+Both moves are scored with the change in sailing cost, from the delta cost
+functions in `cost`, so each move only reads the voyages it changes, plus
+the change in the penalties of the constraints they affect:
+
+    - Days chartered and overlap, for reassign moves, and for relocate moves
+      when vessel speeds make voyage durations depend on the visits.
+    - Deck capacity, for both moves when demands and deck capacities are
+      given.
+"""
+import numpy as np
+
+from psvpp_solver.constraints import CONSTRAINT_NAMES
+from psvpp_solver.constraints import max_sailing_days_violation
+from psvpp_solver.constraints import voyage_overlap_violation
+from psvpp_solver.cost import FitnessEvaluator
+from psvpp_solver.cost import apply_relocate
+from psvpp_solver.cost import calculate_insertion_distances
+from psvpp_solver.cost import calculate_voyage_distance
+from psvpp_solver.cost import calculate_voyage_distances
+from psvpp_solver.cost import get_voyage
+from psvpp_solver.durations import voyage_days
+
+# Moves must improve the cost by more than this to be applied
+EPSILON = 1e-9
+
+_MAX_SAILING_DAYS = CONSTRAINT_NAMES.index("max_sailing_days")
+_VOYAGE_OVERLAP = CONSTRAINT_NAMES.index("voyage_overlap")
+_DECK_CAPACITY = CONSTRAINT_NAMES.index("deck_capacity")
+
+
+def _relocate_visit(routes: np.ndarray,
+                    voyage_distances: np.ndarray,
+                    vessel: int,
+                    day: int,
+                    position: int,
+                    evaluator: FitnessEvaluator,
+                    weights: np.ndarray,
+                    departures: np.ndarray,
+                    durations: np.ndarray = None,
+                    penalty: float = 0.0,
+                    loads: np.ndarray = None) -> bool:
+    """Move a visit to its cheapest position among the voyages on the same
+    day, if that improves the cost. With durations, the days chartered and
+    overlap penalties of the changed voyage durations are added to the cost
+    of each move, and with loads, the deck capacity penalty of the changed
+    loads. Returns whether the visit was moved."""
+    sailing_costs = evaluator.sailing_costs
+    distances = evaluator.distances
+    origin = get_voyage(routes, vessel, day)
+    installation = origin[position]
+    reduced = np.delete(origin, position)
+    reduced_distance = calculate_voyage_distance(reduced, distances)
+    removal = ((reduced_distance - voyage_distances[vessel, day])
+               * sailing_costs[vessel])
+
+    if durations is not None:
+        duration = durations[vessel, day]
+        durations[vessel, day] = (
+            _durations_on_vessels(reduced, reduced_distance,
+                                  evaluator)[vessel] if len(reduced) else 0)
+        departures[vessel, day] = len(reduced) > 0
+
+    best_delta, best_move = -EPSILON, None
+    for to_vessel in np.nonzero(routes[:, day, 0])[0]:
+        if to_vessel == vessel:
+            voyage, voyage_distance = reduced, reduced_distance
+        else:
+            voyage = get_voyage(routes, to_vessel, day)
+            voyage_distance = voyage_distances[to_vessel, day]
+        added = calculate_insertion_distances(voyage, installation, distances)
+        insert_position = np.argmin(added)
+        delta = removal + added[insert_position] * sailing_costs[to_vessel]
+
+        if durations is not None:
+            saved = departures[to_vessel, day], durations[to_vessel, day]
+            departures[to_vessel, day] = True
+            durations[to_vessel, day] = _durations_on_vessels(
+                np.insert(voyage, insert_position, installation),
+                voyage_distance + added[insert_position],
+                evaluator)[to_vessel]
+            delta += (_departure_penalty(departures, evaluator, weights,
+                                         durations)
+                      - penalty)
+            departures[to_vessel, day], durations[to_vessel, day] = saved
+
+        if loads is not None and to_vessel != vessel:
+            demand = np.asarray(evaluator.demands)[installation - 1]
+            capacities = evaluator.deck_capacities[[vessel, to_vessel]]
+            old_loads = loads[[vessel, to_vessel], day]
+            new_loads = old_loads + (-demand, demand)
+            delta += ((np.maximum(new_loads - capacities, 0).sum()
+                       - np.maximum(old_loads - capacities, 0).sum())
+                      * weights[_DECK_CAPACITY])
+
+        if delta < best_delta:
+            best_delta = delta
+            best_move = (to_vessel, insert_position)
+
+    if durations is not None:
+        departures[vessel, day], durations[vessel, day] = True, duration
+    if best_move is None:
+        return False
+    apply_relocate(routes, voyage_distances, vessel, day, position,
+                   best_move[0], day, best_move[1], distances)
+    departures[:, day] = routes[:, day, 0] > 0
+    if durations is not None:
+        durations[:, day] = evaluator.voyage_durations(
+            routes[:, day:day + 1])[:, 0]
+    if loads is not None:
+        loads[:, day] = evaluator.voyage_loads(routes[:, day:day + 1])[:, 0]
+    return True
+
+
+def relocate_visits(routes: np.ndarray,
+                    voyage_distances: np.ndarray,
+                    evaluator: FitnessEvaluator,
+                    weights: np.ndarray,
+                    rng: np.random.Generator) -> bool:
+    """Apply improving relocate moves to every visit once.
+
+    When the evaluator has vessel speeds, moves are also scored with the
+    days chartered and overlap of the changed voyage durations, and with
+    deck capacities, with the load beyond the capacity of each vessel.
+
+    Returns:
+        bool: Whether any visit was moved.
+    """
+    departures = routes[:, :, 0] > 0
+    durations = evaluator.voyage_durations(routes)
+    penalty = (0.0 if durations is None
+               else _departure_penalty(departures, evaluator, weights,
+                                       durations))
+    loads = evaluator.voyage_loads(routes)
+
+    improved = False
+    vessels, days = np.nonzero(departures)
+    for k in rng.permutation(len(vessels)):
+        vessel, day = vessels[k], days[k]
+        position = 0
+        # A moved visit is replaced by the next one at the same position
+        while position < np.count_nonzero(routes[vessel, day]):
+            if _relocate_visit(routes, voyage_distances, vessel, day,
+                               position, evaluator, weights, departures,
+                               durations, penalty, loads):
+                improved = True
+                if durations is not None:
+                    penalty = _departure_penalty(departures, evaluator,
+                                                 weights, durations)
+            else:
+                position += 1
+    return improved
+
+
+def _departure_penalty(departures: np.ndarray,
+                       evaluator: FitnessEvaluator,
+                       weights: np.ndarray,
+                       durations: np.ndarray = None) -> float:
+    """Penalty of the constraints changed by reassigning voyages."""
+    return (max_sailing_days_violation(departures,
+                                       evaluator.n_days_available,
+                                       durations)
+            * weights[_MAX_SAILING_DAYS]
+            + voyage_overlap_violation(departures,
+                                       1 if durations is None else durations)
+            * weights[_VOYAGE_OVERLAP])
+
+
+def _durations_on_vessels(voyage: np.ndarray,
+                          voyage_distance: float,
+                          evaluator: FitnessEvaluator) -> np.ndarray:
+    """Days a voyage takes with each vessel."""
+    service_hours = 0.0
+    if evaluator.service_times is not None:
+        service_hours = np.sum(np.asarray(evaluator.service_times)[
+            voyage[voyage > 0] - 1])
+    return voyage_days(voyage_distance, service_hours,
+                       np.asarray(evaluator.vessel_speeds, dtype=float),
+                       evaluator.hours_per_day)
+
+
+def reassign_voyages(routes: np.ndarray,
+                     voyage_distances: np.ndarray,
+                     evaluator: FitnessEvaluator,
+                     weights: np.ndarray,
+                     rng: np.random.Generator) -> bool:
+    """Apply improving reassign moves to every voyage once.
+
+    When the evaluator has vessel speeds, the days chartered and overlap of
+    voyages are scored with the duration of the voyage on each vessel, and
+    with deck capacities, the load beyond the capacity of each vessel.
+
+    Returns:
+        bool: Whether any voyage was reassigned.
+    """
+    sailing_costs = evaluator.sailing_costs
+    departures = routes[:, :, 0] > 0
+    durations = evaluator.voyage_durations(routes)
+    penalty = _departure_penalty(departures, evaluator, weights, durations)
+    loads = evaluator.voyage_loads(routes)
+
+    improved = False
+    vessels, days = np.nonzero(departures)
+    for k in rng.permutation(len(vessels)):
+        vessel, day = vessels[k], days[k]
+        best_delta, best_vessel, best_penalty = -EPSILON, None, None
+
+        departures[vessel, day] = False
+        if durations is not None:
+            duration = durations[vessel, day]
+            durations[vessel, day] = 0
+            vessel_durations = _durations_on_vessels(
+                routes[vessel, day], voyage_distances[vessel, day], evaluator)
+
+        for to_vessel in np.nonzero(~departures[:, day])[0]:
+            if to_vessel == vessel:
+                continue
+            departures[to_vessel, day] = True
+            if durations is not None:
+                durations[to_vessel, day] = vessel_durations[to_vessel]
+            new_penalty = _departure_penalty(departures, evaluator, weights,
+                                             durations)
+            departures[to_vessel, day] = False
+            if durations is not None:
+                durations[to_vessel, day] = 0
+
+            delta = (voyage_distances[vessel, day]
+                     * (sailing_costs[to_vessel] - sailing_costs[vessel])
+                     + new_penalty - penalty)
+            if loads is not None:
+                excess = np.maximum(
+                    loads[vessel, day]
+                    - evaluator.deck_capacities[[to_vessel, vessel]], 0)
+                delta += (excess[0] - excess[1]) * weights[_DECK_CAPACITY]
+            if delta < best_delta:
+                best_delta, best_vessel = delta, to_vessel
+                best_penalty = new_penalty
+
+        if best_vessel is None:
+            departures[vessel, day] = True
+            if durations is not None:
+                durations[vessel, day] = duration
+            continue
+
+        departures[best_vessel, day] = True
+        if durations is not None:
+            durations[best_vessel, day] = vessel_durations[best_vessel]
+        routes[best_vessel, day] = routes[vessel, day]
+        routes[vessel, day] = 0
+        voyage_distances[best_vessel, day] = voyage_distances[vessel, day]
+        voyage_distances[vessel, day] = 0
+        if loads is not None:
+            loads[best_vessel, day] = loads[vessel, day]
+            loads[vessel, day] = 0
+        penalty = best_penalty
+        improved = True
+    return improved
+
+
+def educate(routes: np.ndarray,
+            evaluator: FitnessEvaluator,
+            rng: np.random.Generator = None,
+            penalty_scale: float = 1.0,
+            max_passes: int = 5,
+            voyage_distances: np.ndarray = None) -> np.ndarray:
+    """Improve a schedule with local search.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (n_vessels, n_days, n_installations), improved in place.
+        evaluator (FitnessEvaluator): Instance data and penalty weights.
+        rng (np.random.Generator): Random generator, or seed for one.
+        penalty_scale (float): Factor on the penalty weights, e.g. 10 when
+            repairing an infeasible individual.
+        max_passes (int): Maximum number of passes over all moves.
+        voyage_distances (np.ndarray): Distance of each voyage of routes,
+            e.g. from `voyage_cache.VoyageCache.sequence`. Calculated from
+            the routes by default.
+
+    Returns:
+        np.ndarray: The improved routes.
+    """
+    rng = np.random.default_rng(rng)
+    weights = evaluator.penalty.weights * penalty_scale
+    if voyage_distances is None:
+        voyage_distances = calculate_voyage_distances(routes,
+                                                      evaluator.distances)
+
+    for _ in range(max_passes):
+        improved = relocate_visits(routes, voyage_distances, evaluator,
+                                   weights, rng)
+        improved |= reassign_voyages(routes, voyage_distances, evaluator,
+                                     weights, rng)
+        if not improved:
+            break
+    return routes
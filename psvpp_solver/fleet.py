@@ -0,0 +1,319 @@
+"""Search for the fleet size with the cheapest schedule.
+
+The vessels of the instance form a pool, and a fleet of n vessels charters
+the first n of them, so order the pool by preference. `FleetSweep` runs a
+`GeneticSearch` for each candidate fleet size, in rounds. Each search is
+warm-started with the best schedules of its own size from the previous
+round and of the neighbouring sizes, converted to its fleet:
+
+    - `add_vessel`: A schedule of n - 1 vessels hands every second voyage of
+      its busiest vessel to the new vessel.
+    - `remove_vessel`: A schedule of n + 1 vessels merges the voyages of its
+      last vessel into the other voyages of the same day, then is repaired.
+
+Run in this process, the sizes are searched in increasing order, so each
+size is warm-started from the smaller size of the same round, and all
+searches share one voyage cache, which does not depend on the vessels. With
+n_workers, the sizes of a round are searched in parallel processes, each
+warm-started from the previous round.
+
+With a checkpoint path, the results are saved after each search, or each
+round with n_workers, and a sweep created with the same arguments and an
+integer seed resumes after the last saved search with `load_checkpoint`.
+
+Example:
+
+    sweep = FleetSweep(weekly_charter_costs, sailing_costs, distances,
+                       required_services, max_v_prepared, n_days_available,
+                       n_days_in_period=7, fleet_sizes=range(2, 6),
+                       n_rounds=2, seed=1)
+    n_vessels, routes, cost = sweep.run(n_generations=50)
+    sweep.curve()  # {2: inf, 3: 412000.0, 4: 405000.0, 5: 431000.0}
+"""
+import multiprocessing
+import os
+
+import numpy as np
+
+from psvpp_solver.crossover import insert_visit
+from psvpp_solver.genetic import GeneticSearch
+from psvpp_solver.instance import Instance
+from psvpp_solver.repair import repair_schedule
+from psvpp_solver.utils import spawn_generators
+from psvpp_solver.voyage_cache import VoyageCache
+
+
+def add_vessel(routes: np.ndarray) -> np.ndarray:
+    """Add a vessel last to a schedule, sailing every second voyage of the
+    vessel with the most departures.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (n_vessels, n_days, n_installations).
+
+    Returns:
+        np.ndarray: Routes of shape (n_vessels + 1, n_days, n_installations).
+    """
+    routes = np.concatenate((routes, np.zeros_like(routes[:1])))
+    busiest = np.argmax(np.count_nonzero(routes[:-1, :, 0], axis=1))
+    days = np.nonzero(routes[busiest, :, 0])[0][1::2]
+    routes[-1, days] = routes[busiest, days]
+    routes[busiest, days] = 0
+    return routes
+
+
+def remove_vessel(routes: np.ndarray, instance: Instance) -> np.ndarray:
+    """Remove the last vessel of a schedule, inserting its visits at the
+    cheapest positions of the other voyages of the same day, or giving the
+    voyage to the vessel with the fewest departures if no other vessel
+    departs, then repair the schedule with `repair.repair_schedule`.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (n_vessels + 1, n_days, n_installations).
+        instance (Instance): Instance of the fleet without the vessel. With
+            vessel speeds, the repair uses the duration of each voyage.
+
+    Returns:
+        np.ndarray: Routes of shape (n_vessels, n_days, n_installations).
+    """
+    removed = routes[-1]
+    routes = routes[:-1].copy()
+    for day in np.nonzero(removed[:, 0])[0]:
+        voyage = removed[day][removed[day] > 0]
+        vessels = np.nonzero(routes[:, day, 0])[0]
+        if len(vessels) == 0:
+            vessel = np.argmin(np.count_nonzero(routes[:, :, 0], axis=1))
+            routes[vessel, day, :len(voyage)] = voyage
+            continue
+        for installation in voyage:
+            insert_visit(routes, installation, day, vessels,
+                         instance.sailing_costs, instance.distances)
+    return repair_schedule(routes, instance)
+
+
+def _run_fleet_size(search_args: tuple,
+                    search_kwargs: dict,
+                    rng: np.random.Generator,
+                    warm_start: np.ndarray,
+                    n_generations: int,
+                    n_elite: int,
+                    voyage_cache: VoyageCache = None) -> tuple:
+    """Run one search and return (routes, cost, elite)."""
+    with GeneticSearch(*search_args, seed=rng, voyage_cache=voyage_cache,
+                       **search_kwargs) as search:
+        search.initialize()
+        search.immigrate(warm_start)
+        search.run(n_generations)
+        return search.best_routes, search.best_cost, search.elite(n_elite)
+
+
+class FleetSweep:
+    """Genetic searches over fleet sizes, warm-started from each other.
+
+    Args:
+        weekly_charter_costs (np.array): One entry for each vessel of the
+            pool.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+        required_services (np.array): Required service frequency for each
+            installation.
+        max_v_prepared (np.array): Vessels the depot can prepare each day.
+        n_days_available (np.array): Days available for each vessel.
+        n_days_in_period (int): Number of days in period.
+        fleet_sizes: Fleet sizes to search, every size from one to the
+            size of the pool by default.
+        n_rounds (int): Rounds of searches over all fleet sizes.
+        n_workers (int): Search the sizes of a round in this many processes.
+            Searches in this process by default.
+        n_warm_start (int): Schedules passed on from each search.
+        seed (int): Seed, or random generator, for reproducible runs.
+        **search_kwargs: Further arguments to each `GeneticSearch`.
+    """
+
+    def __init__(self,
+                 weekly_charter_costs: np.ndarray,
+                 sailing_costs: np.ndarray,
+                 distances: np.ndarray,
+                 required_services: np.ndarray,
+                 max_v_prepared: np.ndarray,
+                 n_days_available: np.ndarray,
+                 n_days_in_period: int,
+                 fleet_sizes=None,
+                 n_rounds: int = 2,
+                 n_workers: int = None,
+                 n_warm_start: int = 4,
+                 seed: int = None,
+                 **search_kwargs):
+        self.instance = Instance(weekly_charter_costs,
+                                 sailing_costs,
+                                 distances,
+                                 required_services,
+                                 max_v_prepared,
+                                 n_days_available,
+                                 vessel_speeds=search_kwargs.pop(
+                                     "vessel_speeds", None),
+                                 service_times=search_kwargs.get(
+                                     "service_times"),
+                                 hours_per_day=search_kwargs.get(
+                                     "hours_per_day", 24.0),
+                                 demands=search_kwargs.get("demands"),
+                                 deck_capacities=search_kwargs.pop(
+                                     "deck_capacities", None))
+        self.n_days_in_period = n_days_in_period
+        if fleet_sizes is None:
+            fleet_sizes = range(1, self.instance.n_vessels + 1)
+        self.fleet_sizes = np.unique(np.asarray(fleet_sizes, dtype=int))
+        if (self.fleet_sizes[0] < 1
+                or self.fleet_sizes[-1] > self.instance.n_vessels):
+            raise ValueError(
+                "Fleet sizes must be between 1 and the {} vessels of the "
+                "instance.".format(self.instance.n_vessels))
+        self.fleets = [self.instance.select_vessels(np.arange(n_vessels))
+                       for n_vessels in self.fleet_sizes]
+
+        self.n_rounds = n_rounds
+        self.n_workers = n_workers
+        self.n_warm_start = n_warm_start
+        self.seed = seed
+        self.search_kwargs = search_kwargs
+        self.voyage_cache = VoyageCache(self.instance.distances)
+
+        self.costs = np.full(len(self.fleet_sizes), np.inf)
+        self.routes = [None] * len(self.fleet_sizes)
+        self._elites = [None] * len(self.fleet_sizes)
+        # Searches done, counted over rounds and sizes
+        self.n_completed = 0
+
+    def _search_args(self, index: int) -> tuple:
+        fleet = self.fleets[index]
+        return (fleet.weekly_charter_costs, fleet.sailing_costs,
+                self.instance.distances, self.instance.required_services,
+                self.instance.max_v_prepared, fleet.n_days_available,
+                self.n_days_in_period)
+
+    def _search_kwargs(self, index: int) -> dict:
+        """Search arguments, with the speeds and deck capacities of the
+        vessels of the fleet."""
+        fleet = self.fleets[index]
+        return dict(self.search_kwargs,
+                    vessel_speeds=fleet.vessel_speeds,
+                    deck_capacities=fleet.deck_capacities)
+
+    def _warm_start(self, index: int) -> np.ndarray:
+        """Elite of size index and of its neighbours, converted to its
+        fleet."""
+        n_vessels = self.fleet_sizes[index]
+        warm_start = []
+        for neighbour in (index - 1, index, index + 1):
+            if not 0 <= neighbour < len(self.fleet_sizes):
+                continue
+            for routes in (self._elites[neighbour]
+                           if self._elites[neighbour] is not None else []):
+                while len(routes) < n_vessels:
+                    routes = add_vessel(routes)
+                while len(routes) > n_vessels:
+                    routes = remove_vessel(
+                        routes, self.instance.select_vessels(
+                            np.arange(len(routes) - 1)))
+                warm_start.append(routes)
+        shape = (0, n_vessels, self.n_days_in_period,
+                 self.instance.n_installations)
+        return np.stack(warm_start) if warm_start else np.zeros(
+            shape, dtype=np.int8)
+
+    def _collect(self, index: int, result: tuple):
+        routes, cost, elite = result
+        self._elites[index] = elite
+        if cost < self.costs[index]:
+            self.costs[index] = cost
+            self.routes[index] = routes
+
+    def save_checkpoint(self, path: str):
+        """Save the results of the searches done to a compressed .npz
+        file."""
+        arrays = dict(n_completed=self.n_completed, costs=self.costs)
+        for index, (routes, elite) in enumerate(zip(self.routes,
+                                                    self._elites)):
+            if routes is not None:
+                arrays[f"routes_{index}"] = routes
+            if elite is not None:
+                arrays[f"elite_{index}"] = elite
+
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temporary, path)
+
+    def load_checkpoint(self, path: str):
+        """Restore the results saved by `save_checkpoint`, so `run` skips
+        the searches already done."""
+        with np.load(path) as checkpoint:
+            self.n_completed = int(checkpoint["n_completed"])
+            self.costs[:] = checkpoint["costs"]
+            for index in range(len(self.fleet_sizes)):
+                self.routes[index] = (checkpoint[f"routes_{index}"]
+                                      if f"routes_{index}" in checkpoint
+                                      else None)
+                self._elites[index] = (checkpoint[f"elite_{index}"]
+                                       if f"elite_{index}" in checkpoint
+                                       else None)
+
+    def run(self, n_generations: int, checkpoint_path: str = None) -> tuple:
+        """Search every fleet size for n_generations generations per round,
+        skipping the searches already done.
+
+        Args:
+            n_generations (int): Generations of each search.
+            checkpoint_path (str): Save the results to this path after each
+                search, see `save_checkpoint`.
+
+        Returns:
+            tuple: (n_vessels, routes, cost) of the cheapest feasible
+                schedule found over all fleet sizes, or (None, None, inf)
+                if no feasible schedule was found.
+        """
+        n_sizes = len(self.fleet_sizes)
+        rngs = spawn_generators(self.seed, self.n_rounds * n_sizes)
+        for round_ in range(self.n_rounds):
+            sizes = [index for index in range(n_sizes)
+                     if round_ * n_sizes + index >= self.n_completed]
+            round_rngs = rngs[round_ * n_sizes:(round_ + 1) * n_sizes]
+            if self.n_workers is None:
+                for index in sizes:
+                    self._collect(index, _run_fleet_size(
+                        self._search_args(index), self._search_kwargs(index),
+                        round_rngs[index], self._warm_start(index),
+                        n_generations, self.n_warm_start,
+                        self.voyage_cache))
+                    self.n_completed += 1
+                    if checkpoint_path is not None:
+                        self.save_checkpoint(checkpoint_path)
+                continue
+
+            tasks = [(self._search_args(index), self._search_kwargs(index),
+                      round_rngs[index], self._warm_start(index),
+                      n_generations, self.n_warm_start)
+                     for index in sizes]
+            if not tasks:
+                continue
+            context = multiprocessing.get_context()
+            with context.Pool(self.n_workers) as pool:
+                results = pool.starmap(_run_fleet_size, tasks)
+            for index, result in zip(sizes, results):
+                self._collect(index, result)
+            self.n_completed += len(tasks)
+            if checkpoint_path is not None:
+                self.save_checkpoint(checkpoint_path)
+
+        best = int(np.argmin(self.costs))
+        if not np.isfinite(self.costs[best]):
+            return None, None, np.inf
+        return (int(self.fleet_sizes[best]), self.routes[best],
+                self.costs[best])
+
+    def curve(self) -> dict:
+        """Best cost found for each fleet size, inf where no feasible
+        schedule was found."""
+        return {int(n_vessels): float(cost)
+                for n_vessels, cost in zip(self.fleet_sizes, self.costs)}
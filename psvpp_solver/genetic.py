@@ -0,0 +1,595 @@
+"""Genetic search with feasible and infeasible sub-populations, following
+the hybrid genetic search of Borthen et al.
+
+Each sub-population keeps its individuals in preallocated contiguous arrays
+of routes, visits and departures with room for population_size + n_offspring
+individuals. Each generation creates n_offspring children by crossover and
+education, evaluates them in one batch, and inserts them in the sub-population
+matching their feasibility. A sub-population that is full is reduced to
+population_size individuals by survivor selection on biased fitness, which
+combines penalized cost and contribution to diversity.
+
+`generations` yields a `GenerationSummary` after each generation, and the
+state of a search, with its populations, random generator and voyage cache,
+can be saved to a compressed .npz checkpoint and loaded to resume exactly
+where it stopped:
+
+    search.run(1000, checkpoint_path="search.npz", checkpoint_interval=10)
+    # After the job is killed, in a new process
+    search = GeneticSearch(...)  # Same instance and options
+    search.load_checkpoint("search.npz")
+    search.run(1000 - search.generation)
+"""
+import json
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from psvpp_solver.constraints import N_CONSTRAINTS
+from psvpp_solver.cost import Fitness
+from psvpp_solver.cost import FitnessEvaluator
+from psvpp_solver.crossover import crossover
+from psvpp_solver.education import educate
+from psvpp_solver.instance import Instance
+from psvpp_solver.parallel import ParallelEvaluator
+from psvpp_solver.profiling import NullProfiler
+from psvpp_solver.repair import repair_schedule
+from psvpp_solver.utils import generate_visits_and_departures_from_routes
+from psvpp_solver.utils import initial_population
+from psvpp_solver.voyage_cache import VoyageCache
+
+
+class GenerationSummary(NamedTuple):
+    """State of a search after a generation."""
+    generation: int
+    best_cost: float
+    feasible_ratio: float
+    diversity: float
+
+
+class Subpopulation:
+    """Individuals stored in preallocated contiguous arrays.
+
+    Individuals occupy the first `size` entries of each array. Removing an
+    individual moves the last individual into its place.
+
+    Args:
+        capacity (int): Maximum number of individuals.
+        n_vessels (int): Number of vessels.
+        n_days_in_period (int): Number of days in period.
+        n_installations (int): Number of installations.
+    """
+
+    def __init__(self,
+                 capacity: int,
+                 n_vessels: int,
+                 n_days_in_period: int,
+                 n_installations: int):
+        self.routes = np.zeros((capacity, n_vessels, n_days_in_period,
+                                n_installations), dtype=np.int8)
+        self.visits = np.zeros((capacity, n_installations, n_days_in_period),
+                               dtype=bool)
+        self.departures = np.zeros((capacity, n_vessels, n_days_in_period),
+                                   dtype=bool)
+        self.cost = np.zeros(capacity)
+        self.violations = np.zeros((capacity, N_CONSTRAINTS))
+        self.size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.routes)
+
+    def add(self,
+            routes: np.ndarray,
+            visits: np.ndarray,
+            departures: np.ndarray,
+            cost: float,
+            violations: np.ndarray) -> int:
+        """Add an individual and return its index."""
+        if self.size == self.capacity:
+            raise IndexError("Subpopulation is full.")
+        index = self.size
+        self.routes[index] = routes
+        self.visits[index] = visits
+        self.departures[index] = departures
+        self.cost[index] = cost
+        self.violations[index] = violations
+        self.size += 1
+        return index
+
+    def remove(self, index: int):
+        """Remove an individual, moving the last individual into its place."""
+        last = self.size - 1
+        for array in (self.routes, self.visits, self.departures, self.cost,
+                      self.violations):
+            array[index] = array[last]
+        self.size -= 1
+
+    def penalized_cost(self, weights: np.ndarray) -> np.ndarray:
+        """Penalized cost of each individual with the given weights."""
+        return (self.cost[:self.size]
+                + self.violations[:self.size] @ weights)
+
+    def distances(self) -> np.ndarray:
+        """Share of visits and departures differing between each pair of
+        individuals, with infinity on the diagonal."""
+        genes = np.concatenate(
+            (self.visits[:self.size].reshape(self.size, -1),
+             self.departures[:self.size].reshape(self.size, -1)),
+            axis=1).astype(float)
+        differing = genes @ (1 - genes).T
+        differing = (differing + differing.T) / genes.shape[1]
+        np.fill_diagonal(differing, np.inf)
+        return differing
+
+    def biased_fitness(self,
+                       weights: np.ndarray,
+                       n_elite: int,
+                       n_close: int,
+                       distances: np.ndarray = None) -> np.ndarray:
+        """Biased fitness of each individual, lower is better.
+
+        The biased fitness is the rank by penalized cost plus a weighted rank
+        by average distance to the n_close closest individuals, both
+        normalized to [0, 1].
+        """
+        n = self.size
+        if n <= 1:
+            return np.zeros(n)
+        if distances is None:
+            distances = self.distances()
+
+        cost_rank = np.argsort(np.argsort(self.penalized_cost(weights),
+                                          kind="stable"))
+        n_closest = min(n_close, n - 1)
+        diversity = np.mean(np.partition(distances, n_closest - 1,
+                                         axis=1)[:, :n_closest], axis=1)
+        diversity_rank = np.argsort(np.argsort(-diversity, kind="stable"))
+
+        fitness = cost_rank / (n - 1)
+        if n > n_elite:
+            fitness += (1 - n_elite / n) * diversity_rank / (n - 1)
+        return fitness
+
+    def select_survivors(self,
+                         n_survivors: int,
+                         weights: np.ndarray,
+                         n_elite: int,
+                         n_close: int):
+        """Remove individuals until n_survivors remain, removing clones
+        first and otherwise the worst biased fitness."""
+        while self.size > n_survivors:
+            distances = self.distances()
+            fitness = self.biased_fitness(weights, n_elite, n_close,
+                                          distances)
+            clones = np.nonzero((distances == 0).any(axis=1))[0]
+            candidates = clones if len(clones) else np.arange(self.size)
+            self.remove(candidates[np.argmax(fitness[candidates])])
+
+
+class GeneticSearch:
+    """Genetic search for a cheap feasible schedule for a fixed fleet.
+
+    Example:
+
+        search = GeneticSearch(weekly_charter_costs, sailing_costs,
+                               distances, required_services, max_v_prepared,
+                               n_days_available, n_days_in_period=7, seed=1)
+        routes, cost = search.run(n_generations=50)
+
+    Args:
+        weekly_charter_costs (np.array): One entry for each vessel.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+        required_services (np.array): Required service frequency for each
+            installation.
+        max_v_prepared (np.array): Vessels the depot can prepare each day.
+        n_days_available (np.array): Days available for each vessel.
+        n_days_in_period (int): Number of days in period.
+        population_size (int): Individuals kept in each sub-population after
+            survivor selection.
+        n_offspring (int): Children created each generation.
+        n_elite (int): Individuals protected from the diversity term of the
+            biased fitness.
+        n_close (int): Closest individuals used for the diversity term.
+        repair_rate (float): Probability of repairing an infeasible child by
+            education with ten times the penalty weights.
+        education_passes (int): Maximum passes of the education moves.
+        seed (int): Seed for the random generator, for reproducible runs,
+            or a `np.random.Generator` to draw from.
+        backend (str): Backend for generating individuals, see `backend`.
+        n_workers (int): Evaluate offspring in this many worker processes,
+            see `parallel.ParallelEvaluator`. Evaluates in this process by
+            default. Call `close` to stop the workers when done.
+        voyage_cache_size (int): Maximum number of voyages in the cache of
+            voyage orders, see `voyage_cache.VoyageCache`.
+        voyage_cache (VoyageCache): Cache to use instead of a new one, e.g.
+            one shared by searches on the same distances.
+        vessel_speeds (np.array): Speed of each vessel, in distance per
+            hour, for multi-day voyages, see `durations`. Voyages take one
+            day by default.
+        service_times (np.array): Hours spent at each installation.
+        hours_per_day (float): Working hours in a day.
+        demands (np.array): Demand delivered on each visit to each
+            installation, see `loads`.
+        deck_capacities (np.array): Deck capacity of each vessel.
+        profiler (Profiler): Records the time of each stage, retries and
+            cache hit rates of every generation, see `profiling`. Nothing
+            is recorded by default.
+    """
+
+    def __init__(self,
+                 weekly_charter_costs: np.ndarray,
+                 sailing_costs: np.ndarray,
+                 distances: np.ndarray,
+                 required_services: np.ndarray,
+                 max_v_prepared: np.ndarray,
+                 n_days_available: np.ndarray,
+                 n_days_in_period: int,
+                 population_size: int = 25,
+                 n_offspring: int = 40,
+                 n_elite: int = 4,
+                 n_close: int = 3,
+                 repair_rate: float = 0.5,
+                 education_passes: int = 5,
+                 seed: int = None,
+                 backend: str = None,
+                 n_workers: int = None,
+                 voyage_cache_size: int = 100_000,
+                 voyage_cache: VoyageCache = None,
+                 vessel_speeds: np.ndarray = None,
+                 service_times: np.ndarray = None,
+                 hours_per_day: float = 24.0,
+                 demands: np.ndarray = None,
+                 deck_capacities: np.ndarray = None,
+                 profiler=None):
+        self.instance = Instance(weekly_charter_costs,
+                                 sailing_costs,
+                                 distances,
+                                 required_services,
+                                 max_v_prepared,
+                                 n_days_available,
+                                 vessel_speeds=vessel_speeds,
+                                 service_times=service_times,
+                                 hours_per_day=hours_per_day,
+                                 demands=demands,
+                                 deck_capacities=deck_capacities)
+        self.evaluator = FitnessEvaluator.from_instance(self.instance)
+        self.required_services = self.evaluator.required_services
+        self.n_vessels = len(self.evaluator.weekly_charter_costs)
+        self.n_installations = len(self.required_services)
+        self.n_days_in_period = n_days_in_period
+
+        self.population_size = population_size
+        self.n_offspring = n_offspring
+        self.n_elite = n_elite
+        self.n_close = n_close
+        self.repair_rate = repair_rate
+        self.education_passes = education_passes
+        self.backend = backend
+        self.rng = np.random.default_rng(seed)
+        if voyage_cache is None:
+            voyage_cache = VoyageCache(self.evaluator.distances,
+                                       voyage_cache_size)
+        self.voyage_cache = voyage_cache
+        self.profiler = NullProfiler() if profiler is None else profiler
+
+        shape = (self.n_vessels, self.n_days_in_period, self.n_installations)
+        self.feasible = Subpopulation(population_size + n_offspring, *shape)
+        self.infeasible = Subpopulation(population_size + n_offspring, *shape)
+        if n_workers is None:
+            self.batch_evaluator = self.evaluator
+            self._offspring = np.zeros((n_offspring, *shape), dtype=np.int8)
+        else:
+            self.batch_evaluator = ParallelEvaluator(self.evaluator,
+                                                     n_workers)
+            self._offspring = self.batch_evaluator.shared_population(
+                n_offspring, *shape)
+
+        self.generation = 0
+        self.best_routes = None
+        self.best_cost = np.inf
+
+    @property
+    def subpopulations(self) -> tuple:
+        return self.feasible, self.infeasible
+
+    def _educate(self, routes: np.ndarray, penalty_scale: float = 1.0):
+        """Repair depot capacity, sailing days and overlap, order the voyages
+        with the voyage cache, then educate."""
+        with self.profiler.stage("repair"):
+            repair_schedule(routes, self.instance)
+        with self.profiler.stage("sequencing"):
+            voyage_distances = self.voyage_cache.sequence(routes)
+        with self.profiler.stage("education"):
+            educate(routes, self.evaluator, self.rng, penalty_scale,
+                    self.education_passes, voyage_distances)
+
+    def _evaluate(self, routes: np.ndarray) -> Fitness:
+        with self.profiler.stage("evaluation"):
+            fitness = self.batch_evaluator(routes)
+        self.profiler.count("evaluated", len(routes))
+        return fitness
+
+    def _insert(self, routes: np.ndarray, fitness: Fitness = None):
+        """Insert each individual of a batch of routes in the
+        sub-population matching its feasibility, evaluating the routes
+        unless their fitness is given."""
+        if fitness is None:
+            fitness = self._evaluate(routes)
+        visits, departures = generate_visits_and_departures_from_routes(
+            routes, self.n_installations)
+        weights = self.evaluator.penalty.weights
+
+        for i, feasible in enumerate(fitness.feasible):
+            subpopulation = self.feasible if feasible else self.infeasible
+            if subpopulation.size == subpopulation.capacity:
+                with self.profiler.stage("survivor_selection"):
+                    subpopulation.select_survivors(self.population_size,
+                                                   weights, self.n_elite,
+                                                   self.n_close)
+            subpopulation.add(routes[i], visits[i], departures[i],
+                              fitness.cost[i], fitness.violations[i])
+
+            if feasible and fitness.cost[i] < self.best_cost:
+                self.best_cost = fitness.cost[i]
+                self.best_routes = routes[i].copy()
+
+        return fitness
+
+    def initialize(self, n_individuals: int = None):
+        """Generate, educate and insert the initial population.
+
+        Args:
+            n_individuals (int): Number of individuals, four times the
+                population size by default.
+        """
+        if n_individuals is None:
+            n_individuals = 4 * self.population_size
+
+        with self.profiler.stage("initial_population"):
+            _, _, routes = initial_population(n_individuals,
+                                              self.n_vessels,
+                                              self.n_days_in_period,
+                                              self.required_services,
+                                              self.rng,
+                                              self.backend,
+                                              self.voyage_cache)
+        for individual in routes:
+            self._educate(individual)
+
+        self._insert(routes)
+
+    def _select_parents(self, n_parents: int) -> list:
+        """Select parents by binary tournament on biased fitness.
+
+        Returns:
+            list: (subpopulation, index) of each parent.
+        """
+        weights = self.evaluator.penalty.weights
+        candidates = [(subpopulation, index)
+                      for subpopulation in self.subpopulations
+                      for index in range(subpopulation.size)]
+        fitness = np.concatenate([
+            subpopulation.biased_fitness(weights, self.n_elite, self.n_close)
+            for subpopulation in self.subpopulations])
+
+        pairs = self.rng.integers(len(candidates), size=(n_parents, 2))
+        winners = np.where(fitness[pairs[:, 0]] <= fitness[pairs[:, 1]],
+                           pairs[:, 0], pairs[:, 1])
+        return [candidates[winner] for winner in winners]
+
+    def step(self):
+        """Create, educate and insert one generation of offspring."""
+        self.profiler.start_generation()
+        if self.feasible.size + self.infeasible.size == 0:
+            self.initialize()
+
+        with self.profiler.stage("parent_selection"):
+            parents = self._select_parents(2 * self.n_offspring)
+        for i in range(self.n_offspring):
+            (population_1, index_1), (population_2, index_2) = \
+                parents[2 * i:2 * i + 2]
+            with self.profiler.stage("crossover"):
+                self._offspring[i] = crossover(population_1.routes[index_1],
+                                               population_2.routes[index_2],
+                                               population_1.visits[index_1],
+                                               population_2.visits[index_2],
+                                               self.required_services,
+                                               self.evaluator.sailing_costs,
+                                               self.evaluator.distances,
+                                               self.rng)
+            self._educate(self._offspring[i])
+
+        # Repair part of the infeasible offspring with higher penalties, and
+        #  evaluate only those again
+        fitness = Fitness(*(np.array(values) for values
+                            in self._evaluate(self._offspring)))
+        repair = np.nonzero(~fitness.feasible
+                            & (self.rng.random(self.n_offspring)
+                               < self.repair_rate))[0]
+        self.profiler.count("repair_retries", len(repair))
+        for i in repair:
+            self._educate(self._offspring[i], penalty_scale=10.0)
+        if len(repair):
+            # A copy, which a parallel evaluator stages in its own buffer
+            #  instead of the offspring buffer
+            repaired = self._evaluate(self._offspring[repair])
+            for values, repaired_values in zip(fitness, repaired):
+                values[repair] = repaired_values
+
+        self._insert(self._offspring, fitness)
+        self.evaluator.penalty.update(fitness.violations)
+        self.generation += 1
+        self.profiler.end_generation(self.generation, self.n_offspring,
+                                     dict(voyage_cache=self.voyage_cache))
+
+    def elite(self, n_individuals: int) -> np.ndarray:
+        """Routes of the best individuals, feasible individuals by cost
+        first, then infeasible individuals by penalized cost.
+
+        Returns:
+            np.ndarray: Copies of at most n_individuals routes.
+        """
+        weights = self.evaluator.penalty.weights
+        elite = [subpopulation.routes[
+                     np.argsort(subpopulation.penalized_cost(weights),
+                                kind="stable")]
+                 for subpopulation in self.subpopulations]
+        return np.concatenate(elite)[:n_individuals].copy()
+
+    def immigrate(self, routes: np.ndarray):
+        """Evaluate individuals from another search and insert them.
+
+        Args:
+            routes (np.ndarray): Routes of shape
+                (n_individuals, n_vessels, n_days, n_installations).
+        """
+        if len(routes):
+            self._insert(np.asarray(routes, dtype=np.int8))
+
+    def summary(self) -> GenerationSummary:
+        """Best cost, share of feasible individuals, and diversity, the
+        average share of visits and departures differing between pairs of
+        individuals of the same sub-population."""
+        sizes = np.array([subpopulation.size
+                          for subpopulation in self.subpopulations])
+        n_pairs = sizes * (sizes - 1)
+        differing = [np.sum(subpopulation.distances(),
+                            where=~np.eye(subpopulation.size, dtype=bool))
+                     for subpopulation in self.subpopulations
+                     if subpopulation.size > 1]
+        return GenerationSummary(
+            generation=self.generation,
+            best_cost=float(self.best_cost),
+            feasible_ratio=float(sizes[0] / max(sizes.sum(), 1)),
+            diversity=float(np.sum(differing) / max(n_pairs.sum(), 1)))
+
+    def generations(self,
+                    n_generations: int,
+                    checkpoint_path: str = None,
+                    checkpoint_interval: int = 10):
+        """Run the search one generation at a time.
+
+        Args:
+            n_generations (int): Number of generations.
+            checkpoint_path (str): Save a checkpoint to this path, see
+                `save_checkpoint`.
+            checkpoint_interval (int): Generations between checkpoints.
+
+        Yields:
+            GenerationSummary: Summary after each generation.
+        """
+        for _ in range(n_generations):
+            self.step()
+            if (checkpoint_path is not None
+                    and self.generation % checkpoint_interval == 0):
+                self.save_checkpoint(checkpoint_path)
+            yield self.summary()
+
+    def save_checkpoint(self, path: str):
+        """Save the state of the search to a compressed .npz file.
+
+        The file is written to a temporary file first and then renamed, so
+        a job killed while saving keeps its previous checkpoint.
+        """
+        arrays = dict(
+            generation=self.generation,
+            best_cost=self.best_cost,
+            best_routes=(np.zeros((0, *self._offspring.shape[1:]), np.int8)
+                         if self.best_routes is None
+                         else self.best_routes[None]),
+            penalty_weights=self.evaluator.penalty.weights,
+            rng_state=json.dumps(self.rng.bit_generator.state))
+        for name, subpopulation in (("feasible", self.feasible),
+                                    ("infeasible", self.infeasible)):
+            for field in ("routes", "visits", "departures", "cost",
+                          "violations"):
+                arrays[f"{name}_{field}"] = getattr(
+                    subpopulation, field)[:subpopulation.size]
+        for name, array in self.voyage_cache.state().items():
+            arrays[f"voyage_cache_{name}"] = array
+
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temporary, path)
+
+    def load_checkpoint(self, path: str):
+        """Restore the state saved by `save_checkpoint` to a search created
+        with the same instance and options."""
+        with np.load(path) as checkpoint:
+            self.generation = int(checkpoint["generation"])
+            self.best_cost = float(checkpoint["best_cost"])
+            best_routes = checkpoint["best_routes"]
+            self.best_routes = best_routes[0] if len(best_routes) else None
+            self.evaluator.penalty.weights[:] = checkpoint["penalty_weights"]
+            self.rng.bit_generator.state = json.loads(
+                str(checkpoint["rng_state"]))
+
+            for name, subpopulation in (("feasible", self.feasible),
+                                        ("infeasible", self.infeasible)):
+                subpopulation.size = len(checkpoint[f"{name}_cost"])
+                for field in ("routes", "visits", "departures", "cost",
+                              "violations"):
+                    getattr(subpopulation, field)[:subpopulation.size] = \
+                        checkpoint[f"{name}_{field}"]
+
+            prefix = "voyage_cache_"
+            self.voyage_cache.load_state(
+                {name[len(prefix):]: checkpoint[name]
+                 for name in checkpoint.files if name.startswith(prefix)})
+
+    def run(self,
+            n_generations: int,
+            max_generations_without_improvement: int = None,
+            callback=None,
+            checkpoint_path: str = None,
+            checkpoint_interval: int = 10) -> tuple:
+        """Run the search.
+
+        Args:
+            n_generations (int): Maximum number of generations.
+            max_generations_without_improvement (int): Stop early when the
+                best feasible cost has not improved for this many
+                generations.
+            callback (callable): Called with the `GenerationSummary` of each
+                generation.
+            checkpoint_path (str): Save a checkpoint to this path every
+                checkpoint_interval generations, see `save_checkpoint`.
+            checkpoint_interval (int): Generations between checkpoints.
+
+        Returns:
+            tuple: (routes, cost) of the best feasible schedule found, or
+                (None, inf) if no feasible schedule was found.
+        """
+        without_improvement = 0
+        best_cost = self.best_cost
+        for summary in self.generations(n_generations, checkpoint_path,
+                                        checkpoint_interval):
+            if callback is not None:
+                callback(summary)
+
+            if self.best_cost < best_cost:
+                without_improvement = 0
+            else:
+                without_improvement += 1
+            best_cost = self.best_cost
+            if (max_generations_without_improvement is not None
+                    and without_improvement
+                    >= max_generations_without_improvement):
+                break
+
+        return self.best_routes, self.best_cost
+
+    def close(self):
+        """Stop the worker processes, if any."""
+        if self.batch_evaluator is not self.evaluator:
+            self.batch_evaluator.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
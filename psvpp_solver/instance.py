@@ -0,0 +1,160 @@
+"""Instance data of the problem, with lookup tables precomputed for the
+evaluators.
+
+The distances and costs of an instance never change during a search, so the
+cost of sailing each arc with each vessel is computed once:
+
+    arc_costs[v, b, a] == sailing_costs[v] * distances[b, a]
+
+The cost of a route is then a sum of table lookups, without a separate
+product with the sailing costs. All arrays are C-contiguous, and the cost
+tables can be stored as float32 to halve their memory for large instances.
+
+Example:
+
+    instance = Instance(weekly_charter_costs, sailing_costs, distances,
+                        required_services, max_v_prepared, n_days_available)
+    evaluator = FitnessEvaluator.from_instance(instance)
+"""
+import copy
+
+import numpy as np
+
+from psvpp_solver.durations import voyage_durations
+from psvpp_solver.loads import demand_table
+
+
+def vessel_arc_costs(sailing_costs: np.ndarray,
+                     distances: np.ndarray,
+                     dtype=np.float64) -> np.ndarray:
+    """Cost of sailing each arc with each vessel.
+
+    Args:
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): (n_installations + 1) x (n_installations + 1)
+            array with distances between the depot (index 0) and
+            installations.
+        dtype (np.dtype): Type of the table.
+
+    Returns:
+        np.ndarray: Array of shape (n_vessels, n_nodes, n_nodes).
+    """
+    sailing_costs = np.asarray(sailing_costs, dtype=np.float64)
+    distances = np.asarray(distances, dtype=np.float64)
+    return np.ascontiguousarray(sailing_costs[:, None, None] * distances,
+                                dtype=dtype)
+
+
+class Instance:
+    """Data of a problem instance.
+
+    Args:
+        weekly_charter_costs (np.array): One entry for each vessel.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+        required_services (np.array): Required service frequency for each
+            installation.
+        max_v_prepared (np.array): Vessels the depot can prepare each day.
+        n_days_available (np.array): Days available for each vessel.
+        dtype (np.dtype): Type of the distances and cost tables, float64 or
+            float32. Costs are always summed in float64.
+        vessel_speeds (np.array): Speed of each vessel, in distance per
+            hour. Without speeds every voyage takes one day, otherwise see
+            `durations`.
+        service_times (np.array): Hours spent at each installation.
+        hours_per_day (float): Working hours in a day.
+        demands (np.array): Demand delivered on each visit to each
+            installation. Deck capacity is only checked with both demands
+            and capacities, see `loads`.
+        deck_capacities (np.array): Deck capacity of each vessel.
+    """
+
+    def __init__(self,
+                 weekly_charter_costs: np.ndarray,
+                 sailing_costs: np.ndarray,
+                 distances: np.ndarray,
+                 required_services: np.ndarray,
+                 max_v_prepared: np.ndarray,
+                 n_days_available: np.ndarray,
+                 dtype=np.float64,
+                 vessel_speeds: np.ndarray = None,
+                 service_times: np.ndarray = None,
+                 hours_per_day: float = 24.0,
+                 demands: np.ndarray = None,
+                 deck_capacities: np.ndarray = None):
+        self.dtype = np.dtype(dtype)
+        self.weekly_charter_costs = np.ascontiguousarray(weekly_charter_costs,
+                                                         dtype=np.float64)
+        self.sailing_costs = np.ascontiguousarray(sailing_costs,
+                                                  dtype=np.float64)
+        self.distances = np.ascontiguousarray(distances, dtype=self.dtype)
+        self.required_services = np.ascontiguousarray(required_services,
+                                                      dtype=np.int64)
+        self.max_v_prepared = np.ascontiguousarray(max_v_prepared,
+                                                   dtype=np.int64)
+        self.n_days_available = np.ascontiguousarray(n_days_available,
+                                                     dtype=np.int64)
+        self.vessel_speeds = (None if vessel_speeds is None
+                              else np.ascontiguousarray(vessel_speeds,
+                                                        dtype=np.float64))
+        self.service_times = (None if service_times is None
+                              else np.ascontiguousarray(service_times,
+                                                        dtype=np.float64))
+        self.hours_per_day = hours_per_day
+        # Demand of each node, indexed by installation number
+        self.demands = (None if demands is None
+                        else demand_table(demands, self.dtype))
+        self.deck_capacities = (None if deck_capacities is None
+                                else np.ascontiguousarray(deck_capacities,
+                                                          dtype=np.float64))
+
+        self.total_charter_cost = float(np.sum(self.weekly_charter_costs))
+        self.arc_costs = vessel_arc_costs(self.sailing_costs, distances,
+                                          self.dtype)
+
+    def voyage_durations(self, routes: np.ndarray) -> np.ndarray:
+        """Days each voyage of routes takes, see
+        `durations.voyage_durations`, or None if voyages take one day."""
+        if self.vessel_speeds is None:
+            return None
+        return voyage_durations(routes, self.distances, self.vessel_speeds,
+                                self.service_times, self.hours_per_day)
+
+    @property
+    def n_vessels(self) -> int:
+        return len(self.weekly_charter_costs)
+
+    @property
+    def n_installations(self) -> int:
+        return len(self.required_services)
+
+    @property
+    def n_days_in_period(self) -> int:
+        return len(self.max_v_prepared)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.distances)
+
+    def select_vessels(self, vessels) -> "Instance":
+        """Instance with a subset of the vessels, sharing the distances and
+        slicing the cost tables instead of computing them again.
+
+        Args:
+            vessels: Index of the vessels to keep, in order.
+
+        Returns:
+            Instance: The instance with the selected vessels.
+        """
+        vessels = np.asarray(vessels)
+        instance = copy.copy(self)
+        for name in ("weekly_charter_costs", "sailing_costs",
+                     "n_days_available", "arc_costs", "vessel_speeds",
+                     "deck_capacities"):
+            if getattr(self, name) is None:
+                continue
+            setattr(instance, name,
+                    np.ascontiguousarray(getattr(self, name)[vessels]))
+        instance.total_charter_cost = float(
+            np.sum(instance.weekly_charter_costs))
+        return instance
@@ -0,0 +1,153 @@
+"""Island model genetic search across processes.
+
+Each island runs its own `GeneticSearch` in a separate process. Every
+migration_interval generations each island sends copies of its best
+individuals to the next island in a ring and inserts the individuals received
+from the previous island. Islands wait for their migrants, so with a seed the
+run is reproducible regardless of how the processes are scheduled.
+
+Example:
+
+    search = IslandSearch(weekly_charter_costs, sailing_costs, distances,
+                          required_services, max_v_prepared,
+                          n_days_available, n_days_in_period=7,
+                          n_islands=8, seed=1)
+    routes, cost = search.run(n_generations=200)
+"""
+import multiprocessing
+import os
+import queue
+
+import numpy as np
+
+from psvpp_solver.genetic import GeneticSearch
+from psvpp_solver.utils import spawn_generators
+
+
+def _run_island(index: int,
+                search_args: tuple,
+                search_kwargs: dict,
+                rng: np.random.Generator,
+                n_generations: int,
+                migration_interval: int,
+                n_migrants: int,
+                inboxes: list,
+                results: multiprocessing.Queue):
+    """Run one island and put (index, routes, cost) in results."""
+    search = GeneticSearch(*search_args, seed=rng, **search_kwargs)
+    outbox = inboxes[(index + 1) % len(inboxes)]
+
+    remaining = n_generations
+    while remaining > 0:
+        n_epoch = min(migration_interval, remaining)
+        search.run(n_epoch)
+        remaining -= n_epoch
+        if remaining > 0 and len(inboxes) > 1:
+            outbox.put(search.elite(n_migrants))
+            search.immigrate(inboxes[index].get())
+
+    results.put((index, search.best_routes, search.best_cost))
+
+
+class IslandSearch:
+    """Genetic search on several islands with periodic migration.
+
+    Args:
+        weekly_charter_costs (np.array): One entry for each vessel.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+        required_services (np.array): Required service frequency for each
+            installation.
+        max_v_prepared (np.array): Vessels the depot can prepare each day.
+        n_days_available (np.array): Days available for each vessel.
+        n_days_in_period (int): Number of days in period.
+        n_islands (int): Number of islands, each in its own process. The
+            number of CPUs by default.
+        migration_interval (int): Generations between migrations.
+        n_migrants (int): Individuals each island sends per migration.
+        seed (int): Seed, or random generator, from which each island gets
+            an independent random stream, for reproducible runs.
+        **search_kwargs: Further arguments to `GeneticSearch` of each island.
+    """
+
+    def __init__(self,
+                 weekly_charter_costs: np.ndarray,
+                 sailing_costs: np.ndarray,
+                 distances: np.ndarray,
+                 required_services: np.ndarray,
+                 max_v_prepared: np.ndarray,
+                 n_days_available: np.ndarray,
+                 n_days_in_period: int,
+                 n_islands: int = None,
+                 migration_interval: int = 10,
+                 n_migrants: int = 2,
+                 seed: int = None,
+                 **search_kwargs):
+        self.search_args = (weekly_charter_costs, sailing_costs, distances,
+                            required_services, max_v_prepared,
+                            n_days_available, n_days_in_period)
+        self.search_kwargs = search_kwargs
+        self.n_islands = n_islands or os.cpu_count()
+        self.migration_interval = migration_interval
+        self.n_migrants = n_migrants
+        self.rngs = spawn_generators(seed, self.n_islands)
+
+        self.island_costs = np.full(self.n_islands, np.inf)
+        self.best_routes = None
+        self.best_cost = np.inf
+
+    def run(self, n_generations: int) -> tuple:
+        """Run every island for n_generations generations.
+
+        Returns:
+            tuple: (routes, cost) of the best feasible schedule found on any
+                island, or (None, inf) if no feasible schedule was found.
+                The best cost of each island is stored in `island_costs`.
+        """
+        context = multiprocessing.get_context()
+        inboxes = [context.Queue() for _ in range(self.n_islands)]
+        results = context.Queue()
+        processes = [context.Process(target=_run_island,
+                                     args=(index,
+                                           self.search_args,
+                                           self.search_kwargs,
+                                           rng,
+                                           n_generations,
+                                           self.migration_interval,
+                                           self.n_migrants,
+                                           inboxes,
+                                           results),
+                                     daemon=True)
+                     for index, rng in enumerate(self.rngs)]
+        for process in processes:
+            process.start()
+
+        island_routes = [None] * self.n_islands
+        try:
+            for _ in range(self.n_islands):
+                index, routes, cost = self._get_result(results, processes)
+                island_routes[index] = routes
+                self.island_costs[index] = cost
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+        # Results arrive in any order, so pick the best by island index
+        best = np.argmin(self.island_costs)
+        if self.island_costs[best] < self.best_cost:
+            self.best_routes = island_routes[best]
+            self.best_cost = self.island_costs[best]
+        return self.best_routes, self.best_cost
+
+    @staticmethod
+    def _get_result(results: multiprocessing.Queue, processes: list):
+        """Wait for the next island result, failing if an island crashed."""
+        while True:
+            try:
+                return results.get(timeout=1.0)
+            except queue.Empty:
+                if any(process.exitcode not in (None, 0)
+                       for process in processes):
+                    raise RuntimeError("An island process failed.")
@@ -0,0 +1,61 @@
+"""Deck loads of voyages.
+
+Each visit delivers the demand of its installation, so a vessel leaves the
+depot loaded with the demand of every installation on its voyage. The demand
+of each node is kept in a table indexed by installation number, with zero for
+the depot (index 0) and the zero padding of the routes, so the loads of a
+whole population are a gather and a cumulative sum over the installation axis
+of the routes:
+
+    delivered[..., k] == sum of the demands of the first k + 1 visits
+
+The last entry is the load of the voyage when leaving the depot, which must
+fit on the deck of the vessel, see `constraints.deck_capacity_violation`.
+"""
+import numpy as np
+
+
+def demand_table(demands: np.ndarray, dtype=np.float64) -> np.ndarray:
+    """Demand of each node, indexed by installation number.
+
+    Args:
+        demands (np.array): Demand delivered on each visit to each
+            installation.
+        dtype (np.dtype): Type of the table.
+
+    Returns:
+        np.ndarray: Array of length n_installations + 1, with zero demand for
+            the depot.
+    """
+    table = np.zeros(len(demands) + 1, dtype=dtype)
+    table[1:] = demands
+    return table
+
+
+def delivered_loads(routes: np.ndarray, demands: np.ndarray) -> np.ndarray:
+    """Load delivered after each visit of every voyage.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (..., n_vessels, n_days, n_installations).
+        demands (np.ndarray): Demand table from `demand_table`.
+
+    Returns:
+        np.ndarray: Array of the same shape as routes.
+    """
+    return np.cumsum(np.take(demands, routes), axis=-1)
+
+
+def voyage_loads(routes: np.ndarray, demands: np.ndarray) -> np.ndarray:
+    """Load of every voyage when leaving the depot.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (..., n_vessels, n_days, n_installations).
+        demands (np.ndarray): Demand table from `demand_table`.
+
+    Returns:
+        np.ndarray: Array of shape (..., n_vessels, n_days), zero where no
+            voyage departs.
+    """
+    return delivered_loads(routes, demands)[..., -1]
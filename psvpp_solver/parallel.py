@@ -0,0 +1,331 @@
+"""Parallel evaluation of populations in a process pool.
+
+The population tensor, the distances and arc cost tables and the output
+arrays live in `multiprocessing.shared_memory`. For each evaluation workers
+only receive the names of the shared blocks and an index range, and attach
+to the blocks the first time they see them, so no routes are pickled.
+
+Example:
+
+    with ParallelEvaluator(FitnessEvaluator(...), n_workers=32) as evaluator:
+        population = evaluator.shared_population(pop_size, n_vessels,
+                                                 n_days, n_installations)
+        population[:] = ...  # Written directly into shared memory
+        fitness = evaluator(population)
+
+Populations in a `population_store.PopulationStore` are read by the workers
+from the store's memory-mapped files, again without pickling any routes:
+
+    evaluator.evaluate_store(store)
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from psvpp_solver.constraints import N_CONSTRAINTS
+from psvpp_solver.cost import Fitness
+from psvpp_solver.cost import FitnessEvaluator
+from psvpp_solver.population_store import DEFAULT_CHUNK_SIZE
+from psvpp_solver.population_store import PopulationStore
+
+
+def _open_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing shared memory block without taking part in its
+    cleanup, which is left to the process that created it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # track was added in Python 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedArray:
+    """NumPy array in a shared memory block.
+
+    Pickling a SharedArray only pickles the name, shape and dtype, and the
+    unpickled array is attached to the same memory.
+
+    Args:
+        shape (tuple): Shape of the array.
+        dtype (np.dtype): Type of the array.
+        name (str): Name of an existing block to attach to, or None to create
+            a new block owned by this object.
+    """
+
+    def __init__(self, shape: tuple, dtype, name: str = None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+
+        if self.owner:
+            size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._memory = _open_shared_memory(name)
+
+        self.array = np.ndarray(self.shape, dtype=self.dtype,
+                                buffer=self._memory.buf)
+
+    @classmethod
+    def copy_of(cls, array: np.ndarray) -> "SharedArray":
+        """Create a shared array with a copy of array."""
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    def __reduce__(self):
+        return self.__class__, (self.shape, self.dtype, self.name)
+
+    def close(self):
+        """Detach from the block, and free it if this object owns it."""
+        self.array = None
+        self._memory.close()
+        if self.owner:
+            self._memory.unlink()
+
+
+# State of each worker process, set by _initialize_worker
+_worker = {}
+
+
+def _initialize_worker(distances: SharedArray,
+                       arc_costs: SharedArray,
+                       weekly_charter_costs: np.ndarray,
+                       sailing_costs: np.ndarray,
+                       required_services: np.ndarray,
+                       max_v_prepared: np.ndarray,
+                       n_days_available: np.ndarray,
+                       voyage_data: dict):
+    _worker["tables"] = (distances, arc_costs)
+    _worker["evaluator"] = FitnessEvaluator(weekly_charter_costs,
+                                            sailing_costs,
+                                            distances.array,
+                                            required_services,
+                                            max_v_prepared,
+                                            n_days_available,
+                                            arc_costs=arc_costs.array,
+                                            **voyage_data)
+    _worker["buffers"] = {}
+
+
+def _attach_buffers(names: tuple, shape: tuple) -> tuple:
+    """Return the population, cost and violations arrays of one of the
+    evaluator's sets of shared buffers, attaching once per worker and buffer
+    allocation.
+
+    The evaluator has at most two sets of buffers at a time, the shared
+    population and the staging buffers, so older attachments are closed.
+    """
+    buffers = _worker["buffers"]
+    if names not in buffers:
+        if len(buffers) == 2:
+            for shared in buffers.pop(next(iter(buffers))):
+                shared.close()
+        buffers[names] = (
+            SharedArray(shape, np.int8, names[0]),
+            SharedArray(shape[:1], float, names[1]),
+            SharedArray((shape[0], N_CONSTRAINTS), float, names[2]))
+    return tuple(shared.array for shared in buffers[names])
+
+
+def _evaluate_range(names: tuple, shape: tuple, start: int, stop: int):
+    population, cost, violations = _attach_buffers(names, shape)
+    fitness = _worker["evaluator"](population[start:stop])
+    cost[start:stop] = fitness.cost
+    violations[start:stop] = fitness.violations
+
+
+def _evaluate_store_range(store: PopulationStore, start: int, stop: int):
+    fitness = _worker["evaluator"](store.routes[start:stop])
+    store.cost[start:stop] = fitness.cost
+    store.violations[start:stop] = fitness.violations
+    store.close()
+
+
+def _allocate(shape: tuple) -> tuple:
+    """Shared (population, cost, violations) buffers for populations of
+    the given shape."""
+    return (SharedArray(shape, np.int8),
+            SharedArray(shape[:1], float),
+            SharedArray((shape[0], N_CONSTRAINTS), float))
+
+
+def _free(buffers: tuple):
+    if buffers is not None:
+        for shared in buffers:
+            shared.close()
+
+
+class ParallelEvaluator:
+    """Evaluate populations with a pool of worker processes.
+
+    Works as a drop-in replacement for calling a `FitnessEvaluator`, whose
+    instance data and penalty weights it uses. Workers compute cost and
+    constraint violations of contiguous index ranges of the population, and
+    the penalties are applied in the calling process with the current
+    weights.
+
+    Args:
+        evaluator (FitnessEvaluator): Evaluator with the instance data and
+            penalty weights.
+        n_workers (int): Number of worker processes, the number of CPUs by
+            default.
+    """
+
+    def __init__(self, evaluator: FitnessEvaluator, n_workers: int = None):
+        self.evaluator = evaluator
+        self.n_workers = n_workers or os.cpu_count()
+
+        self._distances = SharedArray.copy_of(evaluator.distances)
+        self._arc_costs = SharedArray.copy_of(evaluator.arc_costs)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            initializer=_initialize_worker,
+            initargs=(self._distances,
+                      self._arc_costs,
+                      evaluator.weekly_charter_costs,
+                      evaluator.sailing_costs,
+                      evaluator.required_services,
+                      evaluator.max_v_prepared,
+                      evaluator.n_days_available,
+                      dict(vessel_speeds=evaluator.vessel_speeds,
+                           service_times=evaluator.service_times,
+                           hours_per_day=evaluator.hours_per_day,
+                           demands=evaluator.demands,
+                           deck_capacities=evaluator.deck_capacities)))
+
+        # (population, cost, violations) of the buffer returned by
+        #  shared_population, and of the buffer other populations are
+        #  copied into
+        self._shared = None
+        self._staging = None
+
+    @property
+    def penalty(self):
+        return self.evaluator.penalty
+
+    def shared_population(self, *shape) -> np.ndarray:
+        """Allocate the shared population buffer and return it.
+
+        Populations written into this buffer are evaluated without being
+        copied. Allocating a buffer of another shape invalidates the
+        previously returned buffer. Evaluating other populations never
+        writes to it.
+
+        Args:
+            shape: (pop_size, n_vessels, n_days, n_installations).
+        """
+        if self._shared is None or self._shared[0].shape != tuple(shape):
+            _free(self._shared)
+            self._shared = _allocate(shape)
+        return self._shared[0].array
+
+    def _evaluate_shared(self, buffers: tuple, pop_size: int) -> tuple:
+        """Evaluate the first pop_size individuals of a set of shared
+        buffers.
+
+        Returns:
+            tuple: Copies of (cost, violations).
+        """
+        population, cost, violations = buffers
+        bounds = np.linspace(0, pop_size, self.n_workers + 1).astype(int)
+        names = (population.name, cost.name, violations.name)
+        futures = [self._pool.submit(_evaluate_range,
+                                     names,
+                                     population.shape,
+                                     start,
+                                     stop)
+                   for start, stop in zip(bounds[:-1], bounds[1:])
+                   if stop > start]
+        for future in futures:
+            future.result()
+
+        return (cost.array[:pop_size].copy(),
+                violations.array[:pop_size].copy())
+
+    def __call__(self, population: np.ndarray) -> Fitness:
+        """Evaluate each individual in the population.
+
+        Args:
+            population (np.ndarray): Routes of shape
+                (pop_size, n_vessels, n_days, n_installations), preferably
+                the array from `shared_population`. Other populations are
+                copied into a separate staging buffer, in chunks if they
+                are larger than it, and the shared population is left
+                unchanged.
+
+        Returns:
+            Fitness: Cost terms, each with pop_size as first dimension.
+        """
+        pop_size = len(population)
+        shared = None if self._shared is None else self._shared[0].array
+
+        if shared is not None and np.shares_memory(population, shared):
+            if population.ctypes.data != shared.ctypes.data:
+                raise ValueError("Shared populations must start at the start "
+                                 "of the shared buffer.")
+            cost, violations = self._evaluate_shared(self._shared, pop_size)
+        else:
+            if (self._staging is None
+                    or self._staging[0].shape[1:] != population.shape[1:]):
+                _free(self._staging)
+                self._staging = _allocate((max(pop_size, 1),
+                                           *population.shape[1:]))
+            staging = self._staging[0].array
+            chunks = [(np.empty(0), np.empty((0, N_CONSTRAINTS)))]
+            for start in range(0, pop_size, len(staging)):
+                chunk = population[start:start + len(staging)]
+                staging[:len(chunk)] = chunk
+                chunks.append(self._evaluate_shared(self._staging,
+                                                    len(chunk)))
+            cost = np.concatenate([chunk[0] for chunk in chunks])
+            violations = np.concatenate([chunk[1] for chunk in chunks])
+
+        penalties = violations * self.penalty.weights
+        charter_cost = np.full(pop_size,
+                               np.sum(self.evaluator.weekly_charter_costs))
+        return Fitness(charter_cost=charter_cost,
+                       sailing_cost=cost - charter_cost,
+                       violations=violations,
+                       penalties=penalties,
+                       penalized_cost=cost + penalties.sum(axis=1))
+
+    def evaluate_store(self, store: PopulationStore,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Evaluate the individuals of a store, storing their cost and
+        constraint violations like `PopulationStore.evaluate`.
+
+        Each worker opens the store's files and evaluates chunks of at most
+        chunk_size individuals, so the population is never loaded in full
+        by any process.
+
+        Args:
+            store (PopulationStore): Store open for writing.
+            chunk_size (int): Individuals evaluated at once by a worker.
+        """
+        store.flush()
+        futures = [self._pool.submit(_evaluate_store_range, store,
+                                     chunk.start, chunk.stop)
+                   for chunk in store.chunks(chunk_size)]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        """Shut down the workers and free the shared memory."""
+        self._pool.shutdown()
+        _free(self._shared)
+        _free(self._staging)
+        self._shared = self._staging = None
+        self._distances.close()
+        self._arc_costs.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
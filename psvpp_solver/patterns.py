@@ -0,0 +1,145 @@
+"""Sampling of properly spread visit patterns without rejection.
+
+The days between consecutive services of an installation, wrapping around
+the period, are all Pf_min or Pf_max (see
+`constraints.calculate_spread_limits`). A visit pattern is therefore given
+by the day of one service and the sequence of days between services after
+it. Every valid pattern with n services corresponds to exactly n such
+(start day, sequence) pairs, one for each of its services, so drawing the
+start day and the sequence uniformly draws uniformly among valid patterns.
+
+The valid sequences only depend on the number of days in the period and the
+service frequency, so they are tabulated once and cached.
+"""
+from functools import lru_cache
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from psvpp_solver.constraints import calculate_spread_limits
+
+# Above this number of sequences, sequences are drawn by shuffling instead
+#  of from a table
+MAX_TABLE_SIZE = 2**12
+
+
+def _n_long_gaps(n_days_in_period: int, n_services: int) -> tuple:
+    """Return the shortest gap, and how many gaps are one day longer."""
+    Pf_min, Pf_max = calculate_spread_limits(n_days_in_period,
+                                             np.array([n_services]))
+    Pf_min = int(Pf_min[0])
+    n_long = n_days_in_period - n_services - n_services * Pf_min
+    if (not 0 < n_services <= n_days_in_period
+            or not 0 <= n_long <= n_services
+            or (n_long and Pf_min == Pf_max[0])):
+        raise ValueError("No properly spread pattern of {} services in a {} "
+                         "day period.".format(n_services, n_days_in_period))
+    return Pf_min, n_long
+
+
+@lru_cache(maxsize=None)
+def visit_pattern_table(n_days_in_period: int, n_services: int) -> np.ndarray:
+    """Table of the valid sequences of days between services.
+
+    Each row holds the service days relative to the first service, e.g. the
+    rows for three services in a seven day period are
+
+        array([[0, 3, 5],
+               [0, 2, 5],
+               [0, 2, 4]])
+
+    Args:
+        n_days_in_period (int): Number of days in period.
+        n_services (int): Required service frequency.
+
+    Returns:
+        np.ndarray: Read-only array of shape (n_sequences, n_services), or
+            None if there are more than MAX_TABLE_SIZE sequences.
+    """
+    Pf_min, n_long = _n_long_gaps(n_days_in_period, n_services)
+    if comb(n_services, n_long) > MAX_TABLE_SIZE:
+        return None
+
+    gaps = np.full((comb(n_services, n_long), n_services), Pf_min + 1)
+    for row, long_gaps in enumerate(combinations(range(n_services), n_long)):
+        gaps[row, list(long_gaps)] += 1
+
+    table = np.zeros(gaps.shape, dtype=np.int64)
+    np.cumsum(gaps[:, :-1], axis=1, out=table[:, 1:])
+    table.flags.writeable = False
+    return table
+
+
+def sample_service_days(n_days_in_period: int,
+                        n_services: int,
+                        size: int,
+                        rng: np.random.Generator = None) -> np.ndarray:
+    """Draw properly spread service days uniformly among all valid patterns.
+
+    Args:
+        n_days_in_period (int): Number of days in period.
+        n_services (int): Required service frequency.
+        size (int): Number of patterns to draw.
+        rng (np.random.Generator): Random generator, or seed for one.
+
+    Returns:
+        np.ndarray: Array of shape (size, n_services) with the service days of
+            each pattern, not necessarily sorted.
+    """
+    rng = np.random.default_rng(rng)
+    table = visit_pattern_table(n_days_in_period, n_services)
+
+    if table is not None:
+        offsets = table[rng.integers(len(table), size=size)]
+    else:
+        # Shuffle which gaps are long
+        Pf_min, n_long = _n_long_gaps(n_days_in_period, n_services)
+        ranks = np.argsort(rng.random((size, n_services)), axis=1)
+        gaps = Pf_min + 1 + (ranks < n_long)
+        offsets = np.zeros((size, n_services), dtype=np.int64)
+        np.cumsum(gaps[:, :-1], axis=1, out=offsets[:, 1:])
+
+    start = rng.integers(n_days_in_period, size=(size, 1))
+    return (start + offsets) % n_days_in_period
+
+
+def sample_visits(n_days_in_period: int,
+                  required_services: np.ndarray,
+                  size: int = None,
+                  rng: np.random.Generator = None) -> np.ndarray:
+    """Draw visits for each installation, for one or a population of
+    individuals.
+
+    Patterns are drawn in bulk for all installations with the same service
+    frequency.
+
+    Args:
+        n_days_in_period (int): Number of days in period.
+        required_services (np.array): Required service frequency for each
+            installation.
+        size (int): Number of individuals, or None for a single one.
+        rng (np.random.Generator): Random generator, or seed for one.
+
+    Returns:
+        np.ndarray: Boolean array of shape (n_installations, n_days), or
+            (size, n_installations, n_days) if size is given.
+    """
+    rng = np.random.default_rng(rng)
+    required_services = np.asarray(required_services)
+    n_individuals = 1 if size is None else size
+    visits = np.zeros((n_individuals, len(required_services),
+                       n_days_in_period), dtype=bool)
+
+    for n_services in np.unique(required_services):
+        installations = np.nonzero(required_services == n_services)[0]
+        days = sample_service_days(n_days_in_period,
+                                   int(n_services),
+                                   size=n_individuals * len(installations),
+                                   rng=rng)
+        days = days.reshape(n_individuals, len(installations), -1)
+        visits[np.arange(n_individuals)[:, None, None],
+               installations[None, :, None],
+               days] = True
+
+    return visits[0] if size is None else visits
@@ -0,0 +1,219 @@
+"""Population storage in memory-mapped files.
+
+Populations of hundreds of thousands of individuals, or archives of elite
+individuals collected over many runs, can be larger than memory. A
+`PopulationStore` keeps the routes, unpenalized cost and constraint
+violations of its individuals in `.npy` files under a directory, opened with
+`np.lib.format.open_memmap`, so only the pages in use are held in memory and
+the operating system writes them back to disk.
+
+Populations are evaluated in streaming chunks, which bounds the memory of
+the evaluator's buffers to one chunk. A store pickles as its directory, so
+worker processes open the same files and read the routes without copies,
+see `parallel.ParallelEvaluator.evaluate_store`.
+
+Example:
+
+    store = PopulationStore.create("population", 1_000_000, n_vessels,
+                                   n_days, n_installations)
+    initial_population(..., out=store.allocate(200_000))
+    store.evaluate(evaluator)
+    best = store.routes[np.argmin(store.penalized_cost(weights))]
+"""
+import os
+
+import numpy as np
+
+from psvpp_solver.constraints import N_CONSTRAINTS
+
+DEFAULT_CHUNK_SIZE = 8192
+
+_FILES = ("routes", "visits", "departures", "cost", "violations", "size")
+
+
+class PopulationStore:
+    """Individuals stored in memory-mapped .npy files.
+
+    Use `create` for a new store. The individuals are the first `len(store)`
+    of the allocated capacity.
+
+    Args:
+        path (str): Directory of an existing store.
+        mode (str): "r" to open read-only, "r+" to also write.
+    """
+
+    def __init__(self, path: str, mode: str = "r+"):
+        self.path = path
+        self.mode = mode
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"),
+                                mmap_mode=mode)
+                  for name in _FILES}
+        self.routes = arrays["routes"]
+        self.visits = arrays["visits"]
+        self.departures = arrays["departures"]
+        self.cost = arrays["cost"]
+        self.violations = arrays["violations"]
+        # Number of individuals, in a file so all processes see appends
+        self._size = arrays["size"]
+
+    @classmethod
+    def create(cls,
+               path: str,
+               capacity: int,
+               n_vessels: int,
+               n_days: int,
+               n_installations: int) -> "PopulationStore":
+        """Create an empty store, with files for capacity individuals.
+
+        Files are sparse until written, so unused capacity takes no disk
+        space on most file systems.
+
+        Args:
+            path (str): Directory to create the files in.
+            capacity (int): Maximum number of individuals.
+            n_vessels (int): Number of vessels.
+            n_days (int): Number of days in period.
+            n_installations (int): Number of installations.
+
+        Returns:
+            PopulationStore: The store, open for writing.
+        """
+        os.makedirs(path, exist_ok=True)
+        shapes = dict(
+            routes=((capacity, n_vessels, n_days, n_installations), np.int8),
+            visits=((capacity, n_installations, n_days), bool),
+            departures=((capacity, n_vessels, n_days), bool),
+            cost=((capacity,), np.float64),
+            violations=((capacity, N_CONSTRAINTS), np.float64),
+            size=((1,), np.int64))
+        for name, (shape, dtype) in shapes.items():
+            array = np.lib.format.open_memmap(
+                os.path.join(path, f"{name}.npy"), mode="w+", dtype=dtype,
+                shape=shape)
+            if name == "cost":
+                array[:] = np.nan
+            array.flush()
+            del array
+        return cls(path, "r+")
+
+    def __reduce__(self):
+        return self.__class__, (self.path, self.mode)
+
+    def __len__(self) -> int:
+        return int(self._size[0])
+
+    @property
+    def capacity(self) -> int:
+        return len(self.routes)
+
+    def allocate(self, n_individuals: int) -> tuple:
+        """Add n_individuals individuals, to be written in place.
+
+        Args:
+            n_individuals (int): Number of individuals to add.
+
+        Returns:
+            tuple: Writable (visits, departures, routes) views of the new
+                individuals, in the order of `utils.initial_population`'s
+                out argument.
+        """
+        start = len(self)
+        if start + n_individuals > self.capacity:
+            raise ValueError(f"Store of capacity {self.capacity} can not "
+                             f"hold {start + n_individuals} individuals.")
+        self._size[0] = start + n_individuals
+        new = slice(start, start + n_individuals)
+        self.cost[new] = np.nan
+        return self.visits[new], self.departures[new], self.routes[new]
+
+    def append(self,
+               routes: np.ndarray,
+               visits: np.ndarray = None,
+               departures: np.ndarray = None) -> slice:
+        """Copy individuals to the end of the store.
+
+        Args:
+            routes (np.ndarray): Routes of shape
+                (n_individuals, n_vessels, n_days, n_installations).
+            visits (np.ndarray): Visits of the routes, derived from the
+                routes if not given.
+            departures (np.ndarray): Departures of the routes, derived from
+                the routes if not given.
+
+        Returns:
+            slice: Index of the added individuals.
+        """
+        start = len(self)
+        out_visits, out_departures, out_routes = self.allocate(len(routes))
+        out_routes[:] = routes
+        if departures is None:
+            departures = routes[..., 0] > 0
+        out_departures[:] = departures
+        if visits is None:
+            out_visits[:] = False
+            individual, vessel, day, order = np.nonzero(routes)
+            installation = routes[individual, vessel, day, order] - 1
+            out_visits[individual, installation, day] = True
+        else:
+            out_visits[:] = visits
+        return slice(start, len(self))
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Iterate over slices of at most chunk_size individuals."""
+        for start in range(0, len(self), chunk_size):
+            yield slice(start, min(start + chunk_size, len(self)))
+
+    def evaluate(self, evaluator, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 unevaluated_only: bool = False):
+        """Evaluate the individuals a chunk at a time, storing the cost and
+        constraint violations.
+
+        Args:
+            evaluator: `cost.FitnessEvaluator`, or any evaluator returning a
+                `cost.Fitness`.
+            chunk_size (int): Individuals evaluated at once.
+            unevaluated_only (bool): Skip chunks already evaluated.
+        """
+        for chunk in self.chunks(chunk_size):
+            if unevaluated_only and not np.isnan(self.cost[chunk]).any():
+                continue
+            fitness = evaluator(self.routes[chunk])
+            self.cost[chunk] = fitness.cost
+            self.violations[chunk] = fitness.violations
+
+    def penalized_cost(self, weights: np.ndarray,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """Penalized cost of each individual with the given weights."""
+        penalized_cost = np.empty(len(self))
+        for chunk in self.chunks(chunk_size):
+            penalized_cost[chunk] = (self.cost[chunk]
+                                     + self.violations[chunk] @ weights)
+        return penalized_cost
+
+    def feasible(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """Whether each individual satisfies all constraints."""
+        feasible = np.empty(len(self), dtype=bool)
+        for chunk in self.chunks(chunk_size):
+            feasible[chunk] = ~np.any(self.violations[chunk] > 0, axis=-1)
+        return feasible
+
+    def flush(self):
+        """Write the changes to disk."""
+        for array in (self.routes, self.visits, self.departures, self.cost,
+                      self.violations, self._size):
+            if isinstance(array, np.memmap) and self.mode != "r":
+                array.flush()
+
+    def close(self):
+        """Flush the changes and release the files."""
+        if self.routes is None:
+            return
+        self.flush()
+        self.routes = self.visits = self.departures = None
+        self.cost = self.violations = self._size = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,168 @@
+"""Timing and counters of the stages of the search.
+
+A `Profiler` accumulates the wall time and number of calls of named stages,
+named counters such as retries, and the hit rate of caches, and summarizes
+them for every generation, including the number of individuals created per
+second. Summaries are exported as JSON, and with a logger each generation
+is logged as one line of JSON.
+
+Searches use a `NullProfiler` by default, whose methods do nothing and whose
+stages are a shared no-op context manager, so instrumented code costs a
+method call per stage when profiling is off.
+
+Example:
+
+    profiler = Profiler(logger=logging.getLogger("psvpp"))
+    search = GeneticSearch(..., profiler=profiler)
+    search.run(100)
+    profiler.to_json("profile.json")
+"""
+import contextlib
+import json
+import logging
+import time
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class NullProfiler:
+    """Profiler that records nothing."""
+
+    enabled = False
+
+    def stage(self, name: str):
+        return _NULL_STAGE
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+    def start_generation(self):
+        pass
+
+    def end_generation(self, generation: int, n_individuals: int,
+                       caches: dict = None):
+        pass
+
+
+class _Stage:
+    """Context manager adding its wall time and a call to a stage."""
+
+    __slots__ = ("stages", "name", "start")
+
+    def __init__(self, stages: dict, name: str):
+        self.stages = stages
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        stage = self.stages.setdefault(self.name, [0.0, 0])
+        stage[0] += elapsed
+        stage[1] += 1
+
+
+class Profiler(NullProfiler):
+    """Accumulate stage timings and counters, and summarize each
+    generation.
+
+    Args:
+        logger (logging.Logger): Logger to write a JSON line for each
+            generation to, at level. Nothing is logged by default.
+        level (int): Logging level of the generation lines.
+    """
+
+    enabled = True
+
+    def __init__(self, logger: logging.Logger = None,
+                 level: int = logging.INFO):
+        self.logger = logger
+        self.level = level
+        # Name -> [seconds, calls]
+        self.stages = {}
+        self.counters = {}
+        self.caches = {}
+        self.generations = []
+        self._generation_start = None
+
+    def stage(self, name: str) -> _Stage:
+        """Time the code in a with block as the stage name."""
+        return _Stage(self.stages, name)
+
+    def count(self, name: str, n: int = 1):
+        """Add n to the counter name."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def start_generation(self):
+        """Mark the start of a generation."""
+        self._generation_start = (time.perf_counter(),
+                                  {name: tuple(stage) for name, stage
+                                   in self.stages.items()},
+                                  dict(self.counters))
+
+    def end_generation(self,
+                       generation: int,
+                       n_individuals: int,
+                       caches: dict = None) -> dict:
+        """Summarize the generation started by `start_generation`.
+
+        Args:
+            generation (int): Number of the generation.
+            n_individuals (int): Individuals created in the generation.
+            caches (dict): Caches by name, whose `stats` are recorded, e.g.
+                a `voyage_cache.VoyageCache`.
+
+        Returns:
+            dict: Wall time, individuals per second, and the stage timings
+                and counters of the generation, and the cache statistics.
+        """
+        start, stages, counters = self._generation_start
+        seconds = time.perf_counter() - start
+        for name, cache in (caches or {}).items():
+            self.caches[name] = cache.stats()
+
+        summary = dict(
+            generation=generation,
+            seconds=seconds,
+            individuals=n_individuals,
+            individuals_per_second=(n_individuals / seconds if seconds
+                                    else 0.0),
+            stages={name: dict(seconds=stage[0] - stages.get(name,
+                                                             (0, 0))[0],
+                               calls=stage[1] - stages.get(name, (0, 0))[1])
+                    for name, stage in self.stages.items()},
+            counters={name: value - counters.get(name, 0)
+                      for name, value in self.counters.items()},
+            cache_hit_rates={name: stats["hit_rate"]
+                             for name, stats in self.caches.items()})
+        self.generations.append(summary)
+        if self.logger is not None:
+            self.logger.log(self.level, json.dumps(summary))
+        return summary
+
+    def summary(self) -> dict:
+        """Totals of all stages, counters and caches, and the summary of
+        each generation."""
+        return dict(
+            stages={name: dict(seconds=seconds, calls=calls)
+                    for name, (seconds, calls) in self.stages.items()},
+            counters=dict(self.counters),
+            caches=dict(self.caches),
+            generations=list(self.generations))
+
+    def to_json(self, path: str = None, indent: int = 2) -> str:
+        """Return the summary as JSON, and write it to path if given."""
+        text = json.dumps(self.summary(), indent=indent)
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(text + "\n")
+        return text
+
+    def reset(self):
+        """Clear everything recorded."""
+        self.stages.clear()
+        self.counters.clear()
+        self.caches.clear()
+        self.generations.clear()
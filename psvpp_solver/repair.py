@@ -0,0 +1,334 @@
+"""Repair of depot capacity, sailing days and voyage overlap violations.
+
+Schedules from the generators and from crossover can have more departures on
+a day than the depot can prepare, vessels sailing more days than they are
+available, or vessels departing before returning from their previous voyage.
+`repair_schedule` fixes these directly on the routes, in one pass over the
+days and one over the vessels, with three kinds of moves:
+
+    - Reassign: Give a voyage to another vessel that is free that day and
+      has days left, preferring the cheapest vessel per km.
+    - Merge: Insert the installations of a voyage at their cheapest positions
+      in the other voyages sailing the same day, removing a departure.
+    - Shift: Move the installations of a voyage to neighbouring days where
+      their service days stay within the spread limits.
+
+Voyages take one day, a fixed number of days, or with vessel speeds the
+days of each voyage on its vessel, see `durations`. Moves never add load
+beyond the deck capacities, see `loads`. Service frequencies are never
+changed, and spread only by valid shifts.
+Violations no move can fix are left for the penalized cost.
+"""
+import numpy as np
+
+from psvpp_solver.constraints import deck_capacity_violation
+from psvpp_solver.constraints import installation_spread_violation
+from psvpp_solver.constraints import voyage_overlap_violation
+from psvpp_solver.cost import get_voyage
+from psvpp_solver.crossover import _remove_visit
+from psvpp_solver.crossover import insert_visit
+from psvpp_solver.instance import Instance
+from psvpp_solver.loads import voyage_loads
+from psvpp_solver.utils import generate_visits_and_departures_from_routes
+
+
+def _day_durations(routes: np.ndarray,
+                   day: int,
+                   instance: Instance,
+                   voyage_duration: int) -> np.ndarray:
+    """Days each voyage departing on day takes."""
+    durations = instance.voyage_durations(routes[:, day:day + 1])
+    if durations is None:
+        return (routes[:, day, 0] > 0) * voyage_duration
+    return durations[:, 0]
+
+
+def _durations_on_vessels(voyage: np.ndarray,
+                          instance: Instance,
+                          voyage_duration: int) -> np.ndarray:
+    """Days a voyage, zero padded, would take with each vessel."""
+    durations = instance.voyage_durations(
+        np.broadcast_to(voyage, (instance.n_vessels, 1, len(voyage))))
+    if durations is None:
+        return np.full(instance.n_vessels, voyage_duration)
+    return durations[:, 0]
+
+
+def _conflicts(departures: np.ndarray,
+               durations: np.ndarray,
+               day: int,
+               days_needed: np.ndarray) -> np.ndarray:
+    """Whether each vessel departs during a voyage departing on day and
+    taking days_needed days with that vessel, or is still at sea on day."""
+    n_days = departures.shape[1]
+    after = (np.arange(n_days) - day) % n_days
+    before = (day - np.arange(n_days)) % n_days
+    return ((departures & (after < days_needed[:, None]))
+            | (departures & (before >= 1) & (before < durations))).any(axis=1)
+
+
+def _days_chartered(departures: np.ndarray,
+                    durations: np.ndarray,
+                    instance: Instance) -> np.ndarray:
+    """Days each vessel sails. Without vessel speeds, days available count
+    departures, as in `constraints.max_sailing_days_violation`."""
+    if instance.vessel_speeds is None:
+        return departures.sum(axis=1)
+    return durations.sum(axis=1)
+
+
+def _vessel_violations(departures: np.ndarray,
+                       durations: np.ndarray,
+                       instance: Instance) -> float:
+    """Voyage overlap and days chartered beyond availability, summed over
+    the vessels."""
+    return float(voyage_overlap_violation(departures, durations)
+                 + np.maximum(_days_chartered(departures, durations,
+                                              instance)
+                              - instance.n_days_available, 0).sum())
+
+
+def _deck_excess(routes: np.ndarray,
+                 days: list,
+                 instance: Instance) -> float:
+    """Load beyond the deck capacities on voyages departing on days, zero
+    unless the instance has demands and deck capacities."""
+    if instance.demands is None or instance.deck_capacities is None:
+        return 0.0
+    return float(deck_capacity_violation(
+        voyage_loads(routes[:, days], instance.demands),
+        instance.deck_capacities))
+
+
+def _move_voyage(routes: np.ndarray,
+                 departures: np.ndarray,
+                 vessel: int,
+                 day: int,
+                 to_vessel: int,
+                 to_day: int):
+    routes[to_vessel, to_day] = routes[vessel, day]
+    routes[vessel, day] = 0
+    departures[vessel, day] = False
+    departures[to_vessel, to_day] = True
+
+
+def _free_vessels(departures: np.ndarray,
+                  durations: np.ndarray,
+                  day: int,
+                  days_needed: np.ndarray,
+                  instance: Instance) -> np.ndarray:
+    """Vessels with days left for, and no voyage overlapping, a voyage
+    departing on day and taking days_needed days with each vessel."""
+    days_left = (instance.n_days_available
+                 - _days_chartered(departures, durations, instance))
+    return np.nonzero(~_conflicts(departures, durations, day, days_needed)
+                      & (np.where(instance.vessel_speeds is None, 1,
+                                  days_needed) <= days_left))[0]
+
+
+def _overlaps(departures: np.ndarray,
+              durations: np.ndarray,
+              vessel: int,
+              day: int) -> bool:
+    """Whether a voyage overlaps another voyage of its vessel."""
+    duration = durations[vessel, day]
+    departures[vessel, day], durations[vessel, day] = False, 0
+    overlaps = _conflicts(departures[[vessel]], durations[[vessel]], day,
+                          np.array([duration]))[0]
+    departures[vessel, day], durations[vessel, day] = True, duration
+    return overlaps
+
+
+def _reassign(routes: np.ndarray,
+              departures: np.ndarray,
+              durations: np.ndarray,
+              vessel: int,
+              day: int,
+              instance: Instance,
+              voyage_duration: int) -> bool:
+    """Give a voyage to the cheapest free vessel, if any."""
+    days_needed = _durations_on_vessels(routes[vessel, day], instance,
+                                        voyage_duration)
+    duration = durations[vessel, day]
+    departures[vessel, day], durations[vessel, day] = False, 0
+    candidates = _free_vessels(departures, durations, day, days_needed,
+                               instance)
+    departures[vessel, day], durations[vessel, day] = True, duration
+    candidates = candidates[candidates != vessel]
+    if instance.demands is not None and instance.deck_capacities is not None:
+        load = instance.demands[routes[vessel, day]].sum()
+        excess = np.maximum(load - instance.deck_capacities, 0)
+        candidates = candidates[excess[candidates] <= excess[vessel]]
+    if len(candidates) == 0:
+        return False
+    to_vessel = candidates[np.argmin(instance.sailing_costs[candidates])]
+    _move_voyage(routes, departures, vessel, day, to_vessel, day)
+    durations[vessel, day] = 0
+    durations[to_vessel, day] = days_needed[to_vessel]
+    return True
+
+
+def _merge(routes: np.ndarray,
+           departures: np.ndarray,
+           durations: np.ndarray,
+           vessel: int,
+           day: int,
+           instance: Instance,
+           voyage_duration: int) -> bool:
+    """Insert the installations of a voyage into the other voyages of the
+    day, if there are any and the longer voyages do not add overlap, days
+    chartered or deck load."""
+    others = np.nonzero(departures[:, day])[0]
+    others = others[others != vessel]
+    if len(others) == 0:
+        return False
+    violation = _vessel_violations(departures, durations, instance)
+    excess = _deck_excess(routes, [day], instance)
+    saved = routes[:, day].copy(), durations[:, day].copy()
+
+    voyage = get_voyage(routes, vessel, day).copy()
+    routes[vessel, day] = 0
+    departures[vessel, day] = False
+    for installation in voyage:
+        insert_visit(routes, installation, day, others,
+                     instance.sailing_costs, instance.distances)
+    durations[:, day] = _day_durations(routes, day, instance,
+                                       voyage_duration)
+
+    if (_vessel_violations(departures, durations, instance) > violation
+            or _deck_excess(routes, [day], instance) > excess):
+        routes[:, day], durations[:, day] = saved
+        departures[vessel, day] = True
+        return False
+    return True
+
+
+def _shift(routes: np.ndarray,
+           visits: np.ndarray,
+           departures: np.ndarray,
+           durations: np.ndarray,
+           vessel: int,
+           day: int,
+           instance: Instance,
+           voyage_duration: int) -> bool:
+    """Move the installations of a voyage to the nearest days where they are
+    not visited and stay properly spread, inserting them in the voyages
+    sailing that day, or in a new voyage of a free vessel, unless that adds
+    overlap, days chartered or deck load. Returns whether the whole voyage
+    was moved."""
+    n_days = routes.shape[1]
+    for installation in get_voyage(routes, vessel, day).copy():
+        inst = installation - 1
+        for offset in (-1, 1, -2, 2):
+            to_day = (day + offset) % n_days
+            if visits[inst, to_day]:
+                continue
+            shifted = visits[inst].copy()
+            shifted[[day, to_day]] = False, True
+            if installation_spread_violation(
+                    shifted[None], instance.required_services[[inst]]).any():
+                continue
+
+            vessels = np.nonzero(departures[:, to_day])[0]
+            if (len(vessels) == 0
+                    and instance.max_v_prepared[to_day] > 0):
+                single = np.zeros_like(routes[vessel, day])
+                single[0] = installation
+                vessels = _free_vessels(
+                    departures, durations, to_day,
+                    _durations_on_vessels(single, instance, voyage_duration),
+                    instance)
+                vessels = vessels[np.argsort(
+                    instance.sailing_costs[vessels])[:1]]
+            if len(vessels) == 0:
+                continue
+
+            violation = _vessel_violations(departures, durations,
+                                           instance)
+            excess = _deck_excess(routes, [day, to_day], instance)
+            saved = (routes[:, [day, to_day]].copy(),
+                     durations[:, [day, to_day]].copy())
+            _remove_visit(routes, vessel, day, installation)
+            insert_visit(routes, installation, to_day, vessels,
+                         instance.sailing_costs, instance.distances)
+            for changed in (day, to_day):
+                departures[:, changed] = routes[:, changed, 0] > 0
+                durations[:, changed] = _day_durations(
+                    routes, changed, instance, voyage_duration)
+            if (_vessel_violations(departures, durations,
+                                   instance) > violation
+                    or _deck_excess(routes, [day, to_day],
+                                    instance) > excess):
+                routes[:, [day, to_day]], durations[:, [day, to_day]] = saved
+                departures[:, [day, to_day]] = routes[:, [day, to_day],
+                                                      0] > 0
+                continue
+            visits[inst] = shifted
+            break
+
+    return not departures[vessel, day]
+
+
+def repair_schedule(routes: np.ndarray,
+                    instance: Instance,
+                    voyage_duration: int = 1) -> np.ndarray:
+    """Fix depot capacity, max sailing days and voyage overlap violations.
+
+    With vessel speeds in the instance, each voyage takes the days given by
+    `durations.voyage_durations`, updated as moves change the voyages, so
+    reassigned voyages are checked with the duration on the new vessel.
+    Merges and shifts are only applied when the longer voyages do not add
+    overlap, days chartered or, with demands and deck capacities in the
+    instance, load beyond the deck capacities. Voyages are only reassigned
+    to vessels whose deck holds their load as well.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (n_vessels, n_days, n_installations), repaired in place.
+        instance (Instance): Instance data.
+        voyage_duration (int): Days each voyage takes, when the instance has
+            no vessel speeds.
+
+    Returns:
+        np.ndarray: The repaired routes.
+    """
+    visits, departures = generate_visits_and_departures_from_routes(
+        routes, instance.n_installations)
+    durations = instance.voyage_durations(routes)
+    if durations is None:
+        durations = departures * voyage_duration
+    max_v_prepared = instance.max_v_prepared
+
+    # Depot capacity: merge the shortest voyages of crowded days into the
+    #  others, or move them to another day
+    for day in np.nonzero(departures.sum(axis=0) > max_v_prepared)[0]:
+        while departures[:, day].sum() > max_v_prepared[day]:
+            vessels = np.nonzero(departures[:, day])[0]
+            lengths = np.count_nonzero(routes[vessels, day], axis=1)
+            vessel = vessels[np.argmin(lengths)]
+            if not (_merge(routes, departures, durations, vessel, day,
+                           instance, voyage_duration)
+                    or _shift(routes, visits, departures, durations, vessel,
+                              day, instance, voyage_duration)):
+                break
+
+    # Sailing days and overlap: hand voyages of each vessel to free vessels,
+    #  or merge or shift them
+    for vessel in range(instance.n_vessels):
+        for day in np.nonzero(departures[vessel])[0]:
+            if not departures[vessel, day]:
+                continue
+            overworked = (_days_chartered(departures, durations,
+                                          instance)[vessel]
+                          > instance.n_days_available[vessel])
+            if not (overworked
+                    or _overlaps(departures, durations, vessel, day)):
+                continue
+            (_reassign(routes, departures, durations, vessel, day, instance,
+                       voyage_duration)
+             or _merge(routes, departures, durations, vessel, day, instance,
+                       voyage_duration)
+             or _shift(routes, visits, departures, durations, vessel, day,
+                       instance, voyage_duration))
+
+    return routes
@@ -0,0 +1,202 @@
+"""Ordering of the installations visited on a voyage.
+
+`utils.generate_routes_from_visits_and_departures` orders each voyage by
+installation number, which ignores the distances. The functions here find a
+short visiting order instead:
+
+    - Voyages of up to EXACT_MAX_INSTALLATIONS installations are ordered
+      optimally by the Held-Karp dynamic program over subsets.
+    - Longer voyages start from a cheapest insertion order and are improved
+      by 2-opt and Or-opt moves until no move shortens them.
+
+Leg lengths follow `utils.calculate_cost_of_route`: sailing from a to b is
+distances[b, a], so asymmetric distances are handled. Each local search step
+evaluates every move of a kind at once on an array of candidate orders.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from psvpp_solver.cost import calculate_insertion_distances
+from psvpp_solver.cost import get_voyage
+
+EXACT_MAX_INSTALLATIONS = 10
+
+# Moves must shorten a voyage by more than this to be applied
+EPSILON = 1e-9
+
+
+def cheapest_insertion_order(installations: np.ndarray,
+                             distances: np.ndarray) -> np.ndarray:
+    """Order installations by inserting them one at a time, in increasing
+    installation number, at the position adding the least distance.
+
+    Args:
+        installations (np.ndarray): Installation numbers (index + 1).
+        distances (np.array): Distances between depot and installations.
+
+    Returns:
+        np.ndarray: The installations in visiting order.
+    """
+    voyage = np.zeros(0, dtype=np.asarray(installations).dtype)
+    for installation in np.sort(installations):
+        added = calculate_insertion_distances(voyage, installation, distances)
+        voyage = np.insert(voyage, np.argmin(added), installation)
+    return voyage
+
+
+def held_karp(installations: np.ndarray,
+              distances: np.ndarray) -> np.ndarray:
+    """Order installations optimally with the Held-Karp algorithm.
+
+    best[mask, j] is the shortest path from the depot through the
+    installations in the bitmask mask, ending at installation j. Masks are
+    filled in order of their number of installations, all masks of a size at
+    once. Takes O(2^n n^2) time, so only use it for short voyages.
+
+    Args:
+        installations (np.ndarray): Installation numbers (index + 1).
+        distances (np.array): Distances between depot and installations.
+
+    Returns:
+        np.ndarray: The installations in the shortest visiting order.
+    """
+    installations = np.asarray(installations)
+    n = len(installations)
+    if n <= 1:
+        return installations.copy()
+
+    # legs[b, a] is the distance from installation a to b
+    legs = distances[np.ix_(installations, installations)]
+    masks = np.arange(1 << n)
+    in_mask = ((masks[:, None] >> np.arange(n)) & 1).astype(bool)
+    mask_sizes = in_mask.sum(axis=1)
+
+    best = np.full((1 << n, n), np.inf)
+    previous = np.zeros((1 << n, n), dtype=np.intp)
+    best[1 << np.arange(n), np.arange(n)] = distances[installations, 0]
+
+    for size in range(2, n + 1):
+        layer = masks[mask_sizes == size]
+        for j in range(n):
+            ending = layer[in_mask[layer, j]]
+            paths = best[ending ^ (1 << j)] + legs[j]
+            previous[ending, j] = np.argmin(paths, axis=1)
+            best[ending, j] = paths[np.arange(len(ending)),
+                                    previous[ending, j]]
+
+    # Walk back from the best last installation before returning to depot
+    mask = (1 << n) - 1
+    order = np.zeros(n, dtype=np.intp)
+    order[-1] = np.argmin(best[mask] + distances[0, installations])
+    for position in range(n - 1, 0, -1):
+        order[position - 1] = previous[mask, order[position]]
+        mask ^= 1 << order[position]
+    return installations[order]
+
+
+@lru_cache(maxsize=None)
+def _two_opt_moves(n: int) -> np.ndarray:
+    """Orders of positions reversing each segment [i, j] with i < j."""
+    moves = []
+    for i in range(n - 1):
+        for j in range(i + 1, n):
+            move = np.arange(n)
+            move[i:j + 1] = move[i:j + 1][::-1]
+            moves.append(move)
+    return np.array(moves).reshape(-1, n)
+
+
+@lru_cache(maxsize=None)
+def _or_opt_moves(n: int, max_segment: int = 3) -> np.ndarray:
+    """Orders of positions moving each segment of up to max_segment
+    positions to every other position, keeping its direction."""
+    moves = []
+    positions = np.arange(n)
+    for length in range(1, min(max_segment, n - 1) + 1):
+        for start in range(n - length + 1):
+            segment = positions[start:start + length]
+            rest = np.delete(positions, segment)
+            for insert in range(len(rest) + 1):
+                if insert == start:
+                    continue
+                moves.append(np.concatenate((rest[:insert], segment,
+                                             rest[insert:])))
+    return np.array(moves).reshape(-1, n)
+
+
+def _voyage_lengths(voyages: np.ndarray, distances: np.ndarray) -> np.ndarray:
+    """Distance of each row of a (n_voyages, length) array of voyages."""
+    return (distances[voyages[:, 0], 0]
+            + np.sum(distances[voyages[:, 1:], voyages[:, :-1]], axis=1)
+            + distances[0, voyages[:, -1]])
+
+
+def local_search(voyage: np.ndarray, distances: np.ndarray) -> np.ndarray:
+    """Improve a visiting order with 2-opt and Or-opt moves, applying the
+    best improving move until none improves.
+
+    Args:
+        voyage (np.ndarray): Installations in visiting order.
+        distances (np.array): Distances between depot and installations.
+
+    Returns:
+        np.ndarray: The improved order.
+    """
+    voyage = np.asarray(voyage)
+    n = len(voyage)
+    if n <= 1:
+        return voyage.copy()
+    moves = np.concatenate((_two_opt_moves(n), _or_opt_moves(n)))
+
+    length = _voyage_lengths(voyage[None], distances)[0]
+    while True:
+        candidates = voyage[moves]
+        lengths = _voyage_lengths(candidates, distances)
+        best = np.argmin(lengths)
+        if lengths[best] >= length - EPSILON:
+            return voyage
+        voyage, length = candidates[best], lengths[best]
+
+
+def sequence_voyage(installations: np.ndarray,
+                    distances: np.ndarray,
+                    max_exact: int = EXACT_MAX_INSTALLATIONS) -> np.ndarray:
+    """Find a short visiting order of a voyage, exactly for voyages of up to
+    max_exact installations and by local search otherwise.
+
+    Args:
+        installations (np.ndarray): Installation numbers (index + 1).
+        distances (np.array): Distances between depot and installations.
+        max_exact (int): Longest voyage ordered with `held_karp`.
+
+    Returns:
+        np.ndarray: The installations in visiting order.
+    """
+    if len(installations) <= max_exact:
+        return held_karp(installations, distances)
+    return local_search(cheapest_insertion_order(installations, distances),
+                        distances)
+
+
+def sequence_routes(routes: np.ndarray,
+                    distances: np.ndarray,
+                    max_exact: int = EXACT_MAX_INSTALLATIONS) -> np.ndarray:
+    """Reorder every voyage of a schedule with `sequence_voyage`.
+
+    Use `voyage_cache.VoyageCache.sequence` to reuse the orders of voyages
+    seen before.
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (n_vessels, n_days, n_installations), reordered in place.
+        distances (np.array): Distances between depot and installations.
+        max_exact (int): Longest voyage ordered exactly.
+
+    Returns:
+        np.ndarray: The reordered routes.
+    """
+    for vessel, day in zip(*np.nonzero(routes[:, :, 0])):
+        voyage = get_voyage(routes, vessel, day)
+        voyage[:] = sequence_voyage(voyage, distances, max_exact)
+    return routes
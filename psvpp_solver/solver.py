@@ -0,0 +1,67 @@
+"""Entry point for solving an instance with one of the search modes.
+
+Modes:
+
+    - "genetic": One `genetic.GeneticSearch` in this process.
+    - "islands": Several searches in parallel processes with migration, see
+      `islands.IslandSearch`.
+    - "fleet": Searches over fleet sizes of the first vessels, see
+      `fleet.FleetSweep`. The routes returned have a row for each vessel of
+      the best fleet.
+"""
+import numpy as np
+
+from psvpp_solver.fleet import FleetSweep
+from psvpp_solver.genetic import GeneticSearch
+from psvpp_solver.islands import IslandSearch
+
+MODES = ("genetic", "islands", "fleet")
+
+
+def solve(weekly_charter_costs: np.ndarray,
+          sailing_costs: np.ndarray,
+          distances: np.ndarray,
+          required_services: np.ndarray,
+          max_v_prepared: np.ndarray,
+          n_days_available: np.ndarray,
+          n_days_in_period: int,
+          n_generations: int = 100,
+          mode: str = "genetic",
+          seed: int = None,
+          **options) -> tuple:
+    """Search for a cheap feasible schedule.
+
+    Args:
+        weekly_charter_costs (np.array): One entry for each vessel.
+        sailing_costs (np.array): Cost per km. One entry for each vessel.
+        distances (np.array): Distances between depot and installations.
+        required_services (np.array): Required service frequency for each
+            installation.
+        max_v_prepared (np.array): Vessels the depot can prepare each day.
+        n_days_available (np.array): Days available for each vessel.
+        n_days_in_period (int): Number of days in period.
+        n_generations (int): Number of generations, on each island in the
+            "islands" mode and each fleet size per round in the "fleet" mode.
+        mode (str): One of `MODES`.
+        seed (int): Seed for reproducible runs.
+        **options: Further arguments to the search of the mode.
+
+    Returns:
+        tuple: (routes, cost) of the best feasible schedule found, or
+            (None, inf) if no feasible schedule was found.
+    """
+    instance = (weekly_charter_costs, sailing_costs, distances,
+                required_services, max_v_prepared, n_days_available,
+                n_days_in_period)
+
+    if mode == "genetic":
+        with GeneticSearch(*instance, seed=seed, **options) as search:
+            return search.run(n_generations)
+    if mode == "islands":
+        return IslandSearch(*instance, seed=seed, **options).run(
+            n_generations)
+    if mode == "fleet":
+        _, routes, cost = FleetSweep(*instance, seed=seed, **options).run(
+            n_generations)
+        return routes, cost
+    raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}.")
@@ -0,0 +1,241 @@
+"""Compact storage of routes for large instances and populations.
+
+The dense routes array of shape (..., n_vessels, n_days, n_installations) is
+mostly zeros, and int8 limits it to 127 installations. `SparseRoutes` stores
+the same schedules CSR style, one row per voyage:
+
+    - installations: The installation numbers of all voyages concatenated,
+      in visiting order. int16, or int32 above 32767 installations.
+    - offsets: Voyage v (flat index over the leading dimensions, vessels and
+      days) visits installations[offsets[v]:offsets[v + 1]].
+
+For the routes in the README:
+
+    offsets = [0, 0, 1, 2, 2, 2, 2, 2, 3, 3, 3, 4, 6, 6, 9]
+    installations = [2, 3, 1, 4, 1, 2, 2, 3, 4]
+
+Memory scales with the number of visits instead of
+vessels x days x installations. Departures, visits, cost, voyage durations
+and loads and constraint violations are computed directly from the CSR
+arrays.
+"""
+import numpy as np
+
+from psvpp_solver.constraints import calculate_constraint_violations
+from psvpp_solver.durations import voyage_days
+
+
+def installation_dtype(n_installations: int) -> np.dtype:
+    """Smallest of int8, int16 and int32 holding the installation numbers."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_installations <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError(f"Too many installations: {n_installations}.")
+
+
+class SparseRoutes:
+    """Routes of one or more schedules stored as a ragged array of voyages.
+
+    Args:
+        offsets (np.ndarray): Start of each voyage in installations, with the
+            end of the last voyage appended.
+        installations (np.ndarray): Installation numbers (index + 1) of all
+            voyages.
+        shape (tuple): Shape of the equivalent dense routes,
+            (..., n_vessels, n_days, n_installations).
+    """
+
+    def __init__(self,
+                 offsets: np.ndarray,
+                 installations: np.ndarray,
+                 shape: tuple):
+        self.shape = tuple(shape)
+        self.offsets = np.asarray(offsets)
+        self.installations = np.asarray(installations)
+        if len(self.offsets) != self.n_voyages + 1:
+            raise ValueError("Expected {} offsets, got {}.".format(
+                self.n_voyages + 1, len(self.offsets)))
+
+    @classmethod
+    def from_dense(cls, routes: np.ndarray) -> "SparseRoutes":
+        """Convert dense routes, padded with zeros at the end of each
+        voyage, of shape (..., n_vessels, n_days, n_installations)."""
+        routes = np.asarray(routes)
+        lengths = np.count_nonzero(routes, axis=-1).ravel()
+        offset_dtype = np.int32 if routes.size < 2**31 else np.int64
+        offsets = np.zeros(len(lengths) + 1, dtype=offset_dtype)
+        np.cumsum(lengths, out=offsets[1:])
+        # Row major order keeps the visiting order of each voyage
+        installations = routes[routes != 0].astype(
+            np.int16 if routes.shape[-1] <= np.iinfo(np.int16).max
+            else np.int32)
+        return cls(offsets, installations, routes.shape)
+
+    def to_dense(self, dtype=None) -> np.ndarray:
+        """Convert to dense routes, int8 when the installation numbers fit.
+
+        Returns:
+            np.ndarray: Routes of shape `shape`.
+        """
+        if dtype is None:
+            dtype = installation_dtype(self.n_installations)
+        routes = np.zeros((self.n_voyages, self.n_installations), dtype=dtype)
+        voyages = self.voyage_of_visits()
+        routes[voyages, self.positions(voyages)] = self.installations
+        return routes.reshape(self.shape)
+
+    @property
+    def n_installations(self) -> int:
+        return self.shape[-1]
+
+    @property
+    def n_days(self) -> int:
+        return self.shape[-2]
+
+    @property
+    def n_voyages(self) -> int:
+        return int(np.prod(self.shape[:-1]))
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.installations.nbytes
+
+    def lengths(self) -> np.ndarray:
+        """Number of installations visited on each voyage."""
+        return np.diff(self.offsets)
+
+    def voyage_of_visits(self) -> np.ndarray:
+        """Flat voyage index of each entry in installations."""
+        return np.repeat(np.arange(self.n_voyages), self.lengths())
+
+    def positions(self, voyages: np.ndarray = None) -> np.ndarray:
+        """Position of each entry in installations within its voyage."""
+        if voyages is None:
+            voyages = self.voyage_of_visits()
+        return np.arange(len(self.installations)) - self.offsets[voyages]
+
+    def departures(self) -> np.ndarray:
+        """Boolean array of shape (..., n_vessels, n_days)."""
+        return (self.lengths() > 0).reshape(self.shape[:-1])
+
+    def visits(self) -> np.ndarray:
+        """Boolean array of shape (..., n_installations, n_days)."""
+        leading = self.shape[:-3]
+        n_vessels, n_days, n_installations = self.shape[-3:]
+        visits = np.zeros((int(np.prod(leading)), n_installations, n_days),
+                          dtype=bool)
+
+        individual, voyage = np.divmod(self.voyage_of_visits(),
+                                       n_vessels * n_days)
+        visits[individual, self.installations - 1, voyage % n_days] = True
+        return visits.reshape(*leading, n_installations, n_days)
+
+    def voyage_distances(self, distances: np.ndarray) -> np.ndarray:
+        """Sailing distance of each voyage.
+
+        Each voyage sails from the depot to its installations in order and
+        back, with the leg from a to b having length distances[b, a], as in
+        `utils.calculate_cost_of_route`.
+
+        Returns:
+            np.ndarray: Array of shape (..., n_vessels, n_days), zero where
+                no voyage departs.
+        """
+        starts = self.offsets[:-1][self.lengths() > 0]
+        ends = self.offsets[1:][self.lengths() > 0]
+
+        previous = np.empty_like(self.installations)
+        previous[1:] = self.installations[:-1]
+        previous[starts] = 0
+        legs = distances[self.installations, previous]
+
+        voyages = self.voyage_of_visits()
+        voyage_distances = np.bincount(voyages, weights=legs,
+                                       minlength=self.n_voyages)
+        voyage_distances[voyages[ends - 1]] += distances[
+            0, self.installations[ends - 1]]
+
+        return voyage_distances.reshape(self.shape[:-1])
+
+    def sailing_distances(self, distances: np.ndarray) -> np.ndarray:
+        """Sailing distance of each vessel, see `voyage_distances`.
+
+        Returns:
+            np.ndarray: Array of shape (..., n_vessels).
+        """
+        return self.voyage_distances(distances).sum(axis=-1)
+
+    def voyage_durations(self,
+                         distances: np.ndarray,
+                         vessel_speeds: np.ndarray,
+                         service_times: np.ndarray = None,
+                         hours_per_day: float = 24.0) -> np.ndarray:
+        """Days each voyage takes, like `durations.voyage_durations`.
+
+        Returns:
+            np.ndarray: Integer array of shape (..., n_vessels, n_days), zero
+                where no voyage departs.
+        """
+        if service_times is None:
+            service_hours = 0.0
+        else:
+            service_hours = np.bincount(
+                self.voyage_of_visits(),
+                weights=np.asarray(service_times,
+                                   dtype=float)[self.installations - 1],
+                minlength=self.n_voyages).reshape(self.shape[:-1])
+
+        days = voyage_days(self.voyage_distances(distances), service_hours,
+                           np.asarray(vessel_speeds, dtype=float)[:, None],
+                           hours_per_day)
+        return np.where(self.departures(), days, 0)
+
+    def voyage_loads(self, demands: np.ndarray) -> np.ndarray:
+        """Load of each voyage, like `loads.voyage_loads`.
+
+        Args:
+            demands (np.ndarray): Demand of each node, indexed by
+                installation number, see `loads.demand_table`.
+
+        Returns:
+            np.ndarray: Array of shape (..., n_vessels, n_days).
+        """
+        return np.bincount(self.voyage_of_visits(),
+                           weights=np.take(demands, self.installations),
+                           minlength=self.n_voyages).reshape(self.shape[:-1])
+
+    def cost(self,
+             weekly_charter_costs: np.ndarray,
+             sailing_costs: np.ndarray,
+             distances: np.ndarray) -> np.ndarray:
+        """Planning period cost of each schedule, like
+        `utils.calculate_cost_of_route`.
+
+        Returns:
+            np.ndarray: Cost with shape of the leading dimensions.
+        """
+        return (np.sum(weekly_charter_costs)
+                + self.sailing_distances(distances) @ sailing_costs)
+
+    def constraint_violations(self,
+                              required_services: np.ndarray,
+                              max_v_prepared: np.ndarray,
+                              n_days_available: np.ndarray,
+                              voyage_durations: np.ndarray = None,
+                              voyage_loads: np.ndarray = None,
+                              deck_capacities: np.ndarray = None
+                              ) -> np.ndarray:
+        """Constraint violations of each schedule, see
+        `constraints.calculate_constraint_violations`.
+
+        The durations and loads can be computed without dense routes with
+        `voyage_durations` and `voyage_loads`.
+        """
+        return calculate_constraint_violations(self.visits(),
+                                               self.departures(),
+                                               required_services,
+                                               max_v_prepared,
+                                               n_days_available,
+                                               voyage_durations,
+                                               voyage_loads,
+                                               deck_capacities)
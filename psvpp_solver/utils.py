@@ -1,6 +1,10 @@
 import numpy as np
-import random
-from itertools import chain
+
+from psvpp_solver.backend import build_population_routes
+from psvpp_solver.backend import build_routes
+from psvpp_solver.backend import sample_population_departures
+from psvpp_solver.backend import sample_departures
+from psvpp_solver.patterns import sample_visits
 
 
 def calculate_cost_of_route(routes: np.ndarray,
@@ -39,7 +43,8 @@ def calculate_cost_of_route(routes: np.ndarray,
 def generate_visits(n_installations: int,
                     n_days_in_period: int,
                     required_services=np.array([2, 3, 2, 2], dtype=np.int8),
-                    max_vessels_prepared=2) -> np.ndarray:
+                    max_vessels_prepared=2,
+                    rng: np.random.Generator = None) -> np.ndarray:
     """Generate visit days for each installation by randomly assign an
     installation to each installation i.
 
@@ -49,6 +54,9 @@ def generate_visits(n_installations: int,
                [False,  True,  True, False, False, False,  True],
                [ True, False, False,  True,  True,  True,  True]])
 
+    Service days are drawn uniformly among the properly spread patterns for
+    each service frequency, see `patterns.sample_visits`.
+
     Args:
         required_services (np.array): Array of length n_installations with
             required service frequencies for each installation.
@@ -56,73 +64,23 @@ def generate_visits(n_installations: int,
         n_days (int): Number of days in period
         days (np.array): Array of days starting with zero, equivalent to
             range(n_days)
+        rng (np.random.Generator): Random generator, or seed for one.
 
     Returns:
         np.ndarray: Boolean array of size (n_installations, n_days)
                             with visit days set to True.
     """
-    # Initialize visits
-    visits = np.full((n_installations, n_days_in_period),
-                     fill_value=False,
-                     dtype=bool)
-
-    # Randomly fill visits for each service frequency requirement
-    for inst in range(n_installations):
-
-        # Spread installations by selecting a distance between min and
-        # max spread (retry if still not sufficiently spread)
-        Pf_max = n_days_in_period // required_services[inst]
-        # If division is even, space between services is equal
-        if Pf_max == n_days_in_period / required_services[inst]:
-            Pf_min = Pf_max = Pf_max - 1
-        else:
-            Pf_min = Pf_max - 1
-
-        def generate_service_days():
-            # Which days should installation i be serviced
-            service_days = np.full(shape=required_services[inst],
-                                   fill_value=0,
-                                   dtype=np.int8)
-
-            while True:
-                # Look for equally spaced departures
-
-                # Place first day between 0 and pfmax
-                service_days[0] = random.randint(0, Pf_max)
-
-                # If more days, space between is between pf min and pfmax
-                if required_services[inst] >= 2:
-                    for j in range(1, required_services[inst]):
-                        service_days[j] = service_days[j-1] + random.randint(Pf_min,
-                                                                             Pf_max) + 1
-                # Ensure space between last and first service between Pf_min and Pf_max
-                if (Pf_min <= (service_days[0] -
-                               (service_days[-1] - (n_days_in_period - 1))) <= Pf_max):
-                    break
-                else:
-                    continue  # If not, try again
-
-            return service_days
-
-        while True:
-            # service days may generate days that are too far spread out
-            service_days = generate_service_days()
-
-            try:
-                # Set chosen service days in boolean visits array
-                visits[inst, service_days] = True
-                break  # Successfully found properly spread services
-
-            except IndexError:
-                pass  # Keep looking for proper service days
-
-    return visits
+    return sample_visits(n_days_in_period,
+                         np.asarray(required_services)[:n_installations],
+                         rng=rng)
 
 
 def generate_departures_from_visits(visits: np.ndarray,
                                     n_vessels: int,
                                     n_installations: int,
-                                    n_days_in_period: int) -> np.ndarray:
+                                    n_days_in_period: int,
+                                    rng: np.random.Generator = None
+                                    ) -> np.ndarray:
     """Generate departures for each vessel, ensuring a departure each day that
     requires a visit to a station.
 
@@ -133,64 +91,23 @@ def generate_departures_from_visits(visits: np.ndarray,
                [False,  True, False, False, False,  True, False],
                [False,  True, False, False, False,  True, False]])
 
+    Each vessel is assigned one randomly picked day with visits, and each
+    remaining day with visits a randomly drawn vessel. The random numbers for
+    all days and vessels are drawn at once, see `backend.sample_departures`.
+
     Args:
-        visits (np.ndarray): a
-        n_vessels (int): a
-        n_installations (int): a
-        n_days_in_period (int): a
+        visits (np.ndarray): Boolean array of shape
+            (n_installations, n_days).
+        n_vessels (int): Number of vessels.
+        n_installations (int): Number of installations.
+        n_days_in_period (int): Number of days in period.
+        rng (np.random.Generator): Random generator, or seed for one.
 
     Retuns:
         np.ndarray: Boolean array of shape n_vessels, n_days.
         """
-
-    # Initiate departures
-    departures = np.zeros(shape=(n_vessels, n_days_in_period),
-                          dtype=bool)
-
-    departure_days = visits.any(axis=0)
-    departure_days_idx = np.where(departure_days)[0]
-    # Ensure each vessel is assigned one departure day
-    # Ramdomly sample three days (index)
-    assigned_days = np.random.choice(departure_days_idx,
-                                     size=np.min([n_vessels,
-                                                  len(departure_days_idx)]),
-                                     replace=False)
-
-    # Shuffle vessels
-    vessels = np.random.choice(range(n_vessels),
-                               size=np.min([n_vessels,
-                                            len(departure_days_idx)]),
-                               replace=False)
-
-    # Set initial departures
-    departures[vessels, assigned_days] = 1
-
-    # Randomly assign vessels to remaining departure days
-    # Shuffle remaining days
-    # remaining_days = np.where(np.delete(departure_days, assigned_days))[0]
-    remaining_days = departure_days
-    remaining_days[assigned_days] = 0
-    remaining_days_idx = np.where(remaining_days)[0]
-    assigned_days = np.random.choice(remaining_days_idx,
-                                     size=len(remaining_days_idx),
-                                     replace=False)
-
-    # Sample vessels for the remaining days with replacement
-    vessels = np.random.choice(range(n_vessels), size=len(remaining_days_idx),
-                               replace=True)
-
-    # Set remaining departures
-    departures[vessels, assigned_days] = 1
-
-    # TODO: implement
-    # # Check depot capasity
-    # from psvpp_solver.constraints import check_max_pvs_prepared_constraint
-    # if not check_max_pvs_prepared_constraint(departures=departures,
-    #                                          max_v_prepared=max_v_prepared):
-    #     print('too many prepared:')
-    #     print(visits*1)
-
-    return departures
+    return sample_departures(visits[:n_installations, :n_days_in_period],
+                             n_vessels, rng)
 
 
 # TODO: Update docstring
@@ -232,14 +149,10 @@ def generate_routes_from_visits_and_departures(visits: np.ndarray,
     # Installation number is one more than index (0 is depot)
     installations_visited = installations_visited + 1
 
-    # Get number of repeated visit days (several visits in a day) for creation
-    # of indexes for these visits
-    _, counts = np.unique(visit_days, return_counts=True)
-
-    # Get index of installation visits. Start at zero and count up until the
-    # number of visits for each vessel and day using arange()
-    installation_order_index = np.fromiter(
-        chain.from_iterable(np.arange(x) for x in counts), dtype=np.int8)
+    # Get index of installation visits, counting up from zero among the
+    #  installations visited on the same day
+    installation_order_index = (np.cumsum(visits, axis=0) - 1)[
+        installations_visited - 1, departure_days[visit_days]]
 
     # Duplicate vessel and days with visit_days to set the appropriate indexes
     routes[which_vessel[visit_days],
@@ -280,14 +193,9 @@ def generate_visits_from_routes(routes: np.ndarray,
     departure_days = [[1, 0, 0, 1],  # [[1, 4], [2, 4]]
                       [0, 1, 0, 1]]
     """
-    # Initiate boolean array
-    installation_visits = np.zeros(shape=(n_installations, n_days_in_period),
-                                   dtype=bool)
-
-    for inst in range(n_installations):
-        installation_visits[inst] = (routes == (inst + 1)).any(axis=(0, 2))
-
-    return installation_visits
+    visits, _ = generate_visits_and_departures_from_routes(routes,
+                                                           n_installations)
+    return visits
 
 
 def generate_departures_from_routes(routes: np.ndarray) -> np.ndarray:
@@ -321,11 +229,141 @@ def generate_departures_from_routes(routes: np.ndarray) -> np.ndarray:
     return np.array(routes[:, :, 0] > 0, dtype=bool)
 
 
-def initial_population():
-    # Individual
-    # generate visits
+def generate_visits_and_departures_from_routes(
+        routes: np.ndarray,
+        n_installations: int,
+        return_sailing_days: bool = False) -> tuple:
+    """Derive visits and departures from routes in one pass.
 
-    # Generate departures from visits
+    The visited installations are scattered into the visits array by their
+    (vessel, day, order) index, so the routes are only read once, instead of
+    once per installation. Works on a single schedule of shape
+    (n_vessels, n_days, n_installations) or a batch, e.g. a population of
+    shape (pop_size, n_vessels, n_days, n_installations).
+
+    Args:
+        routes (np.ndarray): Routes of shape
+            (..., n_vessels, n_days, n_installations).
+        n_installations (int): Number of installations.
+        return_sailing_days (bool): Also return the number of days each
+            vessel sails.
+
+    Returns:
+        tuple: (visits, departures) with shapes
+            (..., n_installations, n_days) and (..., n_vessels, n_days), and
+            sailing days of shape (..., n_vessels) if return_sailing_days.
+    """
+    routes = np.asarray(routes)
+    leading = routes.shape[:-3]
+    n_days = routes.shape[-2]
 
-    # Check depot capacity
-    pass
+    visits = np.zeros((*leading, n_installations, n_days), dtype=bool)
+    index = np.nonzero(routes)
+    # Index of leading dimensions, installation index and day of each visit
+    visits[(*index[:-3], routes[index] - 1, index[-2])] = True
+    departures = routes[..., 0] > 0
+
+    if return_sailing_days:
+        return visits, departures, departures.sum(axis=-1)
+    return visits, departures
+
+
+def spawn_generators(rng, n: int) -> list:
+    """Spawn independent random generators, e.g. one for each worker or
+    island.
+
+    The child streams are derived from the seed sequence of rng, so they are
+    reproducible and do not overlap with each other or with rng.
+
+    Args:
+        rng (np.random.Generator): Random generator, or seed for one.
+        n (int): Number of generators.
+
+    Returns:
+        list: n `np.random.Generator` instances.
+    """
+    if isinstance(rng, np.random.Generator):
+        seed_sequence = rng.bit_generator.seed_seq
+    elif isinstance(rng, np.random.SeedSequence):
+        seed_sequence = rng
+    else:
+        seed_sequence = np.random.SeedSequence(rng)
+    return [np.random.default_rng(child) for child in seed_sequence.spawn(n)]
+
+
+def initial_population(n_individuals: int,
+                       n_vessels: int,
+                       n_days_in_period: int,
+                       required_services: np.ndarray,
+                       rng: np.random.Generator = None,
+                       backend: str = None,
+                       voyage_cache=None,
+                       out: tuple = None,
+                       chunk_size: int = 8192) -> tuple:
+    """Generate random individuals for the initial population of the genetic
+    search.
+
+    Individuals are drawn like `generate_visits`,
+    `generate_departures_from_visits` and
+    `generate_routes_from_visits_and_departures`, but a chunk of individuals
+    at a time with `backend.sample_population_departures` and
+    `backend.build_population_routes`, directly into the population arrays.
+    Chunks bound the memory of the intermediate arrays.
+
+    Args:
+        n_individuals (int): Number of individuals.
+        n_vessels (int): Number of vessels.
+        n_days_in_period (int): Number of days in period.
+        required_services (np.array): Required service frequency for each
+            installation.
+        rng (np.random.Generator): Random generator, or seed for one.
+        backend (str): Generate each individual separately with the
+            departure and route kernels of this backend, see `backend`.
+            By default the whole population is generated at once.
+        voyage_cache (VoyageCache): Cache to order the voyages of the routes
+            with, see `voyage_cache`. Voyages are ordered by installation
+            number by default.
+        out (tuple): Preallocated (visits, departures, routes) arrays to
+            write the population to.
+        chunk_size (int): Individuals generated at once.
+
+    Returns:
+        tuple: (visits, departures, routes) with shapes
+            (n_individuals, n_installations, n_days),
+            (n_individuals, n_vessels, n_days) and
+            (n_individuals, n_vessels, n_days, n_installations).
+    """
+    rng = np.random.default_rng(rng)
+    n_installations = len(required_services)
+
+    if out is None:
+        out = (np.zeros((n_individuals, n_installations, n_days_in_period),
+                        dtype=bool),
+               np.zeros((n_individuals, n_vessels, n_days_in_period),
+                        dtype=bool),
+               np.zeros((n_individuals, n_vessels, n_days_in_period,
+                         n_installations), dtype=np.int8))
+    visits, departures, routes = out
+
+    for start in range(0, n_individuals, chunk_size):
+        chunk = slice(start, min(start + chunk_size, n_individuals))
+        visits[chunk] = sample_visits(n_days_in_period,
+                                      required_services,
+                                      size=chunk.stop - start,
+                                      rng=rng)
+        if backend is None:
+            sample_population_departures(visits[chunk], n_vessels, rng,
+                                         out=departures[chunk])
+            build_population_routes(visits[chunk], departures[chunk],
+                                    out=routes[chunk])
+            continue
+        for i in range(start, chunk.stop):
+            departures[i] = sample_departures(visits[i], n_vessels, rng,
+                                              backend)
+            routes[i] = build_routes(visits[i], departures[i], backend)
+
+    if voyage_cache is not None:
+        for individual in routes:
+            voyage_cache.sequence(individual)
+
+    return visits, departures, routes
@@ -0,0 +1,154 @@
+"""Memoization of voyage orders and distances.
+
+The same set of installations is visited on the same day by many
+individuals, and across generations. The best order found for visiting a set
+of installations, and the distance of sailing it, only depend on the set, so
+they are computed once and looked up by the set's signature: an integer
+bitmask with bit i set when installation i is visited. The distance does not
+depend on the vessel either, since vessels only differ by their cost per km,
+so each entry serves every vessel, and vessel costs are applied on lookup.
+
+Entries are evicted least recently used first when the cache is full.
+
+Example:
+
+    cache = VoyageCache(distances, max_size=100_000)
+    order, distance = cache.get(np.array([4, 2, 7]))
+    cache.sequence(routes)  # Reorder every voyage of a schedule
+    cache.hit_rate
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from psvpp_solver.cost import calculate_voyage_distance
+from psvpp_solver.cost import get_voyage
+from psvpp_solver.sequencing import sequence_voyage
+
+
+class VoyageCache:
+    """Least recently used cache of voyage orders and distances.
+
+    Args:
+        distances (np.array): Distances between depot and installations.
+        max_size (int): Maximum number of voyages kept.
+        sequence (callable): Function of (installations, distances)
+            returning the installations in visiting order, used on misses.
+            Defaults to `sequencing.sequence_voyage`.
+    """
+
+    def __init__(self,
+                 distances: np.ndarray,
+                 max_size: int = 100_000,
+                 sequence=sequence_voyage):
+        self.distances = np.asarray(distances)
+        self.max_size = max_size
+        self.sequence_voyage = sequence
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def signature(voyage: np.ndarray) -> int:
+        """Bitmask of the installations visited, independent of order."""
+        key = 0
+        for installation in voyage.tolist():
+            key |= 1 << installation
+        return key
+
+    def get(self, voyage: np.ndarray) -> tuple:
+        """Look up, or compute and store, the order and distance of the
+        installations of a voyage.
+
+        Args:
+            voyage (np.ndarray): Installations visited, in any order and
+                without zero padding.
+
+        Returns:
+            tuple: (order, distance), where order is a read-only array.
+        """
+        key = self.signature(voyage)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        order = np.asarray(self.sequence_voyage(voyage, self.distances),
+                           dtype=voyage.dtype)
+        order.flags.writeable = False
+        distance = float(calculate_voyage_distance(order, self.distances))
+
+        self._entries[key] = order, distance
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return order, distance
+
+    def sequence(self, routes: np.ndarray) -> np.ndarray:
+        """Reorder every voyage of a schedule with the cached orders.
+
+        Args:
+            routes (np.ndarray): Routes of shape
+                (n_vessels, n_days, n_installations), reordered in place.
+
+        Returns:
+            np.ndarray: Array of shape (n_vessels, n_days) with the distance
+                of each voyage.
+        """
+        voyage_distances = np.zeros(routes.shape[:2])
+        for vessel, day in zip(*np.nonzero(routes[:, :, 0])):
+            voyage = get_voyage(routes, vessel, day)
+            order, voyage_distances[vessel, day] = self.get(voyage)
+            voyage[:] = order
+        return voyage_distances
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return dict(size=len(self),
+                    max_size=self.max_size,
+                    hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions,
+                    hit_rate=self.hit_rate)
+
+    def state(self) -> dict:
+        """Arrays with the entries, least recently used first, and the
+        statistics, e.g. to save with `np.savez`. See `load_state`."""
+        orders = [order for order, _ in self._entries.values()]
+        offsets = np.zeros(len(orders) + 1, dtype=np.int64)
+        np.cumsum([len(order) for order in orders], out=offsets[1:])
+        return dict(
+            orders=(np.concatenate(orders) if orders
+                    else np.zeros(0, dtype=np.int8)),
+            offsets=offsets,
+            distances=np.array([distance for _, distance
+                                in self._entries.values()]),
+            counters=np.array([self.hits, self.misses, self.evictions]))
+
+    def load_state(self, state: dict):
+        """Replace the entries and statistics with those from `state`.
+        Signatures are recomputed from the orders."""
+        self._entries.clear()
+        offsets = state["offsets"]
+        for i, distance in enumerate(state["distances"]):
+            order = np.array(state["orders"][offsets[i]:offsets[i + 1]])
+            order.flags.writeable = False
+            self._entries[self.signature(order)] = order, float(distance)
+        self.hits, self.misses, self.evictions = (
+            int(counter) for counter in state["counters"])
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
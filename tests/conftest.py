@@ -0,0 +1,53 @@
+"""Instance data shared by the tests.
+
+The instance has ten installations at random positions in a 100 km square,
+four vessels and a week long period. Test modules with other depot or
+vessel limits override `instance_data`.
+"""
+from helpers import random_distances
+from psvpp_solver.cost import FitnessEvaluator
+from psvpp_solver.instance import Instance
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def n_days_in_period():
+    return 7
+
+
+@pytest.fixture
+def required_services():
+    return np.array([2, 3, 3, 4, 2, 1, 2, 5, 3, 2])
+
+
+@pytest.fixture
+def n_installations(required_services):
+    return len(required_services)
+
+
+@pytest.fixture
+def instance_data(required_services, n_days_in_period):
+    """Arguments of `Instance`, `FitnessEvaluator` and the searches."""
+    return dict(weekly_charter_costs=np.array([100000.0, 120000.0,
+                                               110000.0, 90000.0]),
+                sailing_costs=np.array([10.0, 12.0, 11.0, 9.0]),
+                distances=random_distances(len(required_services)),
+                required_services=required_services,
+                max_v_prepared=np.full(n_days_in_period, 1),
+                n_days_available=np.full(4, 3))
+
+
+@pytest.fixture
+def distances(instance_data):
+    return instance_data["distances"]
+
+
+@pytest.fixture
+def instance(instance_data):
+    return Instance(**instance_data)
+
+
+@pytest.fixture
+def evaluator(instance_data):
+    return FitnessEvaluator(**instance_data)
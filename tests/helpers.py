@@ -0,0 +1,30 @@
+"""Helpers shared by the tests."""
+from psvpp_solver.constraints import check_constraints_satisfied
+from psvpp_solver.utils import generate_departures_from_routes
+from psvpp_solver.utils import generate_visits_from_routes
+import numpy as np
+
+
+def random_distances(n_installations, seed=0, symmetric=True):
+    """Distances between random positions in a 100 km square, scaled by up
+    to 20% in each direction unless symmetric."""
+    rng = np.random.default_rng(seed)
+    positions = rng.random((n_installations + 1, 2))
+    distances = np.sqrt(np.sum((positions[:, None] - positions[None]) ** 2,
+                               axis=-1)) * 100
+    if not symmetric:
+        distances *= rng.uniform(0.8, 1.2, size=distances.shape)
+    return distances
+
+
+def satisfies_constraints(routes, instance):
+    """Whether routes satisfy the constraints of an `Instance`."""
+    return check_constraints_satisfied(
+        routes,
+        generate_visits_from_routes(routes, instance.n_installations,
+                                    instance.n_days_in_period),
+        generate_departures_from_routes(routes),
+        required_services=instance.required_services,
+        max_v_prepared=instance.max_v_prepared,
+        n_days_available=instance.n_days_available,
+        days_in_period=instance.n_days_in_period)
@@ -0,0 +1,126 @@
+from helpers import random_distances
+from psvpp_solver.backend import HAS_NUMBA
+from psvpp_solver.backend import build_routes
+from psvpp_solver.backend import build_population_routes
+from psvpp_solver.backend import calculate_violations
+from psvpp_solver.backend import generate_schedule
+from psvpp_solver.backend import sample_population_departures
+from psvpp_solver.constraints import calculate_constraint_violations
+from psvpp_solver.constraints import departure_spread_violation
+from psvpp_solver.durations import voyage_durations
+from psvpp_solver.loads import demand_table
+from psvpp_solver.loads import voyage_loads
+from psvpp_solver.utils import generate_routes_from_visits_and_departures
+from psvpp_solver.utils import initial_population
+import numpy as np
+import pytest
+
+requires_numba = pytest.mark.skipif(not HAS_NUMBA,
+                                    reason="numba is not installed")
+
+
+@pytest.fixture
+def required_services(required_services):
+    return required_services.astype(np.int8)
+
+
+def test_generate_schedule_numpy(required_services):
+    for seed in range(20):
+        visits, departures, routes = generate_schedule(
+            n_vessels=4,
+            n_days_in_period=14,
+            required_services=required_services,
+            rng=seed,
+            backend="numpy")
+
+        assert np.array_equal(visits.sum(axis=1), required_services)
+        assert departure_spread_violation(visits, required_services) == 0
+        assert np.array_equal(departures.any(axis=0), visits.any(axis=0))
+        assert np.array_equal(
+            routes,
+            generate_routes_from_visits_and_departures(visits,
+                                                       departures,
+                                                       n_days_in_period=14))
+
+
+@requires_numba
+def test_backends_generate_identical_schedules(required_services):
+    for seed in range(20):
+        schedule_numpy = generate_schedule(n_vessels=4,
+                                           n_days_in_period=14,
+                                           required_services=required_services,
+                                           rng=seed,
+                                           backend="numpy")
+        schedule_numba = generate_schedule(n_vessels=4,
+                                           n_days_in_period=14,
+                                           required_services=required_services,
+                                           rng=seed,
+                                           backend="numba")
+        for numpy_array, numba_array in zip(schedule_numpy, schedule_numba):
+            assert np.array_equal(numpy_array, numba_array)
+
+
+@requires_numba
+def test_backends_calculate_identical_violations(required_services):
+    rng = np.random.default_rng(0)
+    visits = rng.random((50, 10, 14)) < 0.2
+    departures = rng.random((50, 4, 14)) < 0.4
+    max_v_prepared = rng.integers(1, 3, size=14)
+    n_days_available = rng.integers(3, 6, size=4)
+
+    violations = calculate_violations(visits, departures, required_services,
+                                      max_v_prepared, n_days_available,
+                                      backend="numba")
+    assert np.array_equal(
+        violations,
+        calculate_constraint_violations(visits, departures,
+                                        required_services, max_v_prepared,
+                                        n_days_available))
+
+    visits = rng.random((10, 14)) < 0.3
+    departures = rng.random((4, 14)) < 0.3
+    assert np.array_equal(build_routes(visits, departures, backend="numba"),
+                          build_routes(visits, departures, backend="numpy"))
+
+
+@requires_numba
+def test_backends_agree_with_durations_and_loads(required_services):
+    rng = np.random.default_rng(1)
+    visits, departures, routes = initial_population(50, 4, 14,
+                                                    required_services,
+                                                    rng=rng)
+    distances = random_distances(len(required_services), seed=1)
+    data = dict(
+        voyage_durations=voyage_durations(routes, distances,
+                                          np.array([8.0, 10.0, 12.0, 15.0]),
+                                          np.full(10, 3.0)),
+        voyage_loads=voyage_loads(routes,
+                                  demand_table(rng.uniform(1, 5, size=10))),
+        deck_capacities=np.full(4, 8.0))
+    assert data["voyage_durations"].max() > 1
+
+    expected = calculate_violations(visits, departures, required_services,
+                                    np.full(14, 2), np.full(4, 6),
+                                    backend="numpy", **data)
+    assert expected[:, [1, 3, 5]].any(axis=0).all()
+    assert np.allclose(calculate_violations(visits, departures,
+                                            required_services,
+                                            np.full(14, 2), np.full(4, 6),
+                                            backend="numba", **data),
+                       expected)
+
+
+def test_population_generators(required_services):
+    rng = np.random.default_rng(0)
+    visits = np.stack([generate_schedule(4, 14, required_services, rng,
+                                         "numpy")[0] for _ in range(50)])
+    departures = sample_population_departures(visits, 4, rng)
+    routes = build_population_routes(visits, departures)
+
+    assert np.array_equal(departures.any(axis=1), visits.any(axis=1))
+    # Every vessel departs when there are enough departure days
+    assert departures.any(axis=2).all()
+    for i in range(len(visits)):
+        assert np.array_equal(routes[i], build_routes(visits[i],
+                                                      departures[i],
+                                                      "numpy"))
@@ -0,0 +1,46 @@
+from psvpp_solver.benchmark import FIELDS
+from psvpp_solver.benchmark import main
+from psvpp_solver.benchmark import run_benchmarks
+import csv
+import json
+import pytest
+
+
+def test_run_benchmarks_covers_every_size():
+    results = run_benchmarks(installations=(4, 12), vessels=(2,), days=(7,),
+                             backend_names=["numpy"], population_size=5,
+                             repeat=2)
+
+    functions = {result["function"] for result in results}
+    assert {"generate_visits",
+            "generate_departures_from_visits",
+            "generate_routes_from_visits_and_departures",
+            "calculate_cost_of_route",
+            "check_constraints_satisfied"} <= functions
+    assert len(results) == 2 * len(functions)
+    for result in results:
+        assert set(result) == set(FIELDS)
+        assert 0 <= result["best"] <= result["median"]
+
+
+def test_main_writes_json_and_csv(tmp_path):
+    arguments = ["--installations", "4", "--vessels", "2", "--days", "7",
+                 "--backends", "numpy", "--population-size", "3",
+                 "--repeat", "1"]
+
+    main(arguments + ["--output", str(tmp_path / "results.json")])
+    with open(tmp_path / "results.json") as file:
+        report = json.load(file)
+    assert "numpy" in report["environment"]
+
+    main(arguments + ["--format", "csv",
+                      "--output", str(tmp_path / "results.csv")])
+    with open(tmp_path / "results.csv") as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == len(report["results"])
+
+
+def test_run_benchmarks_rejects_installations_beyond_int8():
+    with pytest.raises(ValueError):
+        run_benchmarks(installations=(4, 200), vessels=(2,), days=(7,),
+                       backend_names=["numpy"], population_size=2, repeat=1)
@@ -0,0 +1,70 @@
+from psvpp_solver import bitpacked
+from psvpp_solver.constraints import departure_spread_violation
+from psvpp_solver.constraints import installation_spread_violation
+from psvpp_solver.constraints import max_pvs_prepared_violation
+from psvpp_solver.constraints import max_sailing_days_violation
+from psvpp_solver.constraints import service_frequency_violation
+from psvpp_solver.constraints import voyage_overlap_violation
+from psvpp_solver.utils import initial_population
+import numpy as np
+
+
+def test_pack_round_trip():
+    mask = np.array([True, False, True, True, False, False, False])
+    assert bitpacked.pack(mask) == 13
+
+    masks = np.random.default_rng(0).random((5, 3, 64)) < 0.3
+    words = bitpacked.pack(masks)
+    assert words.shape == (5, 3)
+    assert np.array_equal(bitpacked.unpack(words, 64), masks)
+    assert np.array_equal(bitpacked.popcount(words), masks.sum(axis=-1))
+
+
+def test_popcount_fallback(monkeypatch):
+    words = bitpacked.pack(np.random.default_rng(1).random((100, 64)) < 0.5)
+    expected = bitpacked.popcount(words)
+    monkeypatch.delattr(np, "bitwise_count", raising=False)
+    assert np.array_equal(bitpacked.popcount(words), expected)
+
+
+def test_bitpacked_checks_match_constraints():
+    rng = np.random.default_rng(2)
+    n_days = 14
+    required_services = rng.integers(1, 6, size=15)
+    visits, departures, _ = initial_population(50, 5, n_days,
+                                               required_services, rng=rng)
+    # Move some visits to break frequencies and spread
+    visits[:, :, 0] = rng.random(visits.shape[:2]) < 0.5
+    max_v_prepared = rng.integers(1, 3, size=n_days)
+    n_days_available = np.full(5, 4)
+
+    packed_visits = bitpacked.pack(visits)
+    packed_departures = bitpacked.pack(departures)
+
+    assert np.array_equal(
+        bitpacked.service_frequency_violation(packed_visits,
+                                              required_services),
+        service_frequency_violation(visits, required_services))
+    assert np.array_equal(
+        bitpacked.max_sailing_days_violation(packed_departures,
+                                             n_days_available),
+        max_sailing_days_violation(departures, n_days_available))
+    for limits in (max_v_prepared, np.zeros(n_days, int),
+                   rng.integers(0, 7, size=n_days)):
+        assert np.array_equal(
+            bitpacked.max_pvs_prepared_violation(packed_departures, limits),
+            max_pvs_prepared_violation(departures, limits))
+    for voyage_duration in (1, 2, 3, 20):
+        assert np.array_equal(
+            bitpacked.voyage_overlap_violation(packed_departures, n_days,
+                                               voyage_duration),
+            voyage_overlap_violation(departures, voyage_duration))
+
+    assert np.array_equal(
+        bitpacked.installation_spread_violation(packed_visits, n_days,
+                                                required_services),
+        installation_spread_violation(visits, required_services))
+    assert np.array_equal(
+        bitpacked.departure_spread_violation(packed_visits, n_days,
+                                             required_services),
+        departure_spread_violation(visits, required_services))
@@ -1,5 +1,9 @@
 # from utils import generate_departures_from_routes, generate_visits_from_routes
+from psvpp_solver.constraints import CONSTRAINT_NAMES
+from psvpp_solver.constraints import N_CONSTRAINTS
+from psvpp_solver.constraints import calculate_constraint_violations
 from psvpp_solver.constraints import check_constraints_satisfied
+from psvpp_solver.constraints import is_feasible
 from psvpp_solver.utils import generate_visits_from_routes
 from psvpp_solver.utils import generate_departures_from_routes
 from psvpp_solver.visualize_route import visualize_route
@@ -33,3 +37,46 @@ def test_constraints():
     assert result is True, "Constraints should be satisfied for:\n{}".format(
         routes
     )
+
+
+def test_calculate_constraint_violations():
+    routes = np.array([[[1, 2, 3, 4],
+                        [0, 0, 0, 0],
+                        [4, 2, 0, 0],
+                        [0, 0, 0, 0]],
+
+                       [[0, 0, 0, 0],
+                        [0, 0, 0, 0],
+                        [3, 0, 1, 0],
+                        [2, 0, 0, 0]]])
+    visits = generate_visits_from_routes(routes,
+                                         n_installations=4,
+                                         n_days_in_period=4)
+    departures = generate_departures_from_routes(routes)
+
+    # Second individual misses the visit to installation 1 on day 3, and
+    # has vessel 2 sail a third day
+    visits_2 = visits.copy()
+    visits_2[0, 2] = False
+    departures_2 = departures.copy()
+    departures_2[1, 1] = True
+
+    violations = calculate_constraint_violations(
+        np.stack((visits, visits_2)),
+        np.stack((departures, departures_2)),
+        required_services=np.array([2, 3, 2, 2]),
+        max_v_prepared=np.array([2, 2, 2, 1]),
+        n_days_available=np.array([2, 2]))
+
+    assert violations.shape == (2, N_CONSTRAINTS)
+    assert np.array_equal(is_feasible(violations), [True, False])
+
+    expected = dict.fromkeys(CONSTRAINT_NAMES, 0)
+    # Vessel 2 sails 3 days with 2 days available
+    expected["max_sailing_days"] = 1
+    expected["service_frequency"] = 1
+    # Installation 1 should have exactly one day between services, but its
+    # only service leaves three days until the next period
+    expected["departure_spread"] = 2
+    assert np.array_equal(violations[1],
+                          [expected[name] for name in CONSTRAINT_NAMES])
@@ -0,0 +1,237 @@
+from helpers import random_distances
+from psvpp_solver.constraints import N_CONSTRAINTS
+from psvpp_solver.constraints import calculate_constraint_violations
+from psvpp_solver.constraints import check_constraints_satisfied
+from psvpp_solver.cost import AdaptivePenalty
+from psvpp_solver.cost import FitnessEvaluator
+from psvpp_solver.cost import PopulationCostEvaluator
+from psvpp_solver.cost import apply_relocate
+from psvpp_solver.cost import apply_swap
+from psvpp_solver.cost import calculate_cost_of_population
+from psvpp_solver.cost import calculate_relocate_delta
+from psvpp_solver.cost import calculate_swap_delta
+from psvpp_solver.cost import calculate_voyage_distances
+from psvpp_solver.instance import Instance
+from psvpp_solver.utils import calculate_cost_of_route
+from psvpp_solver.utils import generate_departures_from_routes
+from psvpp_solver.utils import generate_departures_from_visits
+from psvpp_solver.utils import generate_routes_from_visits_and_departures
+from psvpp_solver.utils import generate_visits
+from psvpp_solver.utils import generate_visits_from_routes
+from psvpp_solver.utils import initial_population
+import numpy as np
+
+
+def random_population(pop_size,
+                      n_vessels=3,
+                      n_days_in_period=7,
+                      required_services=np.array([2, 3, 3, 4, 2, 1, 2],
+                                                 dtype=np.int8)):
+    population = []
+    for _ in range(pop_size):
+        visits = generate_visits(n_installations=len(required_services),
+                                 n_days_in_period=n_days_in_period,
+                                 required_services=required_services)
+        departures = generate_departures_from_visits(
+            visits=visits,
+            n_vessels=n_vessels,
+            n_installations=len(required_services),
+            n_days_in_period=n_days_in_period)
+        population.append(generate_routes_from_visits_and_departures(
+            visits=visits,
+            departures=departures,
+            n_days_in_period=n_days_in_period))
+    return np.stack(population)
+
+
+def test_population_cost_matches_calculate_cost_of_route():
+    population = random_population(pop_size=20)
+    # Whole distances, so the costs are exact in any summation order
+    distances = np.round(random_distances(n_installations=7))
+    weekly_charter_costs = np.array([100000.0, 150000.0, 120000.0])
+    sailing_costs = np.array([1000, 1200, 900])
+
+    costs = calculate_cost_of_population(population,
+                                         weekly_charter_costs,
+                                         sailing_costs,
+                                         distances)
+    expected = [calculate_cost_of_route(routes,
+                                        weekly_charter_costs,
+                                        sailing_costs,
+                                        distances)
+                for routes in population]
+
+    assert np.array_equal(costs, expected)
+
+
+def test_population_cost_evaluator_reuses_buffers():
+    distances = np.round(random_distances(n_installations=7))
+    weekly_charter_costs = np.array([100000.0, 150000.0, 120000.0])
+    sailing_costs = np.array([1000.0, 1200.0, 900.0])
+    evaluator = PopulationCostEvaluator(weekly_charter_costs,
+                                        sailing_costs,
+                                        distances)
+
+    large = random_population(pop_size=10)
+    evaluator(large)
+    padded = evaluator._padded
+
+    # A smaller population reuses the buffers allocated for the larger one
+    small = random_population(pop_size=4)
+    costs = evaluator(small)
+    assert evaluator._padded is padded
+
+    expected = [calculate_cost_of_route(routes,
+                                        weekly_charter_costs,
+                                        sailing_costs,
+                                        distances)
+                for routes in small]
+    assert np.allclose(costs, expected)
+
+
+def test_delta_costs_match_full_recalculation():
+    rng = np.random.default_rng(1)
+    distances = np.round(random_distances(n_installations=7, seed=2))
+    weekly_charter_costs = np.array([100000.0, 150000.0, 120000.0])
+    sailing_costs = np.array([1000, 1200, 900])
+
+    routes = random_population(pop_size=1)[0]
+    voyage_distances = calculate_voyage_distances(routes, distances)
+    cost = calculate_cost_of_route(routes, weekly_charter_costs,
+                                   sailing_costs, distances)
+
+    for _ in range(200):
+        vessels, days = np.nonzero(routes[:, :, 0])
+        k = rng.integers(len(vessels))
+        vessel, day = vessels[k], days[k]
+        length = np.count_nonzero(routes[vessel, day])
+
+        if rng.random() < 0.5:
+            i, j = rng.integers(length, size=2)
+            delta = calculate_swap_delta(routes, voyage_distances, vessel,
+                                         day, i, j, sailing_costs, distances)
+            apply_swap(routes, voyage_distances, vessel, day, i, j,
+                       distances)
+        else:
+            to_vessel = rng.integers(len(routes))
+            to_length = np.count_nonzero(routes[to_vessel, day])
+            if to_vessel == vessel:
+                to_length -= 1
+            position = rng.integers(length)
+            insert_position = rng.integers(to_length + 1)
+            delta = calculate_relocate_delta(routes, voyage_distances,
+                                             vessel, day, position,
+                                             to_vessel, day, insert_position,
+                                             sailing_costs, distances)
+            apply_relocate(routes, voyage_distances, vessel, day, position,
+                           to_vessel, day, insert_position, distances)
+
+        new_cost = calculate_cost_of_route(routes, weekly_charter_costs,
+                                           sailing_costs, distances)
+        assert np.isclose(new_cost - cost, delta)
+        assert np.array_equal(voyage_distances,
+                              calculate_voyage_distances(routes, distances))
+        cost = new_cost
+
+
+def test_fitness_evaluator_matches_separate_passes():
+    required_services = np.array([2, 3, 3, 4, 2, 1, 2], dtype=np.int8)
+    max_v_prepared = np.array([1, 2, 2, 1, 2, 2, 1])
+    n_days_available = np.array([3, 4, 5])
+    population = random_population(pop_size=30,
+                                   required_services=required_services)
+    distances = random_distances(n_installations=7)
+    weekly_charter_costs = np.array([100000.0, 150000.0, 120000.0])
+    sailing_costs = np.array([1000, 1200, 900])
+
+    penalty = AdaptivePenalty(np.arange(1, N_CONSTRAINTS + 1) * 1000.0)
+    evaluator = FitnessEvaluator(weekly_charter_costs,
+                                 sailing_costs,
+                                 distances,
+                                 required_services,
+                                 max_v_prepared,
+                                 n_days_available,
+                                 penalty=penalty)
+    fitness = evaluator(population)
+
+    for i, routes in enumerate(population):
+        visits = generate_visits_from_routes(routes,
+                                             n_installations=7,
+                                             n_days_in_period=7)
+        departures = generate_departures_from_routes(routes)
+        violations = calculate_constraint_violations(visits,
+                                                     departures,
+                                                     required_services,
+                                                     max_v_prepared,
+                                                     n_days_available)
+        cost = calculate_cost_of_route(routes, weekly_charter_costs,
+                                       sailing_costs, distances)
+
+        assert np.array_equal(fitness.violations[i], violations)
+        assert np.isclose(fitness.cost[i], cost)
+        assert np.isclose(fitness.penalized_cost[i],
+                          cost + np.dot(violations, penalty.weights))
+        assert fitness.feasible[i] == check_constraints_satisfied(
+            routes, visits, departures,
+            required_services=required_services,
+            max_v_prepared=max_v_prepared,
+            n_days_available=n_days_available,
+            days_in_period=7)
+
+
+def test_adaptive_penalty():
+    penalty = AdaptivePenalty(100.0, target_feasible=0.5, tolerance=0.1)
+    violations = np.zeros((10, N_CONSTRAINTS))
+    # First constraint violated by all, second by half, the rest by none
+    violations[:, 0] = 1
+    violations[:5, 1] = 1
+    penalty.update(violations)
+
+    assert penalty.weights[0] == 100.0 * penalty.increase
+    assert penalty.weights[1] == 100.0
+    assert np.all(penalty.weights[2:] == 100.0 * penalty.decrease)
+
+
+def test_evaluators_from_instance():
+    rng = np.random.default_rng(4)
+    required_services = rng.integers(1, 4, size=8)
+    weekly_charter_costs = np.array([100000.0, 120000.0, 110000.0])
+    sailing_costs = np.array([10.0, 12.0, 11.0])
+    positions = rng.random((9, 2))
+    distances = np.sqrt(np.sum((positions[:, None] - positions[None]) ** 2,
+                               axis=-1)) * 100
+    _, _, population = initial_population(20, 3, 7, required_services,
+                                          rng=rng)
+    expected = [calculate_cost_of_route(routes, weekly_charter_costs,
+                                        sailing_costs, distances)
+                for routes in population]
+
+    instance = Instance(weekly_charter_costs, sailing_costs, distances,
+                        required_services, np.full(7, 2), np.full(3, 5))
+    assert np.allclose(instance.arc_costs[1], 12.0 * distances)
+    assert np.allclose(PopulationCostEvaluator.from_instance(instance)(
+        population), expected)
+    assert np.allclose(FitnessEvaluator.from_instance(instance)(
+        population).cost, expected)
+
+    single = Instance(weekly_charter_costs, sailing_costs, distances,
+                      required_services, np.full(7, 2), np.full(3, 5),
+                      dtype=np.float32)
+    assert single.arc_costs.dtype == np.float32
+    assert np.allclose(FitnessEvaluator.from_instance(single)(
+        population).cost, expected, rtol=1e-6)
+
+
+def test_evaluators_accept_empty_populations(instance_data):
+    empty = np.zeros((0, 4, 7, len(instance_data["required_services"])),
+                     dtype=np.int8)
+    assert PopulationCostEvaluator(
+        instance_data["weekly_charter_costs"], instance_data["sailing_costs"],
+        instance_data["distances"])(empty).shape == (0,)
+
+    instance = Instance(**instance_data, vessel_speeds=np.full(4, 10.0),
+                        demands=np.full(10, 3.0),
+                        deck_capacities=np.full(4, 10.0))
+    fitness = FitnessEvaluator.from_instance(instance)(empty)
+    assert fitness.cost.shape == (0,)
+    assert fitness.violations.shape == (0, N_CONSTRAINTS)
@@ -0,0 +1,62 @@
+from psvpp_solver.constraints import max_sailing_days_violation
+from psvpp_solver.constraints import voyage_overlap_violation
+from psvpp_solver.cost import FitnessEvaluator
+from psvpp_solver.cost import calculate_voyage_distances
+from psvpp_solver.durations import voyage_durations
+from psvpp_solver.utils import initial_population
+import numpy as np
+
+
+def test_voyage_durations(distances, required_services):
+    speeds = np.array([10.0, 20.0, 5.0])
+    service_times = np.linspace(2, 8, len(required_services))
+    _, departures, population = initial_population(20, 3, 7,
+                                                   required_services, rng=0)
+
+    durations = voyage_durations(population, distances, speeds,
+                                 service_times, hours_per_day=12)
+    assert durations.shape == departures.shape
+    assert np.array_equal(durations > 0, departures)
+
+    for routes, schedule_durations in zip(population, durations):
+        hours = (calculate_voyage_distances(routes, distances)
+                 / speeds[:, None]
+                 + np.concatenate(([0], service_times))[routes].sum(axis=2))
+        expected = np.maximum(np.ceil(hours / 12), 1) * (routes[..., 0] > 0)
+        assert np.array_equal(schedule_durations, expected)
+
+
+def test_constraints_with_voyage_durations():
+    departures = np.array([[True, False, True, False, False, False, False],
+                           [False, True, False, False, True, False, False]])
+    durations = departures * np.array([[3], [2]])
+    # Vessel 1 leaves on day 3 before returning from its 3 day voyage, and
+    #  vessel 2 returns on day 2 with a day to spare before day 5
+    assert voyage_overlap_violation(departures, durations) == 1
+    assert max_sailing_days_violation(departures, np.array([5, 4]),
+                                      durations) == 1
+    # Arrays of equal durations agree with a single duration
+    for duration in (1, 2, 3):
+        assert voyage_overlap_violation(departures,
+                                        departures * duration) == \
+            voyage_overlap_violation(departures, duration)
+
+
+def test_fitness_evaluator_with_vessel_speeds(distances, required_services):
+    _, _, population = initial_population(30, 3, 7, required_services,
+                                          rng=1)
+    evaluator = FitnessEvaluator(np.full(3, 1000.0), np.ones(3), distances,
+                                 required_services, np.full(7, 3),
+                                 np.full(3, 7))
+    slow = FitnessEvaluator(np.full(3, 1000.0), np.ones(3), distances,
+                            required_services, np.full(7, 3), np.full(3, 7),
+                            vessel_speeds=np.full(3, 1.0),
+                            hours_per_day=24)
+
+    durations = slow.voyage_durations(population)
+    assert evaluator.voyage_durations(population) is None
+    np.testing.assert_array_equal(
+        slow(population).violations[:, 3],
+        voyage_overlap_violation(population[..., 0] > 0, durations))
+    assert np.all(slow(population).violations[:, 3]
+                  >= evaluator(population).violations[:, 3])
@@ -0,0 +1,92 @@
+from helpers import satisfies_constraints
+from psvpp_solver.fleet import FleetSweep
+from psvpp_solver.fleet import add_vessel
+from psvpp_solver.fleet import remove_vessel
+from psvpp_solver.instance import Instance
+from psvpp_solver.solver import solve
+from psvpp_solver.utils import calculate_cost_of_route
+from psvpp_solver.utils import generate_visits_from_routes
+from psvpp_solver.utils import initial_population
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def instance_data(instance_data, n_days_in_period):
+    return dict(instance_data, max_v_prepared=np.full(n_days_in_period, 2),
+                n_days_available=np.full(4, 4))
+
+
+def test_add_and_remove_vessel_keep_visits(instance, required_services,
+                                           n_days_in_period):
+    instance = instance.select_vessels(np.arange(3))
+    visits, _, population = initial_population(10, 3, n_days_in_period,
+                                               required_services, rng=0)
+    for i, routes in enumerate(population):
+        added = add_vessel(routes)
+        assert added.shape == (4, *routes.shape[1:])
+        assert added[-1].any()
+        assert np.array_equal(generate_visits_from_routes(
+            added, len(required_services), n_days_in_period), visits[i])
+
+        removed = remove_vessel(added, instance)
+        assert removed.shape == routes.shape
+        assert np.array_equal(generate_visits_from_routes(
+            removed, len(required_services), n_days_in_period)
+            .sum(axis=1), required_services)
+
+
+def test_fleet_sweep_is_reproducible_and_feasible(instance_data,
+                                                  n_days_in_period):
+    results = []
+    for _ in range(2):
+        sweep = FleetSweep(n_days_in_period=n_days_in_period,
+                           fleet_sizes=[2, 3, 4], seed=3, population_size=6,
+                           n_offspring=6, **instance_data)
+        results.append((sweep.run(n_generations=2),
+                        sweep.curve()))
+
+    ((n_vessels, routes, cost), curve), (result_again, curve_again) = results
+    assert curve == curve_again
+    assert cost == result_again[2]
+    assert list(curve) == [2, 3, 4]
+    assert cost == min(curve.values())
+    assert len(routes) == n_vessels
+
+    assert np.isclose(cost, calculate_cost_of_route(
+        routes, instance_data["weekly_charter_costs"][:n_vessels],
+        instance_data["sailing_costs"][:n_vessels],
+        instance_data["distances"]))
+    assert satisfies_constraints(routes, Instance(**instance_data)
+                                 .select_vessels(np.arange(n_vessels)))
+
+
+def test_fleet_sweep_in_parallel(instance_data, n_days_in_period):
+    sweep = FleetSweep(n_days_in_period=n_days_in_period, fleet_sizes=[3, 4],
+                       n_workers=2, seed=3, population_size=6, n_offspring=6,
+                       **instance_data)
+    sweep.run(n_generations=2)
+    routes, cost = solve(n_days_in_period=n_days_in_period, n_generations=2,
+                         mode="fleet", seed=3, fleet_sizes=[3, 4],
+                         n_workers=2, n_rounds=2, population_size=6,
+                         n_offspring=6, **instance_data)
+    assert cost == min(sweep.curve().values())
+
+
+def test_fleet_sweep_resumes_from_checkpoint(instance_data, n_days_in_period,
+                                             tmp_path):
+    path = str(tmp_path / "sweep.npz")
+    sweep, interrupted, resumed = [
+        FleetSweep(n_days_in_period=n_days_in_period, fleet_sizes=[2, 3],
+                   n_rounds=n_rounds, seed=4, population_size=6,
+                   n_offspring=6, **instance_data)
+        for n_rounds in (2, 1, 2)]
+    result = sweep.run(n_generations=2, checkpoint_path=path)
+
+    # Keep the checkpoint of the first round only
+    interrupted.run(n_generations=2, checkpoint_path=path)
+    resumed.load_checkpoint(path)
+    assert resumed.n_completed == 2
+
+    assert resumed.run(n_generations=2)[2] == result[2]
+    assert resumed.curve() == sweep.curve()
@@ -0,0 +1,152 @@
+from helpers import satisfies_constraints
+from psvpp_solver.constraints import installation_spread_violation
+from psvpp_solver.cost import FitnessEvaluator
+from psvpp_solver.crossover import crossover
+from psvpp_solver.cost import calculate_voyage_distances
+from psvpp_solver.education import educate
+from psvpp_solver.education import relocate_visits
+from psvpp_solver.genetic import GeneticSearch
+from psvpp_solver.instance import Instance
+from psvpp_solver.utils import calculate_cost_of_route
+from psvpp_solver.utils import generate_visits_and_departures_from_routes
+from psvpp_solver.utils import initial_population
+import numpy as np
+
+
+def test_crossover_keeps_visit_patterns_valid(instance_data,
+                                              n_days_in_period):
+    rng = np.random.default_rng(0)
+    required_services = instance_data["required_services"]
+    visits, _, routes = initial_population(20, 4, n_days_in_period,
+                                           required_services, rng=rng)
+
+    for i in range(0, 20, 2):
+        child = crossover(routes[i], routes[i + 1], visits[i], visits[i + 1],
+                          required_services, instance_data["sailing_costs"],
+                          instance_data["distances"], rng)
+        child_visits, _ = generate_visits_and_departures_from_routes(
+            child, len(required_services))
+
+        # Each installation is visited at most once a day
+        n_visits = np.count_nonzero(child, axis=(0, 2))
+        assert n_visits.sum() == child_visits.sum()
+        assert np.array_equal(child_visits.sum(axis=1), required_services)
+        assert not installation_spread_violation(child_visits,
+                                                 required_services).any()
+        # Routes are padded with zeros at the end
+        assert np.array_equal(np.count_nonzero(child, axis=2),
+                              np.argmin(np.concatenate(
+                                  (child, np.zeros_like(child[..., :1])),
+                                  axis=2) != 0, axis=2))
+
+
+def test_educate_does_not_increase_penalized_cost(evaluator,
+                                                  required_services,
+                                                  n_days_in_period):
+    rng = np.random.default_rng(1)
+    visits, _, routes = initial_population(20, 4, n_days_in_period,
+                                           required_services, rng=rng)
+
+    before = evaluator(routes).penalized_cost
+    for individual in routes:
+        educate(individual, evaluator, rng)
+    after = evaluator(routes)
+
+    assert np.all(after.penalized_cost <= before + 1e-6)
+    assert np.array_equal(generate_visits_and_departures_from_routes(
+        routes, len(required_services))[0], visits)
+
+
+def test_relocate_visits_scores_voyage_durations():
+    # Installations 1 and 2 are next to each other, and either voyage of
+    #  day 0 can visit both, but then takes two days with the service times
+    positions = np.array([0.0, 100.0, 101.0, -50.0])
+    distances = np.abs(positions[:, None] - positions[None])
+    evaluator = FitnessEvaluator(np.full(2, 100000.0), np.full(2, 10.0),
+                                 distances, np.ones(3, dtype=int),
+                                 np.full(3, 2), np.full(2, 3),
+                                 vessel_speeds=np.full(2, 10.0),
+                                 service_times=np.full(3, 2.0))
+
+    for seed in range(5):
+        routes = np.zeros((2, 3, 3), dtype=np.int8)
+        routes[0, 0, 0] = 2
+        routes[1, 0, 0] = 1
+        routes[1, 1, 0] = 3
+        relocate_visits(routes, calculate_voyage_distances(routes, distances),
+                        evaluator, evaluator.penalty.weights,
+                        np.random.default_rng(seed))
+
+        # Only vessel 0 is free the day after
+        assert sorted(routes[0, 0, :2]) == [1, 2]
+        assert not evaluator(routes[None]).violations.any()
+
+
+def test_relocate_visits_scores_deck_capacity():
+    positions = np.array([0.0, 100.0, 101.0])
+    distances = np.abs(positions[:, None] - positions[None])
+    evaluator = FitnessEvaluator(np.full(2, 100000.0), np.full(2, 10.0),
+                                 distances, np.ones(2, dtype=int),
+                                 np.full(3, 2), np.full(2, 3),
+                                 demands=np.full(2, 6.0),
+                                 deck_capacities=np.full(2, 10.0))
+
+    for seed in range(5):
+        routes = np.zeros((2, 3, 2), dtype=np.int8)
+        routes[0, 0, 0] = 1
+        routes[1, 0, 0] = 2
+        relocate_visits(routes, calculate_voyage_distances(routes, distances),
+                        evaluator, evaluator.penalty.weights,
+                        np.random.default_rng(seed))
+
+        # Either voyage is shorter visiting both, but overloads the deck
+        assert routes[0, 0, 0] == 1 and routes[1, 0, 0] == 2
+        assert not evaluator(routes[None]).violations.any()
+
+
+def test_genetic_search_is_reproducible_and_feasible(instance_data,
+                                                     n_days_in_period):
+    results = []
+    for _ in range(2):
+        search = GeneticSearch(n_days_in_period=n_days_in_period,
+                               population_size=6, n_offspring=6, seed=3,
+                               **instance_data)
+        results.append(search.run(n_generations=3))
+
+    (routes, cost), (routes_again, cost_again) = results
+    assert cost == cost_again
+    assert np.array_equal(routes, routes_again)
+
+    assert np.isclose(cost, calculate_cost_of_route(
+        routes, instance_data["weekly_charter_costs"],
+        instance_data["sailing_costs"], instance_data["distances"]))
+    assert satisfies_constraints(routes, Instance(**instance_data))
+
+    for subpopulation in search.subpopulations:
+        assert subpopulation.size <= subpopulation.capacity
+
+
+def test_checkpoint_resumes_search_exactly(instance_data, n_days_in_period,
+                                           tmp_path):
+    path = str(tmp_path / "search.npz")
+    summaries = []
+    uninterrupted, interrupted, resumed = [
+        GeneticSearch(n_days_in_period=n_days_in_period, population_size=6,
+                      n_offspring=6, seed=3, **instance_data)
+        for _ in range(3)]
+    routes, cost = uninterrupted.run(4, callback=summaries.append)
+
+    interrupted.run(2, checkpoint_path=path, checkpoint_interval=2)
+    resumed.load_checkpoint(path)
+    assert resumed.generation == 2
+    assert len(resumed.voyage_cache) == len(interrupted.voyage_cache)
+
+    resumed_summaries = list(resumed.generations(2))
+    assert resumed_summaries == summaries[2:]
+    assert resumed.best_cost == cost
+    assert np.array_equal(resumed.best_routes, routes)
+
+    summary = summaries[-1]
+    assert summary.generation == 4
+    assert 0 <= summary.feasible_ratio <= 1
+    assert 0 < summary.diversity < 1
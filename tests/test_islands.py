@@ -0,0 +1,30 @@
+from helpers import satisfies_constraints
+from psvpp_solver.instance import Instance
+from psvpp_solver.solver import solve
+from psvpp_solver.utils import calculate_cost_of_route
+import numpy as np
+import pytest
+
+
+def test_island_search_is_reproducible_and_feasible(instance_data,
+                                                    n_days_in_period):
+    results = [solve(n_days_in_period=n_days_in_period, mode="islands",
+                     n_generations=4, seed=5, n_islands=3,
+                     migration_interval=2, population_size=6, n_offspring=6,
+                     **instance_data)
+               for _ in range(2)]
+
+    (routes, cost), (routes_again, cost_again) = results
+    assert cost == cost_again
+    assert np.array_equal(routes, routes_again)
+
+    assert np.isclose(cost, calculate_cost_of_route(
+        routes, instance_data["weekly_charter_costs"],
+        instance_data["sailing_costs"], instance_data["distances"]))
+    assert satisfies_constraints(routes, Instance(**instance_data))
+
+
+def test_solve_rejects_unknown_mode(instance_data, n_days_in_period):
+    with pytest.raises(ValueError):
+        solve(n_days_in_period=n_days_in_period, mode="annealing",
+              **instance_data)
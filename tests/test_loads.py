@@ -0,0 +1,58 @@
+from psvpp_solver.constraints import CONSTRAINT_NAMES
+from psvpp_solver.constraints import check_constraints_satisfied
+from psvpp_solver.constraints import deck_capacity_violation
+from psvpp_solver.cost import FitnessEvaluator
+from psvpp_solver.instance import Instance
+from psvpp_solver.loads import delivered_loads
+from psvpp_solver.loads import demand_table
+from psvpp_solver.loads import voyage_loads
+from psvpp_solver.utils import generate_departures_from_routes
+from psvpp_solver.utils import generate_visits_from_routes
+from psvpp_solver.utils import initial_population
+import numpy as np
+
+
+def test_voyage_loads():
+    routes = np.array([[[1, 2, 3, 0],
+                        [0, 0, 0, 0]],
+                       [[4, 0, 0, 0],
+                        [2, 4, 0, 0]]])
+    table = demand_table(np.array([5.0, 1.0, 2.0, 7.0]))
+    assert np.array_equal(delivered_loads(routes, table)[0, 0],
+                          [5, 6, 8, 8])
+    loads = voyage_loads(routes, table)
+    assert np.array_equal(loads, [[8, 0], [7, 8]])
+    assert deck_capacity_violation(loads, np.array([10.0, 7.5])) == 0.5
+
+    visits = generate_visits_from_routes(routes, 4, 2)
+    departures = generate_departures_from_routes(routes)
+    options = dict(required_services=visits.sum(axis=1),
+                   max_v_prepared=np.full(2, 2),
+                   n_days_available=np.full(2, 2),
+                   days_in_period=2,
+                   demands=np.array([5.0, 1.0, 2.0, 7.0]))
+    assert check_constraints_satisfied(routes, visits, departures,
+                                       deck_capacities=np.array([8, 8]),
+                                       **options)
+    assert not check_constraints_satisfied(routes, visits, departures,
+                                           deck_capacities=np.array([8, 7]),
+                                           **options)
+
+
+def test_fitness_evaluator_with_deck_capacity(distances, required_services):
+    demands = np.arange(1, len(required_services) + 1) * 10.0
+    _, _, population = initial_population(30, 3, 7, required_services,
+                                          rng=0)
+    capacities = np.array([150.0, 200.0, 100.0])
+    instance = Instance(np.full(3, 1000.0), np.ones(3), distances,
+                        required_services, np.full(7, 3), np.full(3, 7),
+                        demands=demands, deck_capacities=capacities)
+    fitness = FitnessEvaluator.from_instance(instance)(population)
+
+    deck_capacity = fitness.violations[:, CONSTRAINT_NAMES.index(
+        "deck_capacity")]
+    for routes, violation in zip(population, deck_capacity):
+        loads = np.array([[demands[voyage[voyage > 0] - 1].sum()
+                           for voyage in vessel] for vessel in routes])
+        assert violation == np.maximum(loads - capacities[:, None], 0).sum()
+    assert deck_capacity.any()
@@ -0,0 +1,86 @@
+from psvpp_solver.genetic import GeneticSearch
+from psvpp_solver.parallel import ParallelEvaluator
+from psvpp_solver.parallel import SharedArray
+from psvpp_solver.utils import initial_population
+import numpy as np
+import pickle
+
+
+def test_shared_array_pickles_as_handle():
+    shared = SharedArray.copy_of(np.arange(10))
+    try:
+        attached = pickle.loads(pickle.dumps(shared))
+        attached.array[0] = 100
+        assert shared.array[0] == 100
+        assert not attached.owner
+        attached.close()
+    finally:
+        shared.close()
+
+
+def test_parallel_evaluator_matches_serial(evaluator, required_services,
+                                           n_days_in_period):
+    _, _, population = initial_population(50, 4, n_days_in_period,
+                                          required_services, rng=0)
+    expected = evaluator(population)
+
+    with ParallelEvaluator(evaluator, n_workers=3) as parallel:
+        # Population in the shared buffer is evaluated in place
+        shared = parallel.shared_population(*population.shape)
+        shared[:] = population
+        in_place = parallel(shared)
+
+        # Larger populations are copied in and evaluated in chunks
+        copied = parallel(np.concatenate((population, population)))
+        # without writing to the shared population
+        partial = parallel(population[::-1][:10])
+        assert np.array_equal(shared, population)
+        assert np.allclose(partial.cost, expected.cost[::-1][:10])
+
+    for fitness in (in_place, copied):
+        for name in expected._fields:
+            assert np.allclose(getattr(fitness, name)[:50],
+                               getattr(expected, name))
+    assert np.allclose(copied.cost[50:], expected.cost)
+
+
+def test_genetic_search_with_workers_matches_serial(instance_data,
+                                                    n_days_in_period):
+    results = []
+    for n_workers in (None, 2):
+        with GeneticSearch(n_days_in_period=n_days_in_period,
+                           population_size=6, n_offspring=6, seed=3,
+                           n_workers=n_workers, **instance_data) as search:
+            results.append(search.run(n_generations=2))
+
+    assert results[0][1] == results[1][1]
+    assert np.array_equal(results[0][0], results[1][0])
+
+
+def test_genetic_search_with_workers_repairs_like_serial(instance_data,
+                                                         n_days_in_period):
+    # No vessel days, so every child is infeasible and about half of them
+    #  are repaired and evaluated again
+    instance_data = dict(instance_data, n_days_available=np.zeros(4, int))
+    subpopulations = []
+    for n_workers in (None, 2):
+        with GeneticSearch(n_days_in_period=n_days_in_period,
+                           population_size=6, n_offspring=6, seed=3,
+                           repair_rate=0.5, n_workers=n_workers,
+                           **instance_data) as search:
+            search.run(n_generations=5)
+            subpopulations.append(search.infeasible)
+
+            # Stored fitness belongs to the stored routes
+            routes = search.infeasible.routes[:search.infeasible.size]
+            fitness = search.evaluator(routes)
+            assert np.allclose(search.infeasible.cost[:len(routes)],
+                               fitness.cost)
+            assert np.array_equal(
+                search.infeasible.violations[:len(routes)],
+                fitness.violations)
+
+    serial, parallel = subpopulations
+    assert serial.size == parallel.size
+    assert np.array_equal(serial.routes, parallel.routes)
+    assert np.array_equal(serial.cost, parallel.cost)
@@ -0,0 +1,46 @@
+from psvpp_solver import patterns
+from psvpp_solver.constraints import departure_spread_violation
+from psvpp_solver.patterns import sample_visits
+from psvpp_solver.patterns import visit_pattern_table
+import numpy as np
+
+
+def test_sample_visits_properly_spread():
+    for n_days_in_period in range(4, 30):
+        required_services = np.arange(1, n_days_in_period + 1)
+        visits = sample_visits(n_days_in_period,
+                               required_services,
+                               size=20,
+                               rng=n_days_in_period)
+
+        assert visits.shape == (20, n_days_in_period, n_days_in_period)
+        assert np.array_equal(visits.sum(axis=-1),
+                              np.broadcast_to(required_services,
+                                              (20, n_days_in_period)))
+        assert np.all(departure_spread_violation(visits,
+                                                 required_services) == 0)
+
+
+def test_sample_visits_uniform():
+    # Three services in seven days: the three sequences of days between
+    # services are rotations of each other, giving seven distinct patterns
+    assert len(visit_pattern_table(7, 3)) == 3
+    visits = sample_visits(7, np.array([3]), size=7000, rng=0)[:, 0]
+    _, counts = np.unique(visits, axis=0, return_counts=True)
+
+    assert len(counts) == 7
+    assert np.all(np.abs(counts - 1000) < 150)
+
+
+def test_sample_visits_without_table(monkeypatch):
+    monkeypatch.setattr(patterns, "MAX_TABLE_SIZE", 1)
+    patterns.visit_pattern_table.cache_clear()
+    try:
+        required_services = np.array([3, 5, 9, 13])
+        visits = sample_visits(28, required_services, size=50, rng=0)
+        assert np.array_equal(visits.sum(axis=-1),
+                              np.broadcast_to(required_services, (50, 4)))
+        assert np.all(departure_spread_violation(visits,
+                                                 required_services) == 0)
+    finally:
+        patterns.visit_pattern_table.cache_clear()
@@ -0,0 +1,55 @@
+from psvpp_solver.parallel import ParallelEvaluator
+from psvpp_solver.population_store import PopulationStore
+from psvpp_solver.utils import initial_population
+import numpy as np
+import pickle
+import pytest
+
+
+def test_store_appends_and_reopens(required_services, n_installations,
+                                   n_days_in_period, tmp_path):
+    visits, departures, routes = initial_population(
+        20, 4, n_days_in_period, required_services, rng=0)
+    store = PopulationStore.create(str(tmp_path), 50, 4, n_days_in_period,
+                                   n_installations)
+    assert len(store) == 0
+    assert store.append(routes[:5]) == slice(0, 5)
+    initial_population(15, 4, n_days_in_period, required_services, rng=1,
+                       out=store.allocate(15))
+    store.close()
+
+    with PopulationStore(str(tmp_path), mode="r") as reopened:
+        assert len(reopened) == 20
+        assert isinstance(reopened.routes, np.memmap)
+        assert np.array_equal(reopened.routes[:5], routes[:5])
+        assert np.array_equal(reopened.visits[:5], visits[:5])
+        assert np.array_equal(reopened.departures[:5], departures[:5])
+
+    attached = pickle.loads(pickle.dumps(PopulationStore(str(tmp_path))))
+    assert len(attached) == 20
+    with pytest.raises(ValueError):
+        attached.allocate(31)
+
+
+def test_store_evaluation_matches_in_memory(evaluator, required_services,
+                                            n_installations, n_days_in_period,
+                                            tmp_path):
+    _, _, routes = initial_population(100, 4, n_days_in_period,
+                                      required_services, rng=2)
+    expected = evaluator(routes)
+
+    store = PopulationStore.create(str(tmp_path), 100, 4, n_days_in_period,
+                                   n_installations)
+    store.append(routes)
+    store.evaluate(evaluator, chunk_size=30)
+    assert np.allclose(store.cost, expected.cost)
+    assert np.allclose(store.penalized_cost(evaluator.penalty.weights),
+                       expected.penalized_cost)
+    assert np.array_equal(store.feasible(), expected.feasible)
+
+    store.cost[:] = np.nan
+    with ParallelEvaluator(evaluator, n_workers=2) as parallel:
+        parallel.evaluate_store(store, chunk_size=30)
+    assert np.allclose(store.cost, expected.cost)
+    assert np.allclose(store.violations, expected.violations)
+    store.close()
@@ -0,0 +1,53 @@
+from psvpp_solver.genetic import GeneticSearch
+from psvpp_solver.profiling import NullProfiler
+from psvpp_solver.profiling import Profiler
+import json
+import logging
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def instance_data(instance_data, n_days_in_period):
+    return dict(instance_data, max_v_prepared=np.full(n_days_in_period, 2),
+                n_days_available=np.full(4, 4))
+
+
+def test_profiler_records_generations(instance_data, n_days_in_period,
+                                      caplog):
+    profiler = Profiler(logger=logging.getLogger("psvpp_test"))
+    with caplog.at_level(logging.INFO, logger="psvpp_test"):
+        GeneticSearch(n_days_in_period=n_days_in_period, population_size=6,
+                      n_offspring=6, seed=0, profiler=profiler,
+                      **instance_data).run(3)
+
+    assert len(profiler.generations) == 3
+    assert len(caplog.records) == 3
+    first = json.loads(caplog.records[0].getMessage())
+    assert first["generation"] == 1
+    assert "initial_population" in first["stages"]
+    assert first["individuals_per_second"] > 0
+    assert 0 <= first["cache_hit_rates"]["voyage_cache"] <= 1
+
+    summary = json.loads(profiler.to_json())
+    for stage in ("crossover", "repair", "sequencing", "education",
+                  "evaluation"):
+        assert summary["stages"][stage]["calls"] > 0
+    assert summary["stages"]["crossover"]["calls"] == 3 * 6
+    # The initial population and each offspring are evaluated once, and
+    #  only repaired offspring again
+    assert summary["counters"]["evaluated"] == (
+        4 * 6 + 3 * 6 + summary["counters"].get("repair_retries", 0))
+    assert summary["generations"][1]["stages"]["crossover"]["calls"] == 6
+
+
+def test_profiling_does_not_change_the_search(instance_data,
+                                              n_days_in_period):
+    routes, cost = GeneticSearch(
+        n_days_in_period=n_days_in_period, population_size=6, n_offspring=6,
+        seed=0, profiler=NullProfiler(), **instance_data).run(3)
+    routes_profiled, cost_profiled = GeneticSearch(
+        n_days_in_period=n_days_in_period, population_size=6, n_offspring=6,
+        seed=0, profiler=Profiler(), **instance_data).run(3)
+    assert cost == cost_profiled
+    assert np.array_equal(routes, routes_profiled)
@@ -0,0 +1,107 @@
+from psvpp_solver.constraints import calculate_constraint_violations
+from psvpp_solver.constraints import voyage_overlap_violation
+from psvpp_solver.instance import Instance
+from psvpp_solver.loads import voyage_loads
+from psvpp_solver.repair import repair_schedule
+from psvpp_solver.utils import generate_visits_and_departures_from_routes
+from psvpp_solver.utils import initial_population
+import numpy as np
+
+
+def split_voyages(population):
+    """Give the second half of each voyage to another vessel, adding
+    departures beyond the depot capacity."""
+    for routes in population:
+        for vessel, day in zip(*np.nonzero(routes[:, :, 0])):
+            length = np.count_nonzero(routes[vessel, day])
+            other = (vessel + 1) % len(routes)
+            if length > 1 and not routes[other, day, 0]:
+                half = length // 2
+                routes[other, day, :length - half] = routes[vessel, day,
+                                                            half:length]
+                routes[vessel, day, half:] = 0
+
+
+def test_repair_schedule_fixes_departure_constraints(instance_data,
+                                                     required_services):
+    instance = Instance(**dict(instance_data,
+                               max_v_prepared=np.array([1, 2, 1, 1, 2, 1, 1]),
+                               n_days_available=np.full(4, 3)))
+    visits, _, population = initial_population(100, 4, 7, required_services,
+                                               rng=1)
+    split_voyages(population)
+
+    for voyage_duration in (1, 2):
+        repaired = population.copy()
+        for routes in repaired:
+            repair_schedule(routes, instance, voyage_duration)
+
+        repaired_visits, departures = \
+            generate_visits_and_departures_from_routes(repaired, 10)
+        violations = calculate_constraint_violations(
+            repaired_visits, departures, required_services,
+            instance.max_v_prepared, instance.n_days_available)
+        assert not violations.any()
+        assert not voyage_overlap_violation(departures,
+                                            voyage_duration).any()
+        # Visits only move to other days within the spread limits
+        assert np.array_equal(repaired_visits.sum(axis=-1),
+                              visits.sum(axis=-1))
+        assert np.array_equal(np.count_nonzero(repaired, axis=(1, 2, 3)),
+                              np.count_nonzero(population, axis=(1, 2, 3)))
+
+
+def test_repair_schedule_fixes_multi_day_voyages(instance_data,
+                                                 required_services):
+    instance = Instance(**dict(instance_data, max_v_prepared=np.full(7, 2),
+                               n_days_available=np.full(4, 5)),
+                        vessel_speeds=np.full(4, 15.0),
+                        service_times=np.full(10, 4.0))
+    visits, _, population = initial_population(100, 4, 7, required_services,
+                                               rng=1)
+    durations = instance.voyage_durations(population)
+    assert durations.max() > 2
+    assert voyage_overlap_violation(population[..., 0] > 0,
+                                    durations).any()
+
+    repaired = population.copy()
+    for routes in repaired:
+        repair_schedule(routes, instance)
+
+    repaired_visits, departures = generate_visits_and_departures_from_routes(
+        repaired, 10)
+    violations = calculate_constraint_violations(
+        repaired_visits, departures, required_services,
+        instance.max_v_prepared, instance.n_days_available,
+        instance.voyage_durations(repaired))
+    assert not violations.any()
+    assert np.array_equal(repaired_visits.sum(axis=-1), visits.sum(axis=-1))
+
+
+def test_repair_schedule_does_not_overload_decks(instance_data,
+                                                 required_services):
+    # Four visits fill a deck, so merging voyages overloads it
+    instance = Instance(**dict(instance_data,
+                               max_v_prepared=np.array([1, 2, 1, 1, 2, 1, 1]),
+                               n_days_available=np.full(4, 3)),
+                        demands=np.full(10, 10.0),
+                        deck_capacities=np.full(4, 40.0))
+    _, _, population = initial_population(200, 4, 7, required_services,
+                                          rng=1)
+    split_voyages(population)
+
+    repaired = population.copy()
+    for routes in repaired:
+        repair_schedule(routes, instance)
+
+    before, after = [
+        calculate_constraint_violations(
+            *generate_visits_and_departures_from_routes(routes, 10),
+            required_services, instance.max_v_prepared,
+            instance.n_days_available,
+            voyage_loads=voyage_loads(routes, instance.demands),
+            deck_capacities=instance.deck_capacities)
+        for routes in (population, repaired)]
+    assert np.all(after[:, 5] <= before[:, 5])
+    assert np.all(after.sum(axis=1) <= before.sum(axis=1))
+    assert after.sum() < before.sum()
@@ -0,0 +1,50 @@
+from helpers import random_distances
+from itertools import permutations
+
+from psvpp_solver.cost import calculate_voyage_distance
+from psvpp_solver.cost import calculate_voyage_distances
+from psvpp_solver.sequencing import held_karp
+from psvpp_solver.sequencing import local_search
+from psvpp_solver.sequencing import sequence_routes
+from psvpp_solver.sequencing import sequence_voyage
+from psvpp_solver.utils import initial_population
+import numpy as np
+
+
+def test_held_karp_is_optimal():
+    for seed, symmetric in ((0, True), (1, False)):
+        distances = random_distances(12, seed, symmetric)
+        voyage = np.array([9, 2, 11, 5, 7, 3])
+
+        best = min(calculate_voyage_distance(np.array(order), distances)
+                   for order in permutations(voyage))
+        order = held_karp(voyage, distances)
+        assert sorted(order) == sorted(voyage)
+        assert np.isclose(calculate_voyage_distance(order, distances), best)
+
+
+def test_local_search_improves_long_voyages():
+    distances = random_distances(40, seed=2)
+    voyage = np.random.default_rng(3).permutation(np.arange(1, 31))
+
+    improved = local_search(voyage, distances)
+    assert sorted(improved) == sorted(voyage)
+    assert (calculate_voyage_distance(improved, distances)
+            < calculate_voyage_distance(voyage, distances))
+    assert (calculate_voyage_distance(sequence_voyage(voyage, distances),
+                                      distances)
+            <= calculate_voyage_distance(improved, distances) * 1.1)
+
+
+def test_sequence_routes_does_not_increase_distance(distances,
+                                                    required_services):
+    _, _, population = initial_population(10, 3, 7, required_services,
+                                          rng=4)
+
+    for routes in population:
+        before = calculate_voyage_distances(routes, distances)
+        visited = np.sort(routes, axis=-1)
+        sequence_routes(routes, distances)
+        assert np.all(calculate_voyage_distances(routes, distances)
+                      <= before + 1e-9)
+        assert np.array_equal(np.sort(routes, axis=-1), visited)
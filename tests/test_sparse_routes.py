@@ -0,0 +1,118 @@
+from helpers import random_distances
+from psvpp_solver.constraints import calculate_constraint_violations
+from psvpp_solver.cost import PopulationCostEvaluator
+from psvpp_solver.durations import voyage_durations
+from psvpp_solver.loads import demand_table
+from psvpp_solver.loads import voyage_loads
+from psvpp_solver.sparse_routes import SparseRoutes
+from psvpp_solver.utils import calculate_cost_of_route
+from psvpp_solver.utils import generate_visits_from_routes
+from psvpp_solver.utils import initial_population
+import numpy as np
+
+routes = np.array([[[0, 0, 0, 0],
+                    [2, 0, 0, 0],
+                    [3, 0, 0, 0],
+                    [0, 0, 0, 0],
+                    [0, 0, 0, 0],
+                    [0, 0, 0, 0],
+                    [0, 0, 0, 0]],
+                   [[1, 0, 0, 0],
+                    [0, 0, 0, 0],
+                    [0, 0, 0, 0],
+                    [4, 0, 0, 0],
+                    [1, 2, 0, 0],
+                    [0, 0, 0, 0],
+                    [2, 3, 4, 0]]], dtype=np.int8)
+
+
+def test_sparse_routes_round_trip():
+    sparse = SparseRoutes.from_dense(routes)
+
+    assert np.array_equal(sparse.offsets, [0, 0, 1, 2, 2, 2, 2, 2, 3, 3, 3,
+                                           4, 6, 6, 9])
+    assert np.array_equal(sparse.installations, [2, 3, 1, 4, 1, 2, 2, 3, 4])
+    assert np.array_equal(sparse.to_dense(), routes)
+    assert sparse.to_dense().dtype == np.int8
+    assert np.array_equal(sparse.departures(), routes[:, :, 0] > 0)
+    assert np.array_equal(sparse.visits(),
+                          generate_visits_from_routes(routes, 4, 7))
+
+
+def test_sparse_routes_match_dense_population():
+    rng = np.random.default_rng(0)
+    required_services = rng.integers(1, 4, size=12)
+    distances = random_distances(12)
+    weekly_charter_costs = np.array([100000.0, 120000.0, 110000.0])
+    sailing_costs = np.array([10.0, 12.0, 11.0])
+    visits, departures, population = initial_population(
+        30, 3, 7, required_services, rng=rng)
+
+    sparse = SparseRoutes.from_dense(population)
+    assert sparse.nbytes < population.nbytes
+    assert np.array_equal(sparse.to_dense(), population)
+    assert np.array_equal(sparse.visits(), visits)
+    assert np.array_equal(sparse.departures(), departures)
+
+    evaluator = PopulationCostEvaluator(weekly_charter_costs, sailing_costs,
+                                        distances)
+    assert np.allclose(sparse.cost(weekly_charter_costs, sailing_costs,
+                                   distances), evaluator(population))
+    assert np.isclose(
+        SparseRoutes.from_dense(population[0]).cost(
+            weekly_charter_costs, sailing_costs, distances),
+        calculate_cost_of_route(population[0], weekly_charter_costs,
+                                sailing_costs, distances))
+
+    max_v_prepared = np.full(7, 1)
+    n_days_available = np.full(3, 3)
+    assert np.array_equal(
+        sparse.constraint_violations(required_services, max_v_prepared,
+                                     n_days_available),
+        calculate_constraint_violations(visits, departures,
+                                        required_services, max_v_prepared,
+                                        n_days_available))
+
+
+def test_sparse_routes_match_dense_durations_and_loads():
+    rng = np.random.default_rng(1)
+    required_services = rng.integers(1, 4, size=12)
+    distances = random_distances(12)
+    vessel_speeds = np.array([8.0, 10.0, 15.0])
+    service_times = rng.uniform(2, 6, size=12)
+    demands = demand_table(rng.uniform(1, 5, size=12))
+    visits, departures, population = initial_population(
+        30, 3, 7, required_services, rng=rng)
+    sparse = SparseRoutes.from_dense(population)
+
+    durations = sparse.voyage_durations(distances, vessel_speeds,
+                                        service_times)
+    assert np.array_equal(durations,
+                          voyage_durations(population, distances,
+                                           vessel_speeds, service_times))
+    assert durations.max() > 1
+    loads = sparse.voyage_loads(demands)
+    assert np.allclose(loads, voyage_loads(population, demands))
+
+    data = dict(voyage_durations=durations, voyage_loads=loads,
+                deck_capacities=np.full(3, 8.0))
+    violations = sparse.constraint_violations(
+        required_services, np.full(7, 1), np.full(3, 3), **data)
+    assert violations[:, [1, 3, 5]].any(axis=0).all()
+    assert np.array_equal(
+        violations,
+        calculate_constraint_violations(visits, departures,
+                                        required_services, np.full(7, 1),
+                                        np.full(3, 3), **data))
+
+
+def test_sparse_routes_beyond_int8():
+    n_installations = 300
+    dense = np.zeros((2, 7, n_installations), dtype=np.int16)
+    dense[0, 0, :150] = np.arange(1, 151)
+    dense[1, 3, :150] = np.arange(151, 301)
+
+    sparse = SparseRoutes.from_dense(dense)
+    assert sparse.installations.dtype == np.int16
+    assert np.array_equal(sparse.to_dense(), dense)
+    assert sparse.visits().sum() == n_installations
@@ -2,8 +2,11 @@ from psvpp_solver.utils import calculate_cost_of_route
 from psvpp_solver.utils import generate_departures_from_routes
 from psvpp_solver.utils import generate_departures_from_visits
 from psvpp_solver.utils import generate_visits_from_routes
+from psvpp_solver.utils import generate_visits_and_departures_from_routes
+from psvpp_solver.utils import initial_population
 from psvpp_solver.utils import generate_visits
 from psvpp_solver.utils import generate_routes_from_visits_and_departures
+from psvpp_solver.utils import spawn_generators
 from psvpp_solver.constraints import check_constraints_satisfied
 import numpy as np
 
@@ -61,6 +64,24 @@ def test_generate_departures_from_visits():
                                           visits.any(axis=0)), f'generate_departures_from_visits does not meet visit requirements for {n_vessels} vessels, {n_installations} installations and a {n_days_in_period} day period. \n\nvisits:\n{visits*1}\n\ndepartures:\n{departures*1} \n\nrequired services:\n{required_services}'
 
 
+def test_generate_departures_from_visits_is_reproducible():
+    visits = generate_visits(6, 7, np.array([1, 2, 3, 2, 1, 3]), rng=0)
+    first, second = (generate_departures_from_visits(visits, 3, 6, 7,
+                                                     rng=seed)
+                     for seed in (5, 5))
+    assert np.array_equal(first, second)
+    assert np.array_equal(first.any(axis=0), visits.any(axis=0))
+
+
+def test_spawn_generators():
+    draws = [rng.random(4) for rng in spawn_generators(3, 4)]
+    assert len(draws) == 4
+    assert len(np.unique(np.concatenate(draws))) == 16
+    # Same streams from the seed or a generator seeded with it
+    again = spawn_generators(np.random.default_rng(3), 4)
+    assert np.array_equal(draws[1], again[1].random(4))
+
+
 def test_check_constraints_satisfied():
     routes = np.array([[[1, 2, 3, 4],
                         [0, 0, 0, 0],
@@ -169,7 +190,42 @@ def test_generate_departures_from_routes():
 
 
 def test_generate_visits_from_routes():
-    pass
+    routes = np.array([[[1, 2, 0, 0],
+                        [0, 0, 0, 0],
+                        [4, 3, 2, 0],
+                        [0, 0, 0, 0]],
+                       [[0, 0, 0, 0],
+                        [3, 4, 0, 0],
+                        [0, 0, 0, 0],
+                        [1, 2, 0, 0]]])
+    visits = generate_visits_from_routes(routes,
+                                         n_installations=4,
+                                         n_days_in_period=4)
+    assert np.array_equal(visits * 1, [[1, 0, 0, 1],
+                                       [1, 0, 1, 1],
+                                       [0, 1, 1, 0],
+                                       [0, 1, 1, 0]])
+
+
+def test_generate_visits_and_departures_from_routes():
+    required_services = np.array([1, 2, 3, 2, 1, 3])
+    _, _, population = initial_population(20, 3, 7, required_services,
+                                          rng=0)
+
+    visits, departures, sailing_days = \
+        generate_visits_and_departures_from_routes(population,
+                                                   len(required_services),
+                                                   return_sailing_days=True)
+    for i, routes in enumerate(population):
+        for inst in range(len(required_services)):
+            assert np.array_equal(visits[i, inst],
+                                  (routes == inst + 1).any(axis=(0, 2)))
+        assert np.array_equal(departures[i],
+                              generate_departures_from_routes(routes))
+        assert np.array_equal(
+            generate_visits_and_departures_from_routes(
+                routes, len(required_services))[0], visits[i])
+    assert np.array_equal(sailing_days, departures.sum(axis=-1))
 
 
 def test_generate_visits():
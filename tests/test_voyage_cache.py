@@ -0,0 +1,47 @@
+from helpers import random_distances
+from psvpp_solver.cost import calculate_voyage_distances
+from psvpp_solver.utils import generate_visits_and_departures_from_routes
+from psvpp_solver.utils import initial_population
+from psvpp_solver.voyage_cache import VoyageCache
+import numpy as np
+
+
+def test_voyage_cache_hits_and_evicts():
+    cache = VoyageCache(random_distances(8), max_size=2)
+
+    order, distance = cache.get(np.array([4, 2, 7], dtype=np.int8))
+    assert sorted(order) == [2, 4, 7]
+    assert cache.get(np.array([7, 4, 2], dtype=np.int8))[1] == distance
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.get(np.array([1], dtype=np.int8))
+    cache.get(np.array([3], dtype=np.int8))
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    # The least recently used voyage was evicted
+    cache.get(np.array([2, 4, 7], dtype=np.int8))
+    assert cache.misses == 4
+    assert cache.stats()["hit_rate"] == 0.2
+
+
+def test_sequence_keeps_visits_and_does_not_increase_distance(
+        distances, required_services):
+    cache = VoyageCache(distances)
+    _, _, population = initial_population(20, 4, 7, required_services,
+                                          rng=0)
+    sequenced = population.copy()
+
+    for routes, original in zip(sequenced, population):
+        voyage_distances = cache.sequence(routes)
+        assert np.allclose(voyage_distances,
+                           calculate_voyage_distances(routes, distances))
+        assert np.all(voyage_distances
+                      <= calculate_voyage_distances(original, distances)
+                      + 1e-9)
+    for derived, expected in zip(
+            generate_visits_and_departures_from_routes(sequenced, 10),
+            generate_visits_and_departures_from_routes(population, 10)):
+        assert np.array_equal(derived, expected)
+    assert np.array_equal(np.count_nonzero(sequenced, axis=-1),
+                          np.count_nonzero(population, axis=-1))
+    assert cache.hits > 0